@@ -6,6 +6,8 @@ from injectors.connections import pg
 from routers.users import users_bp
 from routers.schedule_base import schedule_base_bp
 from routers.schedule_adjustments import schedule_adjustments_bp
+from routers.production_calendar import production_calendar_bp
+from routers.schedule_rules import schedule_rules_bp
 
 
 app = flask.Flask(__name__, static_folder='static', static_url_path='')
@@ -16,6 +18,8 @@ pg.setup(app)
 app.register_blueprint(users_bp)
 app.register_blueprint(schedule_base_bp)
 app.register_blueprint(schedule_adjustments_bp)
+app.register_blueprint(production_calendar_bp)
+app.register_blueprint(schedule_rules_bp)
 CORS(
     app,
     resources={r"/api/*": {"origins": "*"}},
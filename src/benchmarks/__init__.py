@@ -0,0 +1,4 @@
+"""
+Бенчмарки горячего пути reporter'а: расчет месяца и сборка тела
+batchUpdate на синтетических данных. Запуск: python -m benchmarks
+"""
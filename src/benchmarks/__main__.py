@@ -0,0 +1,280 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from domain import ScheduleCalculator, VectorizedScheduleCalculator
+from services import sheets_payload
+from .generator import generate_month
+
+ENGINES = {
+    'python': ScheduleCalculator,
+    'numpy': VectorizedScheduleCalculator,
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# Минимальная длительность одного замера: быстрые случаи повторяются
+# в цикле, чтобы шум таймера не влиял на сравнение
+MIN_SAMPLE_SECONDS = 0.05
+
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """
+    Лучшее время одного вызова func из repeat замеров, секунды.
+    Как и timeit, на время замеров отключает сборщик мусора.
+    """
+
+    started = time.perf_counter()
+    func()
+    loops = max(1, int(MIN_SAMPLE_SECONDS / (time.perf_counter() - started)))
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            best = min(best, (time.perf_counter() - started) / loops)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return best
+
+
+def changed_states(states: list, share: float, seed: int) -> list:
+    """Копия состояний строк листа, где доля share ячеек дней отличается."""
+
+    rnd = np.random.default_rng(seed)
+    old_states = []
+    for ident, days, totals, notes in states:
+        days = ''.join(
+            '?' if rnd.random() < share else symbol for symbol in days
+        )
+        old_states.append([ident, days, totals, notes])
+
+    return old_states
+
+
+def run(args) -> Dict[str, dict]:
+    results = {}
+
+    for size in args.sizes:
+        users, plans, adjustments = generate_month(
+            size, args.year, args.month,
+            plan_density=args.plan_density,
+            adjustment_density=args.adjustment_density,
+            absences_per_adjustment=args.absences,
+            seed=args.seed,
+        )
+
+        report = None
+        for name in args.engines:
+            engine = ENGINES[name]
+            seconds = measure(
+                lambda: engine.calculate_month_report(
+                    args.year, args.month, users, plans, adjustments
+                ),
+                args.repeat,
+            )
+            report = engine.calculate_month_report(
+                args.year, args.month, users, plans, adjustments
+            )
+            results[f'calculate/{name}/{size}'] = _result(
+                seconds, size * report.num_days
+            )
+
+        if report is None:
+            report = VectorizedScheduleCalculator.calculate_month_report(
+                args.year, args.month, users, plans, adjustments
+            )
+        cells = size * report.num_days
+
+        # Полная отправка листа: сетка, диапазоны, тело batchUpdate
+        def full_payload():
+            return sum(map(len, sheets_payload.stream_batches(
+                sheets_payload.iter_cells_requests(
+                    0, sheets_payload.iter_layout_rows(report)
+                )
+            )))
+
+        results[f'payload/full/{size}'] = _result(
+            measure(full_payload, args.repeat), cells
+        )
+
+        # Обычный цикл: отличается около процента ячеек
+        old_states = changed_states(
+            list(map(
+                sheets_payload.row_state,
+                sheets_payload.iter_layout_rows(report),
+            )),
+            0.01, args.seed,
+        )
+
+        def diff_payload():
+            return sum(map(len, sheets_payload.stream_batches(
+                sheets_payload.iter_cells_requests(
+                    0, sheets_payload.iter_layout_rows(report), old_states
+                )
+            )))
+
+        results[f'payload/diff/{size}'] = _result(
+            measure(diff_payload, args.repeat), cells
+        )
+
+    return results
+
+
+def _result(seconds: float, cells: int) -> dict:
+    return {
+        'seconds': seconds,
+        'cells_per_second': cells / seconds if seconds else None,
+    }
+
+
+def compare(
+        results: Dict[str, dict],
+        baseline: Dict[str, dict],
+        threshold: float,
+        min_delta: float = 0.0,
+) -> List[str]:
+    """
+    Печатает сравнение с базой и возвращает регрессии: замедление
+    больше threshold (доля) и больше min_delta секунд - чтобы шум
+    на быстрых случаях не считался регрессией.
+    """
+
+    regressions = []
+
+    print(f'{"benchmark":<28}{"seconds":>12}{"baseline":>12}{"change":>10}')
+    for name, result in results.items():
+        seconds = result['seconds']
+        base = baseline.get(name, {}).get('seconds')
+
+        if base:
+            change = seconds / base - 1
+            mark = ''
+            if change > threshold and seconds - base > min_delta:
+                mark = '  REGRESSION'
+                regressions.append(name)
+            print(
+                f'{name:<28}{seconds:>12.6f}{base:>12.6f}'
+                f'{change:>+10.1%}{mark}'
+            )
+        else:
+            print(f'{name:<28}{seconds:>12.6f}{"-":>12}{"new":>10}')
+
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path: str, results: Dict[str, dict], previous: dict):
+    data = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        # Не замерявшиеся в этом запуске случаи остаются прежними
+        'results': {**(previous or {}).get('results', {}), **results},
+    }
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def parse_args(argv: List[str]):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description=(
+            'Бенчмарки расчета месяца и сборки тела batchUpdate. '
+            'Код выхода 1 - замедление больше порога относительно базы.'
+        ),
+    )
+    parser.add_argument(
+        '--sizes', type=lambda v: [int(s) for s in v.split(',')],
+        default=[100, 1000, 10000],
+        help='число сотрудников через запятую (по умолчанию 100,1000,10000)',
+    )
+    parser.add_argument(
+        '--engines', type=lambda v: v.split(','),
+        default=list(ENGINES),
+        help=f'движки расчета через запятую ({",".join(ENGINES)})',
+    )
+    parser.add_argument('--year', type=int, default=2025)
+    parser.add_argument('--month', type=int, default=3)
+    parser.add_argument('--plan-density', type=float, default=0.2)
+    parser.add_argument('--adjustment-density', type=float, default=0.05)
+    parser.add_argument('--absences', type=int, default=1,
+                        help='отлучек в каждой ручной правке')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='замеров на случай (берется лучший)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='допустимое замедление, доля (0.25 = 25%%)')
+    parser.add_argument('--min-delta', type=float, default=0.002,
+                        help='замедление меньше стольких секунд - шум')
+    parser.add_argument('--update', action='store_true',
+                        help='записать результаты как новую базу')
+    parser.add_argument('--output', help='файл для результатов запуска')
+
+    args = parser.parse_args(argv)
+
+    unknown = set(args.engines) - set(ENGINES)
+    if unknown:
+        parser.error(f'unknown engines: {", ".join(sorted(unknown))}')
+
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    results = run(args)
+    baseline = load_baseline(args.baseline)
+    regressions = compare(
+        results, (baseline or {}).get('results', {}),
+        args.threshold, args.min_delta,
+    )
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.update or baseline is None:
+        save_baseline(args.baseline, results, baseline)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if regressions:
+        print(
+            f'{len(regressions)} benchmark(s) slower than baseline by more '
+            f'than {args.threshold:.0%}: {", ".join(regressions)}'
+        )
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import calendar
+import random
+from datetime import date, time
+from typing import List, Tuple
+
+from models.report_rows import AdjustmentRow, PlanRow, UserRow
+from models.schedule_adjustments import EmployeeStatusCode as AdjustmentStatus
+from models.schedule_base import EmployeeStatusCode
+from models.users import EmployeeType
+
+ABSENCE_REASONS = ('', 'врач', 'банк', 'личное')
+
+
+def generate_month(
+        users: int,
+        year: int,
+        month: int,
+        plan_density: float = 0.2,
+        adjustment_density: float = 0.05,
+        absences_per_adjustment: int = 1,
+        seed: int = 1,
+) -> Tuple[List[UserRow], List[PlanRow], List[AdjustmentRow]]:
+    """
+    Синтетические данные месяца в том виде, в каком их выгружает
+    reporter (NamedTuple строки, сотрудники по ФИО).
+    plan_density и adjustment_density - доля дней сотрудника
+    с записью планового графика и с ручной правкой,
+    absences_per_adjustment - отлучек в каждой ручной правке.
+    Одинаковый seed дает одинаковые данные.
+    """
+
+    rnd = random.Random(seed)
+    _, num_days = calendar.monthrange(year, month)
+
+    user_rows = [
+        UserRow(
+            employee_id,
+            f'Сотрудник {employee_id:06d}',
+            rnd.choice(list(EmployeeType)),
+            time(9, 0) if rnd.random() < 0.8 else None,
+            time(18, 0) if rnd.random() < 0.8 else None,
+            rnd.choice((None, 30, 45, 60)),
+        )
+        for employee_id in range(1, users + 1)
+    ]
+
+    plans, adjustments = [], []
+    for user in user_rows:
+        for day in range(1, num_days + 1):
+            current_date = date(year, month, day)
+
+            if rnd.random() < plan_density:
+                plans.append(PlanRow(
+                    user.id, current_date, rnd.choice(list(EmployeeStatusCode))
+                ))
+
+            if rnd.random() < adjustment_density:
+                adjustments.append(AdjustmentRow(
+                    user.id,
+                    current_date,
+                    rnd.choice((None, *AdjustmentStatus)),
+                    rnd.choice((None, time(10, 0), time(8, 30))),
+                    rnd.choice((None, time(19, 30), time(17, 0))),
+                    rnd.choice((None, time(13, 15), time(12, 0))),
+                    [
+                        _absence(rnd)
+                        for _ in range(absences_per_adjustment)
+                    ] or None,
+                ))
+
+    return user_rows, plans, adjustments
+
+
+def _absence(rnd: random.Random) -> dict:
+    start = rnd.randint(9, 16)
+    return {
+        'from': f'{start:02d}:00',
+        'to': f'{start + 1:02d}:00',
+        'comment': rnd.choice(ABSENCE_REASONS),
+    }
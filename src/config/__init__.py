@@ -1,5 +1,6 @@
 import dataclasses as dc
 import os
+from typing import Dict
 
 import yaml
 from base_module.config import PgConfig
@@ -12,6 +13,64 @@ class AppConfig(Model):
 
     pg: PgConfig
     sync_interval: int = dc.field(default=60)
+    # Окно синхронизации: сколько месяцев до и после текущего
+    sync_months_before: int = dc.field(default=1)
+    sync_months_after: int = dc.field(default=0)
+    # Количество месяцев, обрабатываемых параллельно
+    sync_workers: int = dc.field(default=4)
+    # Ждать уведомлений об изменениях (LISTEN) вместо простого сна;
+    # sync_interval при этом - максимальная пауза между циклами
+    listen_changes: bool = dc.field(default=True)
+    # Окно склейки уведомлений перед запуском цикла, секунды
+    change_debounce: float = dc.field(default=1.0)
+    # Принудительная синхронизация раз в N секунд, даже если данные
+    # не менялись (0 - отключено)
+    force_sync_interval: int = dc.field(default=3600)
+    # Запас при чтении журнала измененных ячеек и срок его хранения,
+    # секунды
+    change_log_overlap: int = dc.field(default=300)
+    change_log_retention: int = dc.field(default=86400)
+    # Движок расчета отчета: numpy - сеткой NumPy, python - построчно
+    calculator_engine: str = dc.field(default='numpy')
+    # Процессы для параллельного расчета месяца (0 или 1 - без пула)
+    # и минимум сотрудников, с которого пул используется
+    calculator_processes: int = dc.field(default=0)
+    calculator_parallel_min_users: int = dc.field(default=2000)
+    # Размер кэша готовых ячеек (0 - без кэширования)
+    cell_cache_size: int = dc.field(default=4096)
+    # Приемник отчета: google - Google Таблица, fake - локальная имитация,
+    # file - файлы в export_dir
+    report_sink: str = dc.field(default='google')
+    # Каталог и формат (xlsx, ods, csv) выгрузки в файлы
+    export_dir: str = dc.field(default='export')
+    export_format: str = dc.field(default='xlsx')
+    # Файл сетки локальной имитации (пусто - только в памяти)
+    fake_sheets_path: str = dc.field(default='')
+    # Состояние последней отправки в Google: каталог рядом с этим
+    # путем, файл на каждый лист (см. SheetStateStore)
+    sheets_state_path: str = dc.field(default='state/sheets_state.json')
+    # Предел размера тела одного batchUpdate в байтах (0 - без разбиения).
+    # Тела собираются потоком, предел ограничивает и память
+    sheets_max_payload_bytes: int = dc.field(default=4194304)
+    # Сотрудники сохраняют строки листа между циклами; при доле
+    # свободных строк больше этой строки выстраиваются заново по ФИО
+    # (0 - только при принудительной полной синхронизации)
+    sheets_row_compaction_share: float = dc.field(default=0.25)
+    # Таблицы команд: команда => id Google Таблицы (несколько команд
+    # могут делить таблицу). Остальные команды идут в GOOGLE_SHEETS_ID,
+    # если он задан. Пусто - все сотрудники в одной таблице
+    sheets_team_spreadsheets: Dict[str, str] = dc.field(default_factory=dict)
+    # Потоки одновременной отправки в таблицы команд (общие для месяцев)
+    sheets_fanout_workers: int = dc.field(default=8)
+    # Квота запросов к Google Sheets API в минуту на таблицу
+    # (0 - без ограничения)
+    sheets_requests_per_minute: int = dc.field(default=60)
+    # Повторы запроса при 429/5xx и предел задержки между ними, секунды
+    sheets_max_retries: int = dc.field(default=5)
+    sheets_backoff_max: int = dc.field(default=64)
+    # Порт HTTP-эндпоинта /metrics в формате Prometheus (0 - отключен,
+    # по умолчанию; 9100 не брать - его занимает node_exporter)
+    metrics_port: int = dc.field(default=0)
     debug: bool = dc.field(default=False)
 
 
@@ -1,3 +1,14 @@
 from .calculator import ScheduleCalculator
+from .grid_calculator import VectorizedScheduleCalculator
+from .month_report import MonthReport, ScheduleReport
+from .production_calendar import ProductionCalendar
+from .schedule_rules import ScheduleRules
 
-__all__ = ["ScheduleCalculator"]
+__all__ = [
+    "ScheduleCalculator",
+    "VectorizedScheduleCalculator",
+    "MonthReport",
+    "ScheduleReport",
+    "ProductionCalendar",
+    "ScheduleRules",
+]
@@ -1,10 +1,29 @@
-import calendar
-from datetime import date, datetime, timedelta
-from typing import List, Dict, Optional
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from types import MappingProxyType
+from typing import List, Mapping, Optional, Tuple
+
+import numpy as np
 
 from models.schedule_adjustments import ScheduleAdjustment
 from models.schedule_base import ScheduleBase
 from models.users import User, EmployeeType
+from .cell_cache import CellCache
+from .month_report import (
+    CODES, DAY_HALVES_BY_CODE, WORKED_CODES, MonthReport, ScheduleReport,
+)
+from .production_calendar import ProductionCalendar, WEEKEND_CALENDAR
+from .report_state import MonthReportState, ReportChangeSet
+from .schedule_rules import NO_RULE, NO_RULES, ScheduleRules
+
+# Нерабочие коды: ячейка без примечаний
+NON_WORKING_CODES = ('В', 'О', 'Б', 'К', 'У')
+
+# Опорная дата для расчета конца обеда
+LUNCH_BASE_DATE = date(2000, 1, 1)
+
+# Отработанные минуты дня, если у сотрудника не задано время работы
+DEFAULT_WORK_MINUTES = 8 * 60
 
 
 class ScheduleCalculator:
@@ -17,12 +36,61 @@ class ScheduleCalculator:
             users: List[User],
             plans: List[ScheduleBase],
             adjustments: List[ScheduleAdjustment],
-    ) -> Dict[str, Dict[int, Dict[str, str]]]:
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> MonthReport:
+        """
+        Вход: Данные из БД, производственный календарь
+        (по умолчанию - только субботы и воскресенья)
+        и повторяющиеся правила графика
+        Выход: Отчет за месяц (строка на каждого сотрудника)
+        """
+
+        users = MonthReport.unique_users(users)
+        report = MonthReport.for_users(year, month, users)
+        ScheduleCalculator._fill_report(
+            report, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+
+        return report
+
+    @staticmethod
+    def calculate_range_report(
+            start_date: date,
+            end_date: date,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> ScheduleReport:
         """
-        Вход: Данные из БД
-        Выход: Словарь для Google Sheets(data_map)
+        Отчет за произвольный период (start_date..end_date включительно):
+        неделя, квартал, год - одним проходом, без разбиения на месяцы.
+        Вход - как у calculate_month_report.
         """
 
+        users = ScheduleReport.unique_users(users)
+        report = ScheduleReport.for_range(start_date, end_date, users)
+        ScheduleCalculator._fill_report(
+            report, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+
+        return report
+
+    @staticmethod
+    def _fill_report(
+            report: ScheduleReport,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar],
+            schedule_rules: Optional[ScheduleRules],
+    ):
+        """Расчет всех строк пустого отчета report (users - без повторов)."""
+
         # Cписки в словари: (user_id, date) => Объект
         plans_map = {
             (p.employee_id, p.date): p for p in plans
@@ -31,100 +99,423 @@ class ScheduleCalculator:
             (a.employee_id, a.date): a for a in adjustments
         }
 
-        # Количество дней в месяце
-        _, num_days = calendar.monthrange(year, month)
-
-        report_data = {}
+        dates = report.dates()
+        days_off = (
+            production_calendar or WEEKEND_CALENDAR
+        ).range_days_off(report.start_date, report.end_date)
 
-        for user in users:
-            user_report = {}
+        for row, user in enumerate(users):
+            report.set_row(row, *ScheduleCalculator._calculate_user(
+                user, dates, days_off,
+                plans_map, adjustments_map, schedule_rules,
+            ))
 
-            for day in range(1, num_days + 1):
-                current_date = date(year, month, day)
+    @staticmethod
+    def recalculate_month_report(
+            previous: MonthReportState,
+            users: List[User],
+            changes: ReportChangeSet,
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> Tuple[MonthReportState, int]:
+        """
+        Пересчет отчета от прошлого результата: заново считаются только
+        ячейки из changes и строки сотрудников, чьи данные изменились
+        (или которые появились). Остальные строки копируются из
+        previous целиком, без пересчета. Календарь и правила должны быть
+        теми же, что и при расчете previous.
+        Возвращает новое состояние и число пересчитанных ячеек.
+        """
 
-                # Достаем план и правку
-                # для конкретного сотрудника на конкретный день
-                plan = plans_map.get((user.id, current_date))
+        year, month = previous.year, previous.month
+
+        # Действующие записи: удаленные пропадают, новые перекрывают
+        plans_map = dict(previous.plans)
+        adjustments_map = dict(previous.adjustments)
+        for cell in changes.cells:
+            plans_map.pop(cell, None)
+            adjustments_map.pop(cell, None)
+        plans_map.update(
+            MonthReportState.cells_map(changes.plans, year, month)
+        )
+        adjustments_map.update(
+            MonthReportState.cells_map(changes.adjustments, year, month)
+        )
+
+        cells_by_user = defaultdict(list)
+        for employee_id, cell_date in changes.cells:
+            if cell_date.year == year and cell_date.month == month:
+                cells_by_user[employee_id].append(cell_date)
+
+        users = MonthReport.unique_users(users)
+        report = MonthReport.for_users(year, month, users)
+        old_report = previous.report
+
+        dates = report.dates()
+        days_off = (
+            production_calendar or WEEKEND_CALENDAR
+        ).range_days_off(report.start_date, report.end_date)
+
+        # Строки сотрудников, чьи данные не менялись: новая => старая
+        kept = {}
+        changed_rows = []
+        for row, user in enumerate(users):
+            old_row = old_report.rows.get(user.id)
+            if old_row is None or previous.users.get(user.id) != user:
+                changed_rows.append(row)
+            else:
+                kept[old_row] = row
+
+        if kept:
+            new_rows, old_rows = list(kept.values()), list(kept)
+            report.codes[new_rows] = old_report.codes[old_rows]
+            report.minutes[new_rows] = old_report.minutes[old_rows]
+            report.totals[new_rows] = old_report.totals[old_rows]
+            for (old_row, day_index), note in old_report.notes.items():
+                row = kept.get(old_row)
+                if row is not None:
+                    report.notes[(row, day_index)] = note
+
+        recalculated = 0
+
+        for row in changed_rows:
+            user = users[row]
+            report.set_row(row, *ScheduleCalculator._calculate_user(
+                user, dates, days_off,
+                plans_map, adjustments_map, schedule_rules,
+            ))
+            recalculated += report.num_days
+
+        for row in kept.values():
+            user = users[row]
+            user_cells = cells_by_user.get(user.id)
+            if not user_cells:
+                continue
+
+            rule_codes = ScheduleCalculator._rule_codes(
+                schedule_rules, user.id, report.start_date, report.end_date
+            )
+            for current_date in user_cells:
                 adj = adjustments_map.get((user.id, current_date))
-
-                # значение для конкретной ячейки
-                cell_data = ScheduleCalculator._calculate_day(
-                    user, plan, adj, current_date
+                cell = ScheduleCalculator._calculate_day(
+                    user,
+                    plans_map.get((user.id, current_date)),
+                    adj,
+                    bool(days_off[current_date.day - 1]),
+                    rule_codes[current_date.day - 1],
                 )
-                user_report[day] = cell_data
+                report.set_cell(
+                    row,
+                    current_date.day - 1,
+                    cell,
+                    ScheduleCalculator._cell_minutes(
+                        user, cell['code'], adj,
+                        ScheduleCalculator._work_minutes(user),
+                    ),
+                )
+                recalculated += 1
+
+        state = MonthReportState(
+            year=year,
+            month=month,
+            users={user.id: user for user in users},
+            plans=plans_map,
+            adjustments=adjustments_map,
+            report=report,
+        )
+        return state, recalculated
+
+    @staticmethod
+    def _calculate_user(
+            user: User,
+            dates: List[date],
+            days_off: np.ndarray,
+            plans_map: dict,
+            adjustments_map: dict,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> Tuple[List[Mapping[str, str]], List[int], List[int]]:
+        """
+        Ячейки одного сотрудника по дням dates (подряд идущие даты).
+        days_off - выходные этих дней из производственного календаря.
+        В том же проходе считаются отработанные минуты по дням и дни
+        итогов строки (в половинах дня, порядок - как в TOTALS).
+        """
+
+        user_report = []
+        user_minutes = []
+        code_counts = defaultdict(int)
+        default_minutes = ScheduleCalculator._work_minutes(user)
 
-            report_data[user.fio] = user_report
+        rule_codes = ScheduleCalculator._rule_codes(
+            schedule_rules, user.id, dates[0], dates[-1]
+        )
 
-        return report_data
+        for current_date, day_off, rule_code in zip(
+                dates, days_off.tolist(), rule_codes
+        ):
+
+            # Достаем план и правку
+            # для конкретного сотрудника на конкретный день
+            plan = plans_map.get((user.id, current_date))
+            adj = adjustments_map.get((user.id, current_date))
+
+            # значение для конкретной ячейки
+            cell_data = ScheduleCalculator._calculate_day(
+                user, plan, adj, day_off, rule_code
+            )
+            user_report.append(cell_data)
+
+            code = cell_data['code']
+            code_counts[code] += 1
+            user_minutes.append(ScheduleCalculator._cell_minutes(
+                user, code, adj, default_minutes
+            ))
+
+        halves = [0, 0, 0, 0]
+        for code, count in code_counts.items():
+            day_halves = DAY_HALVES_BY_CODE.get(code)
+            if day_halves:
+                halves = [
+                    total + value * count
+                    for total, value in zip(halves, day_halves)
+                ]
+
+        return user_report, user_minutes, halves
 
     @staticmethod
     def _calculate_day(
             user: User,
             plan: Optional[ScheduleBase],
             adj: Optional[ScheduleAdjustment],
-            current_date: date,
-    ) -> Dict[str, str]:
+            day_off: bool,
+            rule_code: Optional[str] = None,
+    ) -> Mapping[str, str]:
         """
         Расчет одной ячейки с учетом объединенных
         статусов и динамического обеда.
+        Здесь определяется только код, готовая ячейка берется из кэша
+        по нормализованному ключу: обычные дни сотрудников одного типа
+        дают один и тот же ключ. Результат общий, менять его нельзя.
         """
 
-        notes = []
         final_code = 'Я'  # По умолчанию
+        location_type = None
 
         # Определение Единого Статуса
         if adj and adj.status_override:
             final_code = adj.status_override.value
 
-            # Если статус рабочий, проверяем, не сменилась
+            # Для рабочего статуса проверяется, не сменилась
             # ли локация вне графика
-            if final_code in ['Я', 'Д', 'ЯД', 'ДЯ']:
-                if (user.employee_type == EmployeeType.ALWAYS_REMOTE
-                        and 'Д' not in final_code):
-                    notes.append('Выход в офис (вне графика)')
-                elif (user.employee_type == EmployeeType.OFFICE_FIXED
-                      and 'Д' in final_code):
-                    notes.append('Удаленка (вне графика)')
+            location_type = user.employee_type
 
         elif plan and plan.status:
             final_code = plan.status.value
 
-        elif current_date.weekday() >= 5:
+        elif day_off:
+            # Выходной или праздник по производственному календарю
             final_code = 'В'
 
+        elif rule_code:
+            # Повторяющееся правило графика
+            final_code = rule_code
+
         else:
             if user.employee_type == EmployeeType.ALWAYS_REMOTE:
                 final_code = 'Д'
             else:
                 final_code = 'Я'
 
+        return cell_cache.get(
+            ScheduleCalculator._cell_key(user, adj, final_code, location_type)
+        )
+
+    @staticmethod
+    def _cell_minutes(
+            user: User,
+            final_code: str,
+            adj: Optional[ScheduleAdjustment],
+            default_minutes: int,
+    ) -> int:
+        """
+        Отработанные минуты ячейки. default_minutes - обычный день
+        сотрудника (_work_minutes без правки), чтобы не считать его
+        для каждого дня заново.
+        """
+
+        if final_code not in WORKED_CODES:
+            return 0
+        if adj:
+            return ScheduleCalculator._work_minutes(user, adj)
+
+        return default_minutes
+
+    @staticmethod
+    def _work_minutes(
+            user: User, adj: Optional[ScheduleAdjustment] = None
+    ) -> int:
+        """
+        Отработанные минуты рабочего дня: от начала до конца без обеда
+        и отлучек, с учетом ручной правки времени.
+        Если время работы не задано - DEFAULT_WORK_MINUTES.
+        """
+
+        start_time = (adj and adj.start_time_override) or user.start_time
+        end_time = (adj and adj.end_time_override) or user.end_time
+
+        if start_time and end_time:
+            minutes = (
+                _minute_of_day(end_time) - _minute_of_day(start_time)
+                - (user.lunch_duration or 60)
+            )
+        else:
+            minutes = DEFAULT_WORK_MINUTES
+
+        # Отлучки с нераспознанным временем не вычитаются
+        for absence in (adj and adj.absences) or ():
+            start = _parse_clock(absence.get('from'))
+            end = _parse_clock(absence.get('to'))
+            if start is not None and end is not None and end > start:
+                minutes -= end - start
+
+        return max(minutes, 0)
+
+    @staticmethod
+    def _rule_codes(
+            schedule_rules: Optional[ScheduleRules],
+            employee_id: int,
+            start_date: date,
+            end_date: date,
+    ) -> List[Optional[str]]:
+        """Коды правил сотрудника по дням периода (None - не задан)."""
+
+        codes = (schedule_rules or NO_RULES).range_codes(
+            employee_id, start_date, end_date
+        )
+        if codes is None:
+            return [None] * ((end_date - start_date).days + 1)
+
+        return [
+            CODES[index] if index != NO_RULE else None
+            for index in codes.tolist()
+        ]
+
+    @staticmethod
+    def _cell_key(
+            user: User,
+            adj: Optional[ScheduleAdjustment],
+            final_code: str,
+            location_type: Optional[EmployeeType] = None,
+    ) -> tuple:
+        """
+        Нормализованный ключ ячейки: код, тип занятости (только при
+        ручном статусе) и значимые для примечаний поля правки.
+        """
+
+        # Примечания нерабочего дня не нужны
+        if final_code in NON_WORKING_CODES:
+            return final_code, None, None
+
+        details = None
+        if adj:
+            lunch_start = adj.lunch_start_override or None
+            details = (
+                adj.start_time_override or None,
+                adj.end_time_override or None,
+                lunch_start,
+                # Длительность обеда важна только при правке обеда
+                (user.lunch_duration or 60) if lunch_start else None,
+                tuple(
+                    (
+                        absence.get('from', '?'),
+                        absence.get('to', '?'),
+                        absence.get('comment', ''),
+                    )
+                    for absence in adj.absences
+                ) if adj.absences else None,
+            )
+            if not any(details):
+                details = None
+
+        return final_code, location_type, details
+
+    @staticmethod
+    def _evaluate_cell(key: tuple) -> Mapping[str, str]:
+        """Ячейка {'code', 'note'} по ключу из _cell_key."""
+
+        final_code, location_type, details = key
+
         # Фильтрация нерабочих дней
-        if final_code in ['В', 'О', 'Б', 'К', 'У']:
-            return {'code': final_code, 'note': ''}
+        if final_code in NON_WORKING_CODES:
+            return MappingProxyType({'code': final_code, 'note': ''})
+
+        notes = []
+
+        if location_type is not None:
+            location_note = ScheduleCalculator._location_note(
+                location_type, final_code
+            )
+            if location_note:
+                notes.append(location_note)
+
+        if details:
+            notes.extend(ScheduleCalculator._override_notes(*details))
+
+        # Формирование итога
+        final_note = '\n'.join(notes) if notes else ''
+
+        return MappingProxyType({
+            'code': final_code,
+            'note': final_note
+        })
+
+    @staticmethod
+    def _location_note(
+            employee_type: EmployeeType, final_code: str
+    ) -> Optional[str]:
+        """Примечание о смене локации вне графика для рабочего статуса."""
+
+        if final_code in ['Я', 'Д', 'ЯД', 'ДЯ']:
+            if (employee_type == EmployeeType.ALWAYS_REMOTE
+                    and 'Д' not in final_code):
+                return 'Выход в офис (вне графика)'
+            elif (employee_type == EmployeeType.OFFICE_FIXED
+                  and 'Д' in final_code):
+                return 'Удаленка (вне графика)'
+
+        return None
+
+    @staticmethod
+    def _override_notes(
+            start_time: Optional[time],
+            end_time: Optional[time],
+            lunch_start: Optional[time],
+            lunch_duration: Optional[int],
+            absences: Optional[tuple],
+    ) -> List[str]:
+        """
+        Примечания рабочего дня из ручной правки: время и отлучки.
+        absences - тройки (с, по, комментарий).
+        """
+
+        notes = []
 
         # Определение времени (только для рабочих дней)
 
         # Время начала
-        start_t = user.start_time
-        if adj and adj.start_time_override:
-            start_t = adj.start_time_override
-            notes.append(f"Начало: {start_t.strftime('%H:%M')}")
+        if start_time:
+            notes.append(f"Начало: {start_time.strftime('%H:%M')}")
 
         # Время конца
-        end_t = user.end_time
-        if adj and adj.end_time_override:
-            end_t = adj.end_time_override
-            notes.append(f"Конец: {end_t.strftime('%H:%M')}")
+        if end_time:
+            notes.append(f"Конец: {end_time.strftime('%H:%M')}")
 
         # Обед
         # Выводим только если есть ручная правка времени начала обеда
-        if adj and adj.lunch_start_override:
-            lunch_start = adj.lunch_start_override
-
-            duration_mins = user.lunch_duration or 60
-
-            dummy_dt = datetime.combine(current_date, lunch_start)
-            lunch_end_dt = dummy_dt + timedelta(minutes=duration_mins)
+        if lunch_start:
+            # Дата нужна только для сложения времени
+            dummy_dt = datetime.combine(LUNCH_BASE_DATE, lunch_start)
+            lunch_end_dt = dummy_dt + timedelta(minutes=lunch_duration)
             lunch_end = lunch_end_dt.time()
 
             notes.append(
@@ -133,21 +524,28 @@ class ScheduleCalculator:
             )
 
         # Наложение отлучек
-        if adj and adj.absences:
-            for absence in adj.absences:
-                t_from = absence.get('from', '?')
-                t_to = absence.get('to', '?')
-                reason = absence.get('comment', '')
-
+        if absences:
+            for t_from, t_to, reason in absences:
                 note_str = f'Отлучка: {t_from}-{t_to}'
                 if reason:
                     note_str += f' ({reason})'
                 notes.append(note_str)
 
-        # Формирование итога
-        final_note = '\n'.join(notes) if notes else ''
+        return notes
 
-        return {
-            'code': final_code,
-            'note': final_note
-        }
+
+def _minute_of_day(value: time) -> int:
+    return value.hour * 60 + value.minute
+
+
+def _parse_clock(value) -> Optional[int]:
+    """Минута суток из строки 'ЧЧ:ММ' (None, если не распознана)."""
+
+    try:
+        return _minute_of_day(time.fromisoformat(value))
+    except (TypeError, ValueError):
+        return None
+
+
+# Кэш готовых ячеек, общий для всех расчетов процесса
+cell_cache = CellCache(ScheduleCalculator._evaluate_cell)
@@ -0,0 +1,50 @@
+import functools
+import threading
+from typing import Callable, Dict, Hashable, Mapping
+
+
+class CellCache:
+    """
+    Ограниченный (LRU) кэш расчета ячейки по нормализованному ключу.
+    Результаты общие для всех ячеек с одинаковым ключом, поэтому
+    изменять их нельзя. Ключи с нехешируемыми значениями (например,
+    вложенные списки в отлучках) считаются без кэша.
+    """
+
+    def __init__(
+            self,
+            compute: Callable[[Hashable], Mapping[str, str]],
+            maxsize: int = 4096,
+    ):
+        self._compute = compute
+        self._lock = threading.Lock()
+        self._uncached = 0
+        self.resize(maxsize)
+
+    def resize(self, maxsize: int):
+        """Новый размер кэша (0 - без кэширования); кэш сбрасывается."""
+
+        self._cached = functools.lru_cache(maxsize=maxsize)(self._compute)
+
+    def get(self, key: Hashable) -> Mapping[str, str]:
+        # Проверяется только хешируемость ключа: TypeError из самого
+        # расчета не должен маскироваться повторным вызовом без кэша
+        try:
+            hash(key)
+        except TypeError:
+            with self._lock:
+                self._uncached += 1
+            return self._compute(key)
+
+        return self._cached(key)
+
+    def __len__(self) -> int:
+        return self._cached.cache_info().currsize
+
+    def stats(self) -> Dict[str, int]:
+        info = self._cached.cache_info()
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'uncached': self._uncached,
+        }
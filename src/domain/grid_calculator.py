@@ -0,0 +1,247 @@
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import schedule_adjustments
+from models.schedule_adjustments import ScheduleAdjustment
+from models.schedule_base import EmployeeStatusCode, ScheduleBase
+from models.users import User, EmployeeType
+from .calculator import NON_WORKING_CODES, ScheduleCalculator, cell_cache
+from .month_report import (
+    CODES, CODE_INDEX, WORKED_MASK, MonthReport, ScheduleReport,
+)
+from .production_calendar import ProductionCalendar, WEEKEND_CALENDAR
+from .schedule_rules import NO_RULE, NO_RULES, ScheduleRules
+
+# Номер кода по статусу плана или правки без обращения к .value
+STATUS_INDEX = {
+    status: CODE_INDEX[status.value]
+    for enum in (
+        EmployeeStatusCode, schedule_adjustments.EmployeeStatusCode
+    )
+    for status in enum
+}
+
+WORK = CODE_INDEX[EmployeeStatusCode.WORK.value]
+REMOTE_FULL = CODE_INDEX[EmployeeStatusCode.REMOTE_FULL.value]
+DAY_OFF = CODE_INDEX[EmployeeStatusCode.DAY_OFF.value]
+
+
+class VectorizedScheduleCalculator:
+    """
+    Расчет месячного отчета сеткой NumPy (сотрудники x дни).
+    Коды считаются операциями над всей сеткой: выходные, значения
+    по типу занятости, повторяющиеся правила, наложение планового
+    графика и ручных правок.
+    Сетка становится кодами MonthReport без преобразований,
+    примечания и отдельный расчет минут - только для ячеек с ручными
+    правками, итоги строк - по сетке целиком.
+    Результат совпадает с ScheduleCalculator.
+    """
+
+    @staticmethod
+    def calculate_month_report(
+            year: int,
+            month: int,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> MonthReport:
+        """
+        Вход: Данные из БД, производственный календарь
+        (по умолчанию - только субботы и воскресенья)
+        и повторяющиеся правила графика
+        Выход: Отчет за месяц (строка на каждого сотрудника)
+        """
+
+        users = MonthReport.unique_users(users)
+        report = MonthReport.for_users(year, month, users)
+        VectorizedScheduleCalculator._fill_report(
+            report, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+
+        return report
+
+    @staticmethod
+    def calculate_range_report(
+            start_date: date,
+            end_date: date,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> ScheduleReport:
+        """
+        Отчет за произвольный период (start_date..end_date включительно)
+        одной сеткой. Вход - как у calculate_month_report.
+        """
+
+        users = ScheduleReport.unique_users(users)
+        report = ScheduleReport.for_range(start_date, end_date, users)
+        VectorizedScheduleCalculator._fill_report(
+            report, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+
+        return report
+
+    @staticmethod
+    def _fill_report(
+            report: ScheduleReport,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar],
+            schedule_rules: Optional[ScheduleRules],
+    ):
+        """Расчет сетки, примечаний и итогов пустого отчета report."""
+
+        grid, adjustments_map = VectorizedScheduleCalculator.build_code_grid(
+            report.start_date, report.end_date, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+        report.codes = grid
+
+        # Обычный рабочий день сотрудника во всех рабочих ячейках
+        default_minutes = np.fromiter(
+            (ScheduleCalculator._work_minutes(user) for user in users),
+            dtype=np.uint16,
+            count=len(users),
+        )
+        minutes = np.where(
+            WORKED_MASK[grid], default_minutes[:, np.newaxis], 0
+        ).astype(np.uint16)
+
+        # Примечания и минуты по правке только для ячеек с ручными правками
+        for (row, day_index), adj in adjustments_map.items():
+            code = CODES[grid[row, day_index]]
+            user = users[row]
+            # Командировка без примечаний, но с отработанными часами
+            minutes[row, day_index] = ScheduleCalculator._cell_minutes(
+                user, code, adj, int(default_minutes[row])
+            )
+            if code in NON_WORKING_CODES:
+                continue
+
+            cell = cell_cache.get(ScheduleCalculator._cell_key(
+                user,
+                adj,
+                code,
+                user.employee_type if adj.status_override else None,
+            ))
+            if cell['note']:
+                report.notes[(row, day_index)] = cell['note']
+
+        report.minutes = minutes
+        report.totals = ScheduleReport.compute_totals(grid, minutes)
+
+    @staticmethod
+    def build_code_grid(
+            start_date: date,
+            end_date: date,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> Tuple[np.ndarray, Dict[Tuple[int, int], ScheduleAdjustment]]:
+        """
+        Сетка номеров кодов (сотрудники x дни периода, номера из CODES)
+        и ручные правки периода по ячейкам (строка, индекс дня).
+        users - без повторов id.
+        """
+
+        # Строка сетки по id сотрудника
+        user_rows = {user.id: row for row, user in enumerate(users)}
+
+        # Выходные и праздники по дням периода
+        days_off = (
+            production_calendar or WEEKEND_CALENDAR
+        ).range_days_off(start_date, end_date)
+
+        # Рабочий код по умолчанию по типу занятости
+        remote = np.fromiter(
+            (u.employee_type == EmployeeType.ALWAYS_REMOTE for u in users),
+            dtype=bool,
+            count=len(users),
+        )
+        defaults = np.where(remote, REMOTE_FULL, WORK).astype(np.uint8)
+
+        grid = np.where(
+            days_off[np.newaxis, :], np.uint8(DAY_OFF), defaults[:, np.newaxis]
+        ).astype(np.uint8)
+
+        # Правила действуют только в рабочие дни календаря
+        schedule_rules = schedule_rules or NO_RULES
+        for row, user in enumerate(users):
+            rule_codes = schedule_rules.range_codes(
+                user.id, start_date, end_date
+            )
+            if rule_codes is None:
+                continue
+
+            mask = (rule_codes != NO_RULE) & ~days_off
+            grid[row, mask] = rule_codes[mask]
+
+        # Как и в построчном расчете, при повторе берется последняя запись
+        plans_map = VectorizedScheduleCalculator._range_map(
+            plans, user_rows, start_date, len(days_off)
+        )
+        adjustments_map = VectorizedScheduleCalculator._range_map(
+            adjustments, user_rows, start_date, len(days_off)
+        )
+
+        # Наложение планового графика
+        VectorizedScheduleCalculator._overlay(grid, [
+            (row, col, STATUS_INDEX[plan.status])
+            for (row, col), plan in plans_map.items() if plan.status
+        ])
+
+        # Наложение ручных правок
+        VectorizedScheduleCalculator._overlay(grid, [
+            (row, col, STATUS_INDEX[adj.status_override])
+            for (row, col), adj in adjustments_map.items()
+            if adj.status_override
+        ])
+
+        return grid, adjustments_map
+
+    @staticmethod
+    def _range_map(
+            records: list,
+            user_rows: Dict[int, int],
+            start_date: date,
+            num_days: int,
+    ) -> dict:
+        """(строка сетки, индекс дня) => запись за период."""
+
+        first = start_date.toordinal()
+
+        range_map = {}
+        for record in records:
+            row = user_rows.get(record.employee_id)
+            if row is None:
+                continue
+            day_index = record.date.toordinal() - first
+            if 0 <= day_index < num_days:
+                range_map[(row, day_index)] = record
+
+        return range_map
+
+    @staticmethod
+    def _overlay(grid: np.ndarray, cells: List[tuple]):
+        """
+        Записывает коды в ячейки сетки одной операцией.
+        cells - тройки (строка, индекс дня, номер кода).
+        """
+
+        if not cells:
+            return
+
+        rows, cols, values = np.array(cells, dtype=np.int64).T
+        grid[rows, cols] = values.astype(np.uint8)
@@ -0,0 +1,339 @@
+import calendar
+import copy
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.schedule_base import EmployeeStatusCode
+
+# Коды отчета и их номера в сетке
+CODES = tuple(code.value for code in EmployeeStatusCode)
+CODE_INDEX = {code: index for index, code in enumerate(CODES)}
+# Для перевода всей сетки номеров в строки одной операцией
+CODES_ARRAY = np.array(CODES, dtype=object)
+
+# Итоги сотрудника за период: колонки ScheduleReport.totals
+TOTALS = (
+    'office_days', 'remote_days', 'vacation_days', 'sick_days',
+    'worked_hours',
+)
+# Вклад кода в дни итогов в половинах дня: офис, удаленно, отпуск,
+# больничный. День с переходом - половина офиса и половина удаленки
+DAY_HALVES_BY_CODE = {
+    EmployeeStatusCode.WORK.value: (2, 0, 0, 0),
+    EmployeeStatusCode.REMOTE_FULL.value: (0, 2, 0, 0),
+    EmployeeStatusCode.OFFICE_TO_REMOTE.value: (1, 1, 0, 0),
+    EmployeeStatusCode.REMOTE_TO_OFFICE.value: (1, 1, 0, 0),
+    EmployeeStatusCode.VACATION.value: (0, 0, 2, 0),
+    EmployeeStatusCode.STUDY_LEAVE.value: (0, 0, 2, 0),
+    EmployeeStatusCode.SICK_LEAVE.value: (0, 0, 0, 2),
+}
+DAY_HALVES = np.array(
+    [DAY_HALVES_BY_CODE.get(code, (0, 0, 0, 0)) for code in CODES],
+    dtype=np.int64,
+)
+# Коды, за которые учитываются отработанные часы
+WORKED_CODES = tuple(
+    code.value for code in (
+        EmployeeStatusCode.WORK,
+        EmployeeStatusCode.REMOTE_FULL,
+        EmployeeStatusCode.OFFICE_TO_REMOTE,
+        EmployeeStatusCode.REMOTE_TO_OFFICE,
+        EmployeeStatusCode.BUSINESS_TRIP,
+    )
+)
+WORKED_MASK = np.isin(CODES_ARRAY, WORKED_CODES)
+
+
+class ScheduleReport:
+    """
+    Отчет за период (start_date..end_date включительно) в компактном виде.
+    Строки - сотрудники в порядке расчета (по одной на id, однофамильцы
+    не склеиваются), колонки - дни периода.
+    codes - номера кодов из CODES (uint8, сотрудники x дни),
+    notes - только непустые примечания: (строка, индекс дня) => текст.
+    minutes - отработанные минуты по ячейкам (uint16, сотрудники x дни),
+    totals - итоги по строкам в целых единицах (сотрудники x TOTALS):
+    дни - в половинах дня, часы - в минутах. Итоги заполняются
+    вместе с ячейками, отдельного прохода по сетке нет.
+    """
+
+    def __init__(
+            self,
+            start_date: date,
+            end_date: date,
+            user_ids: List[int],
+            fios: List[str],
+            codes: Optional[np.ndarray] = None,
+            notes: Optional[Dict[Tuple[int, int], str]] = None,
+            minutes: Optional[np.ndarray] = None,
+            totals: Optional[np.ndarray] = None,
+    ):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.num_days = (end_date - start_date).days + 1
+
+        self.user_ids = user_ids
+        self.fios = fios
+        # id сотрудника => строка
+        self.rows = {user_id: row for row, user_id in enumerate(user_ids)}
+
+        self.codes = codes if codes is not None else np.zeros(
+            (len(user_ids), self.num_days), dtype=np.uint8
+        )
+        self.notes = notes if notes is not None else {}
+        self.minutes = minutes if minutes is not None else np.zeros(
+            (len(user_ids), self.num_days), dtype=np.uint16
+        )
+        self.totals = totals if totals is not None else np.zeros(
+            (len(user_ids), len(TOTALS)), dtype=np.int64
+        )
+
+    @staticmethod
+    def for_range(
+            start_date: date, end_date: date, users: list
+    ) -> 'ScheduleReport':
+        """Пустой отчет за период со строками сотрудников users."""
+
+        return ScheduleReport(
+            start_date, end_date, [user.id for user in users],
+            [user.fio for user in users],
+        )
+
+    @staticmethod
+    def unique_users(users: list) -> list:
+        """Сотрудники без повторов id (остается первое вхождение)."""
+
+        seen = set()
+        unique = []
+        for user in users:
+            if user.id not in seen:
+                seen.add(user.id)
+                unique.append(user)
+
+        return unique
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ScheduleReport):
+            return NotImplemented
+
+        return (
+            (self.start_date, self.end_date)
+            == (other.start_date, other.end_date)
+            and self.user_ids == other.user_ids
+            and self.fios == other.fios
+            and np.array_equal(self.codes, other.codes)
+            and self.notes == other.notes
+            and np.array_equal(self.minutes, other.minutes)
+            and np.array_equal(self.totals, other.totals)
+        )
+
+    def dates(self) -> List[date]:
+        """Даты колонок отчета."""
+
+        return [
+            self.start_date + timedelta(days=day_index)
+            for day_index in range(self.num_days)
+        ]
+
+    @staticmethod
+    def compute_totals(codes: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+        """Итоги строк по сетке кодов и минут (одной операцией)."""
+
+        num_users = codes.shape[0]
+        # Число ячеек каждого кода по строкам
+        counts = np.bincount(
+            (np.arange(num_users)[:, np.newaxis] * len(CODES) + codes).ravel(),
+            minlength=num_users * len(CODES),
+        ).reshape(num_users, len(CODES))
+
+        totals = np.empty((num_users, len(TOTALS)), dtype=np.int64)
+        totals[:, :-1] = counts @ DAY_HALVES
+        totals[:, -1] = minutes.sum(axis=1, dtype=np.int64)
+        return totals
+
+    def set_cell(
+            self,
+            row: int,
+            day_index: int,
+            cell: Dict[str, str],
+            minutes: int = 0,
+    ):
+        """
+        Запись ячейки {'code', 'note'} и ее отработанных минут
+        из построчного расчета; итоги строки поправляются на разницу.
+        """
+
+        old_code = self.codes[row, day_index]
+        code = CODE_INDEX[cell['code']]
+        self.totals[row, :-1] += DAY_HALVES[code] - DAY_HALVES[old_code]
+        self.totals[row, -1] += minutes - int(self.minutes[row, day_index])
+
+        self.codes[row, day_index] = code
+        self.minutes[row, day_index] = minutes
+        if cell['note']:
+            self.notes[(row, day_index)] = cell['note']
+        else:
+            self.notes.pop((row, day_index), None)
+
+    def set_row(
+            self,
+            row: int,
+            cells: List[Dict[str, str]],
+            minutes: List[int],
+            halves: List[int],
+    ):
+        """
+        Запись строки сотрудника из построчного расчета: ячейки,
+        отработанные минуты по дням и дни итогов (в половинах дня),
+        накопленные при расчете строки.
+        """
+
+        self.codes[row] = [CODE_INDEX[cell['code']] for cell in cells]
+        self.minutes[row] = minutes
+        self.totals[row, :-1] = halves
+        self.totals[row, -1] = sum(minutes)
+        for day_index, cell in enumerate(cells):
+            if cell['note']:
+                self.notes[(row, day_index)] = cell['note']
+            else:
+                self.notes.pop((row, day_index), None)
+
+    def cell(self, row: int, day_index: int) -> Dict[str, str]:
+        return {
+            'code': CODES[self.codes[row, day_index]],
+            'note': self.notes.get((row, day_index), ''),
+        }
+
+    def code_rows(
+            self, start: int = 0, stop: Optional[int] = None
+    ) -> List[List[str]]:
+        """
+        Коды строками по сотрудникам start..stop (по умолчанию - вся
+        сетка) за одно преобразование.
+        """
+
+        return CODES_ARRAY[self.codes[start:stop]].tolist()
+
+    def totals_rows(
+            self, start: int = 0, stop: Optional[int] = None
+    ) -> List[list]:
+        """
+        Итоги строками по сотрудникам start..stop в порядке TOTALS: дни
+        (целые или с половиной), часы с точностью до сотых.
+        """
+
+        return [
+            [
+                halves // 2 if halves % 2 == 0 else halves / 2
+                for halves in row[:-1]
+            ] + [round(row[-1] / 60, 2)]
+            for row in self.totals[start:stop].tolist()
+        ]
+
+    def month_report(self, year: int, month: int) -> 'MonthReport':
+        """
+        Месяц из отчета за период (месяц должен входить в период
+        целиком). Сетка - срез без копирования.
+        """
+
+        month_report = MonthReport(year, month, self.user_ids, self.fios)
+        start = (month_report.start_date - self.start_date).days
+        end = start + month_report.num_days
+        if start < 0 or end > self.num_days:
+            raise ValueError(
+                f'{month}/{year} is outside {self.start_date}..{self.end_date}'
+            )
+
+        month_report.codes = self.codes[:, start:end]
+        month_report.minutes = self.minutes[:, start:end]
+        # Итоги периода к месяцу не относятся
+        month_report.totals = self.compute_totals(
+            month_report.codes, month_report.minutes
+        )
+        month_report.notes = {
+            (row, day_index - start): note
+            for (row, day_index), note in self.notes.items()
+            if start <= day_index < end
+        }
+        return month_report
+
+    def subset(self, rows: List[int]) -> 'ScheduleReport':
+        """
+        Отчет того же периода только со строками rows (в их порядке).
+        Сетки копируются выборкой строк, итоги не пересчитываются.
+        """
+
+        index = np.asarray(rows, dtype=np.intp)
+        new_rows = {row: new_row for new_row, row in enumerate(rows)}
+
+        report = copy.copy(self)
+        report.user_ids = [self.user_ids[row] for row in rows]
+        report.fios = [self.fios[row] for row in rows]
+        report.rows = {
+            user_id: row for row, user_id in enumerate(report.user_ids)
+        }
+        report.codes = self.codes[index]
+        report.minutes = self.minutes[index]
+        report.totals = self.totals[index]
+        report.notes = {
+            (new_rows[row], day_index): note
+            for (row, day_index), note in self.notes.items()
+            if row in new_rows
+        }
+        return report
+
+
+class MonthReport(ScheduleReport):
+    """Отчет за календарный месяц: индекс дня - число месяца - 1."""
+
+    def __init__(
+            self,
+            year: int,
+            month: int,
+            user_ids: List[int],
+            fios: List[str],
+            codes: Optional[np.ndarray] = None,
+            notes: Optional[Dict[Tuple[int, int], str]] = None,
+            minutes: Optional[np.ndarray] = None,
+            totals: Optional[np.ndarray] = None,
+    ):
+        self.year = year
+        self.month = month
+        _, last_day = calendar.monthrange(year, month)
+
+        super().__init__(
+            date(year, month, 1), date(year, month, last_day),
+            user_ids, fios, codes, notes, minutes, totals,
+        )
+
+    @classmethod
+    def for_users(cls, year: int, month: int, users: list) -> 'MonthReport':
+        """Пустой отчет со строками сотрудников users."""
+
+        return cls(
+            year, month, [user.id for user in users],
+            [user.fio for user in users],
+        )
+
+    def to_data_map(self) -> Dict[str, Dict[int, Dict[str, str]]]:
+        """
+        Прежнее представление ФИО => день => {'code', 'note'}
+        (однофамильцы в нем склеиваются).
+        """
+
+        data_map = {}
+        for row, (fio, codes) in enumerate(zip(self.fios, self.code_rows())):
+            data_map[fio] = {
+                day_index + 1: {
+                    'code': code,
+                    'note': self.notes.get((row, day_index), ''),
+                }
+                for day_index, code in enumerate(codes)
+            }
+
+        return data_map
@@ -0,0 +1,247 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from models.report_rows import AdjustmentRow, PlanRow, UserRow
+from models.schedule_adjustments import ScheduleAdjustment
+from models.schedule_base import ScheduleBase
+from models.users import User
+from .month_report import MonthReport, ScheduleReport
+from .production_calendar import ProductionCalendar
+from .schedule_rules import ScheduleRules
+from .shard_worker import calculate_shard, init_worker
+
+
+class ParallelScheduleCalculator:
+    """
+    Расчет отчета (за месяц или период) в пуле процессов.
+    Сотрудники (в исходном порядке) делятся на последовательные части
+    по числу процессов, каждая часть считается движком engine в своем
+    процессе, а сетки склеиваются по порядку частей - результат
+    совпадает с расчетом engine целиком, независимо от того, какой
+    процесс закончил первым. В процессы передаются только NamedTuple
+    строки, а не ORM объекты.
+    Меньше min_users сотрудников считается в текущем процессе:
+    на малых объемах запуск и передача данных дороже расчета.
+    """
+
+    def __init__(
+            self,
+            engine,
+            processes: int,
+            min_users: int = 2000,
+            cell_cache_size: int = 4096,
+    ):
+        self.engine = engine
+        self.processes = processes
+        self.min_users = min_users
+        # Размер кэша ячеек в процессах пула
+        self.cell_cache_size = cell_cache_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def calculate_month_report(
+            self,
+            year: int,
+            month: int,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> MonthReport:
+        """Вход и выход - как у engine.calculate_month_report."""
+
+        users = MonthReport.unique_users(users)
+        if self.processes < 2 or len(users) < self.min_users:
+            return self.engine.calculate_month_report(
+                year, month, users, plans, adjustments,
+                production_calendar, schedule_rules,
+            )
+
+        report = MonthReport.for_users(year, month, users)
+        self._fill_report(
+            report, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+        return report
+
+    def calculate_range_report(
+            self,
+            start_date: date,
+            end_date: date,
+            users: List[User],
+            plans: List[ScheduleBase],
+            adjustments: List[ScheduleAdjustment],
+            production_calendar: Optional[ProductionCalendar] = None,
+            schedule_rules: Optional[ScheduleRules] = None,
+    ) -> ScheduleReport:
+        """Вход и выход - как у engine.calculate_range_report."""
+
+        users = ScheduleReport.unique_users(users)
+        if self.processes < 2 or len(users) < self.min_users:
+            return self.engine.calculate_range_report(
+                start_date, end_date, users, plans, adjustments,
+                production_calendar, schedule_rules,
+            )
+
+        report = ScheduleReport.for_range(start_date, end_date, users)
+        self._fill_report(
+            report, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+        return report
+
+    def _fill_report(
+            self,
+            report: ScheduleReport,
+            users: list,
+            plans: list,
+            adjustments: list,
+            production_calendar: Optional[ProductionCalendar],
+            schedule_rules: Optional[ScheduleRules],
+    ):
+        """Расчет пустого отчета report по частям в пуле процессов."""
+
+        shards = self._shards(
+            report.start_date, report.end_date, users, plans, adjustments
+        )
+        pool = self._get_pool()
+
+        try:
+            futures = [
+                pool.submit(
+                    calculate_shard, self.engine,
+                    report.start_date, report.end_date,
+                    shard_users, shard_plans, shard_adjustments,
+                    production_calendar,
+                    (
+                        schedule_rules.for_employees(
+                            user.id for user in shard_users
+                        )
+                        if schedule_rules else None
+                    ),
+                )
+                for shard_users, shard_plans, shard_adjustments in shards
+            ]
+            # Порядок частей, а не порядок завершения
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            # Упавший процесс ломает весь пул: следующий расчет
+            # начнется с нового
+            self._reset_pool(pool)
+            raise
+
+        report.codes = np.concatenate([result[0] for result in results])
+        report.minutes = np.concatenate([result[2] for result in results])
+        report.totals = np.concatenate([result[3] for result in results])
+
+        offset = 0
+        for (_, notes, _, _), (shard_users, _, _) in zip(results, shards):
+            for (row, day_index), note in notes.items():
+                report.notes[(row + offset, day_index)] = note
+            offset += len(shard_users)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Пул создается при первом параллельном расчете и переиспользуется."""
+
+        with self._lock:
+            if self._pool is None:
+                # spawn: fork процесса с потоками (синхронизация месяцев,
+                # логгер) небезопасен. Процессы настраивает init_worker,
+                # модуль сервиса в них не импортируется (см. reporter)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker,
+                    initargs=(self.cell_cache_size,),
+                )
+            return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _shards(
+            self,
+            start_date: date,
+            end_date: date,
+            users: list,
+            plans: list,
+            adjustments: list,
+    ) -> List[Tuple[List[UserRow], List[PlanRow], List[AdjustmentRow]]]:
+        """
+        Последовательные части сотрудников с их записями за период.
+        Порядок записей внутри части сохраняется (при повторе ячейки
+        действует последняя).
+        """
+
+        size = -(-len(users) // self.processes)
+        shard_users = [
+            [_user_row(user) for user in users[start:start + size]]
+            for start in range(0, len(users), size)
+        ]
+
+        shard_index = {
+            user.id: index
+            for index, shard in enumerate(shard_users)
+            for user in shard
+        }
+        shard_plans = [[] for _ in shard_users]
+        shard_adjustments = [[] for _ in shard_users]
+
+        for records, target, to_row in (
+                (plans, shard_plans, _plan_row),
+                (adjustments, shard_adjustments, _adjustment_row),
+        ):
+            for record in records:
+                index = shard_index.get(record.employee_id)
+                if (index is None
+                        or not start_date <= record.date <= end_date):
+                    continue
+                target[index].append(to_row(record))
+
+        return list(zip(shard_users, shard_plans, shard_adjustments))
+
+
+def _user_row(user) -> UserRow:
+    if isinstance(user, UserRow):
+        return user
+
+    return UserRow(
+        user.id, user.fio, user.employee_type,
+        user.start_time, user.end_time, user.lunch_duration,
+    )
+
+
+def _plan_row(plan) -> PlanRow:
+    if isinstance(plan, PlanRow):
+        return plan
+
+    return PlanRow(plan.employee_id, plan.date, plan.status)
+
+
+def _adjustment_row(adj) -> AdjustmentRow:
+    if isinstance(adj, AdjustmentRow):
+        return adj
+
+    return AdjustmentRow(
+        adj.employee_id, adj.date, adj.status_override,
+        adj.start_time_override, adj.end_time_override,
+        adj.lunch_start_override, adj.absences,
+    )
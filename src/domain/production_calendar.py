@@ -0,0 +1,87 @@
+import calendar
+from datetime import date
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+
+class ProductionCalendar:
+    """
+    Производственный календарь: обычная неделя (суббота и воскресенье
+    выходные) плюс исключения - праздники и перенесенные рабочие дни.
+    Для каждого года один раз строится битовая карта выходных
+    (bool по дням года), дальше расчет только читает ее.
+    """
+
+    def __init__(self, days: Iterable[Tuple[date, bool]] = ()):
+        # Дата => рабочий ли день (только исключения)
+        self.days: Dict[date, bool] = dict(days)
+        # Год => выходные по дням года
+        self._years: Dict[int, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ProductionCalendar):
+            return NotImplemented
+
+        return self.days == other.days
+
+    def year_days_off(self, year: int) -> np.ndarray:
+        """Выходные года: True для нерабочих дней, индекс - день года."""
+
+        days_off = self._years.get(year)
+        if days_off is not None:
+            return days_off
+
+        first = date(year, 1, 1)
+        num_days = 366 if calendar.isleap(year) else 365
+        # Пн = 0, сдвиг от дня недели 1 января
+        weekdays = (np.arange(num_days) + first.weekday()) % 7
+        days_off = weekdays >= 5
+
+        for day, is_working in self.days.items():
+            if day.year == year:
+                days_off[day.toordinal() - first.toordinal()] = not is_working
+
+        # Карта общая для всех потоков расчета, менять ее нельзя
+        days_off.flags.writeable = False
+        self._years[year] = days_off
+        return days_off
+
+    def month_days_off(self, year: int, month: int) -> np.ndarray:
+        """Выходные месяца: True для нерабочих дней, индекс - день - 1."""
+
+        _, num_days = calendar.monthrange(year, month)
+        return self.range_days_off(
+            date(year, month, 1), date(year, month, num_days)
+        )
+
+    def range_days_off(self, start_date: date, end_date: date) -> np.ndarray:
+        """
+        Выходные периода (включительно): True для нерабочих дней,
+        индекс - номер дня от start_date. Период может захватывать
+        несколько лет.
+        """
+
+        parts = []
+        for year in range(start_date.year, end_date.year + 1):
+            first = date(year, 1, 1).toordinal()
+            start = max(start_date, date(year, 1, 1)).toordinal() - first
+            end = min(end_date, date(year, 12, 31)).toordinal() - first
+            parts.append(self.year_days_off(year)[start:end + 1])
+
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts)
+
+    def is_day_off(self, day: date) -> bool:
+        first = date(day.year, 1, 1)
+        return bool(
+            self.year_days_off(day.year)[day.toordinal() - first.toordinal()]
+        )
+
+
+# Только обычная неделя, без праздников и переносов
+WEEKEND_CALENDAR = ProductionCalendar()
@@ -0,0 +1,67 @@
+import dataclasses as dc
+from datetime import date
+from typing import Dict, List, Set, Tuple
+
+from models.report_rows import AdjustmentRow, PlanRow, UserRow
+from .month_report import MonthReport
+
+# Ячейка отчета: (id сотрудника, дата)
+CellKey = Tuple[int, date]
+
+
+@dc.dataclass
+class MonthReportState:
+    """
+    Рассчитанный отчет месяца вместе с входными данными, из которых
+    он получен. Нужен для пересчета только затронутых ячеек.
+    """
+
+    year: int
+    month: int
+    # id => сотрудник на момент расчета
+    users: Dict[int, UserRow]
+    # Ячейка => действующая запись (при повторе - последняя)
+    plans: Dict[CellKey, PlanRow]
+    adjustments: Dict[CellKey, AdjustmentRow]
+    report: MonthReport
+
+    @classmethod
+    def create(
+            cls,
+            year: int,
+            month: int,
+            users: List[UserRow],
+            plans: List[PlanRow],
+            adjustments: List[AdjustmentRow],
+            report: MonthReport,
+    ) -> 'MonthReportState':
+        return cls(
+            year=year,
+            month=month,
+            users={user.id: user for user in users},
+            plans=cls.cells_map(plans, year, month),
+            adjustments=cls.cells_map(adjustments, year, month),
+            report=report,
+        )
+
+    @staticmethod
+    def cells_map(rows: list, year: int, month: int) -> dict:
+        """Записи месяца по ячейкам; при повторе побеждает последняя."""
+
+        return {
+            (row.employee_id, row.date): row
+            for row in rows
+            if row.date.year == year and row.date.month == month
+        }
+
+
+@dc.dataclass
+class ReportChangeSet:
+    """
+    Изменения с прошлого расчета: затронутые ячейки и их текущие
+    записи (удаленным записям соответствует отсутствие строки).
+    """
+
+    cells: Set[CellKey] = dc.field(default_factory=set)
+    plans: List[PlanRow] = dc.field(default_factory=list)
+    adjustments: List[AdjustmentRow] = dc.field(default_factory=list)
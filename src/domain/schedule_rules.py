@@ -0,0 +1,113 @@
+import calendar
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .month_report import CODE_INDEX
+
+# Номер кода для дней, не заданных правилом
+NO_RULE = 255
+
+
+class ScheduleRules:
+    """
+    Повторяющиеся правила графика по сотрудникам (см. ScheduleRule).
+    Шаблоны переводятся в номера кодов один раз, а в коды дней
+    правила разворачиваются только для запрошенного месяца.
+    Недели чередуются от понедельника недели start_date.
+    При пересечении правил действует начавшееся позже.
+    """
+
+    def __init__(self, rules: Iterable = ()):
+        # Сотрудник => (начало, конец, понедельник первой недели,
+        # шаблоны недели x день) в порядковых номерах дат
+        self._rules: Dict[int, List[Tuple[int, int, int, np.ndarray]]] = (
+            defaultdict(list)
+        )
+
+        ordered = sorted(rules, key=lambda rule: (rule.start_date, rule.id))
+        for rule in ordered:
+            # Шаблон без недель или с неполной неделей не применяется
+            if not rule.weeks or any(len(week) != 7 for week in rule.weeks):
+                continue
+
+            start = rule.start_date.toordinal()
+            end = (
+                rule.end_date.toordinal() if rule.end_date
+                else date.max.toordinal()
+            )
+            # Неизвестный код (данные в обход API) считается незаданным
+            weeks = np.array(
+                [
+                    [CODE_INDEX.get(code, NO_RULE) for code in week]
+                    for week in rule.weeks
+                ],
+                dtype=np.uint8,
+            )
+            self._rules[rule.employee_id].append(
+                (start, end, start - rule.start_date.weekday(), weeks)
+            )
+
+    def __len__(self) -> int:
+        return sum(len(rules) for rules in self._rules.values())
+
+    def for_employees(self, employee_ids: Iterable[int]) -> 'ScheduleRules':
+        """Правила только указанных сотрудников (без перекомпиляции)."""
+
+        subset = ScheduleRules()
+        for employee_id in employee_ids:
+            rules = self._rules.get(employee_id)
+            if rules:
+                subset._rules[employee_id] = rules
+
+        return subset
+
+    def month_codes(
+            self, employee_id: int, year: int, month: int
+    ) -> Optional[np.ndarray]:
+        """
+        Номера кодов сотрудника по дням месяца (NO_RULE - день не задан)
+        или None, если в этом месяце у него нет правил.
+        """
+
+        _, num_days = calendar.monthrange(year, month)
+        return self.range_codes(
+            employee_id, date(year, month, 1), date(year, month, num_days)
+        )
+
+    def range_codes(
+            self, employee_id: int, start_date: date, end_date: date
+    ) -> Optional[np.ndarray]:
+        """
+        Номера кодов сотрудника по дням периода (включительно,
+        NO_RULE - день не задан) или None, если в периоде у него
+        нет правил.
+        """
+
+        rules = self._rules.get(employee_id)
+        if not rules:
+            return None
+
+        first, last = start_date.toordinal(), end_date.toordinal()
+        days = np.arange(first, last + 1)
+
+        codes = None
+        for start, end, anchor, weeks in rules:
+            if start > last or end < first:
+                continue
+
+            offsets = days - anchor
+            values = weeks[(offsets // 7) % len(weeks), offsets % 7]
+            mask = (days >= start) & (days <= end) & (values != NO_RULE)
+
+            if codes is None:
+                codes = np.full(len(days), NO_RULE, dtype=np.uint8)
+            codes[mask] = values[mask]
+
+        return codes
+
+
+# Без повторяющихся правил
+NO_RULES = ScheduleRules()
@@ -0,0 +1,40 @@
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models.report_rows import AdjustmentRow, PlanRow, UserRow
+from .calculator import cell_cache
+from .production_calendar import ProductionCalendar
+from .schedule_rules import ScheduleRules
+
+# Точка входа процессов пула ParallelScheduleCalculator: процесс spawn
+# импортирует только domain, без конфига и настройки логгера сервиса
+
+
+def init_worker(cell_cache_size: int):
+    """Настройка процесса пула: только то, что нужно расчету."""
+
+    cell_cache.resize(cell_cache_size)
+
+
+def calculate_shard(
+        engine,
+        start_date: date,
+        end_date: date,
+        users: List[UserRow],
+        plans: List[PlanRow],
+        adjustments: List[AdjustmentRow],
+        production_calendar: Optional[ProductionCalendar],
+        schedule_rules: Optional[ScheduleRules],
+) -> Tuple[np.ndarray, Dict[Tuple[int, int], str], np.ndarray, np.ndarray]:
+    """
+    Расчет части сотрудников в процессе пула:
+    коды, примечания, минуты и итоги строк.
+    """
+
+    report = engine.calculate_range_report(
+        start_date, end_date, users, plans, adjustments,
+        production_calendar, schedule_rules,
+    )
+    return report.codes, report.notes, report.minutes, report.totals
@@ -1,5 +1,7 @@
+from services.production_calendar_service import ProductionCalendarService
 from services.schedule_adjustments_service import ScheduleAdjustmentService
 from services.schedule_base_service import ScheduleBaseService
+from services.schedule_rules_service import ScheduleRulesService
 from services.users_service import UsersService
 
 from . import connections
@@ -23,3 +25,17 @@ def schedule_adjustments_service() -> ScheduleAdjustmentService:
     return ScheduleAdjustmentService(
         pg_connection=connections.pg.acquire_session(),
     )
+
+
+def production_calendar_service() -> ProductionCalendarService:
+    """Сервис работы с производственным календарем"""
+
+    return ProductionCalendarService(
+        pg_connection=connections.pg.acquire_session(),
+    )
+
+
+def schedule_rules_service() -> ScheduleRulesService:
+    """Сервис повторяющихся правил графика"""
+
+    return ScheduleRulesService(pg_connection=connections.pg.acquire_session())
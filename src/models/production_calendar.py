@@ -0,0 +1,59 @@
+import dataclasses as dc
+import typing
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from base_module.models import BaseOrmMappedModel
+
+SCHEMA_NAME = 'employee_system'
+
+
+@dc.dataclass
+class ProductionCalendarDay(BaseOrmMappedModel):
+    """
+    День производственного календаря, отличный от обычной недели:
+    праздник (нерабочий будний день) или перенесенный рабочий день
+    (рабочая суббота или воскресенье).
+    """
+
+    __tablename__ = 'production_calendar'
+    __table_args__ = {'schema': SCHEMA_NAME}
+
+    date: date = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Date, primary_key=True
+        )},
+    )
+
+    is_working: bool = dc.field(
+        default=False,
+        metadata={'sa': sa.Column(
+            sa.Boolean, nullable=False, default=False,
+            server_default=sa.false(),
+        )},
+    )
+
+    comment: typing.Optional[str] = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.String(255), nullable=True
+        )},
+    )
+
+    created_at: datetime = dc.field(
+        default_factory=datetime.utcnow,
+        metadata={'sa': sa.Column(
+            sa.DateTime, server_default=sa.func.now()
+        )},
+    )
+
+    updated_at: typing.Optional[datetime] = dc.field(
+        default_factory=datetime.utcnow,
+        metadata={'sa': sa.Column(
+            sa.DateTime, server_default=sa.func.now(), onupdate=sa.func.now()
+        )},
+    )
+
+
+BaseOrmMappedModel.REGISTRY.mapped(ProductionCalendarDay)
@@ -0,0 +1,68 @@
+import dataclasses as dc
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from base_module.models import BaseOrmMappedModel
+
+SCHEMA_NAME = 'employee_system'
+
+
+@dc.dataclass
+class ReportCellChange(BaseOrmMappedModel):
+    """
+    Журнал затронутых ячеек отчета (сотрудник, дата).
+    Пишется при создании, изменении и удалении записей графика,
+    чтобы reporter пересчитывал только эти ячейки.
+    """
+
+    __tablename__ = 'report_cell_changes'
+    __table_args__ = (
+        sa.Index('ix_report_cell_changes_changed_at', 'changed_at'),
+        {'schema': SCHEMA_NAME},
+    )
+
+    id: int = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.BigInteger, autoincrement=True, primary_key=True
+        )},
+    )
+
+    table_name: str = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.String(64), nullable=False
+        )},
+    )
+
+    record_id: int = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Integer, nullable=True
+        )},
+    )
+
+    employee_id: int = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Integer, nullable=False
+        )},
+    )
+
+    date: date = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Date, nullable=False
+        )},
+    )
+
+    # Время БД, а не приложения: по нему reporter читает журнал
+    changed_at: datetime = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.DateTime, nullable=False, server_default=sa.func.now()
+        )},
+    )
+
+
+BaseOrmMappedModel.REGISTRY.mapped(ReportCellChange)
@@ -0,0 +1,48 @@
+import typing
+from datetime import date, time
+
+from .schedule_base import EmployeeStatusCode
+from .users import EmployeeType
+
+
+class UserRow(typing.NamedTuple):
+    """Сотрудник: только поля, нужные для расчета отчета"""
+
+    id: int
+    fio: str
+    employee_type: EmployeeType
+    start_time: typing.Optional[time]
+    end_time: typing.Optional[time]
+    lunch_duration: typing.Optional[int]
+    # Команда (для раздачи отчета по таблицам команд)
+    team: typing.Optional[str] = None
+
+
+class PlanRow(typing.NamedTuple):
+    """Запись планового графика для расчета отчета"""
+
+    employee_id: int
+    date: date
+    status: EmployeeStatusCode
+
+
+class AdjustmentRow(typing.NamedTuple):
+    """Ручная правка для расчета отчета"""
+
+    employee_id: int
+    date: date
+    status_override: typing.Optional[EmployeeStatusCode]
+    start_time_override: typing.Optional[time]
+    end_time_override: typing.Optional[time]
+    lunch_start_override: typing.Optional[time]
+    absences: typing.Optional[typing.List[dict]]
+
+
+class RuleRow(typing.NamedTuple):
+    """Повторяющееся правило графика для расчета отчета"""
+
+    id: int
+    employee_id: int
+    start_date: date
+    end_date: typing.Optional[date]
+    weeks: typing.List[typing.List[typing.Optional[str]]]
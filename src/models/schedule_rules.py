@@ -0,0 +1,81 @@
+import dataclasses as dc
+import typing
+from datetime import date, datetime
+
+import sqlalchemy as sa
+from base_module.models import BaseOrmMappedModel
+from sqlalchemy.dialects.postgresql import JSONB
+
+SCHEMA_NAME = 'employee_system'
+
+
+@dc.dataclass
+class ScheduleRule(BaseOrmMappedModel):
+    """
+    Повторяющееся правило графика сотрудника.
+    weeks - недельные шаблоны, чередующиеся по порядку: в каждом
+    7 кодов статуса (пн..вс) или null, если день правилом не задан.
+    Один шаблон - обычная неделя, два - через неделю и т.д.
+    Действует с start_date по end_date (без end_date - бессрочно).
+    """
+
+    __tablename__ = 'schedule_rules'
+    __table_args__ = {'schema': SCHEMA_NAME}
+
+    id: int = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Integer, autoincrement=True, primary_key=True
+        )},
+    )
+
+    employee_id: int = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Integer,
+            sa.ForeignKey(
+                'employee_system.users.id',
+                ondelete='CASCADE',
+                name='fk_schedule_rules_employee',
+            ),
+            nullable=False,
+        )},
+    )
+
+    start_date: date = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Date, nullable=False
+        )},
+    )
+
+    end_date: typing.Optional[date] = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            sa.Date, nullable=True
+        )},
+    )
+
+    weeks: typing.List[typing.List[typing.Optional[str]]] = dc.field(
+        default=None,
+        metadata={'sa': sa.Column(
+            JSONB, nullable=False
+        )},
+    )
+
+    created_at: datetime = dc.field(
+        default_factory=datetime.utcnow,
+        metadata={'sa': sa.Column(
+            sa.DateTime, server_default=sa.func.now()
+        )},
+    )
+
+    updated_at: typing.Optional[datetime] = dc.field(
+        default_factory=datetime.utcnow,
+        metadata={'sa': sa.Column(
+            sa.DateTime, server_default=sa.func.now(), onupdate=sa.func.now()
+        )},
+    )
+
+
+BaseOrmMappedModel.REGISTRY.mapped(ScheduleRule)
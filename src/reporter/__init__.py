@@ -0,0 +1,6 @@
+from .service import export_main, main
+
+__all__ = [
+    "main",
+    "export_main",
+]
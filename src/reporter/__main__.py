@@ -0,0 +1,12 @@
+import sys
+
+from .service import export_main, main
+
+# Сервис запускается как python -m reporter: процессы spawn пула расчета
+# не выполняют модуль reporter.__main__ заново, поэтому конфиг, логгер
+# и подключение к БД в них не настраиваются
+if __name__ == "__main__":
+    if sys.argv[1:2] == ['export']:
+        export_main(sys.argv[2:])
+    else:
+        main()
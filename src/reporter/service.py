@@ -0,0 +1,1136 @@
+import argparse
+import time
+import os
+import calendar
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+import sqlalchemy as sa
+from sqlalchemy import select, and_, or_
+from sqlalchemy.dialects.postgresql import JSONB, aggregate_order_by
+from loguru import logger
+
+# Импорты конфигурации и БД
+from config import config
+from injectors.connections import pg
+from base_module.models.logger import setup_logging, LoggerConfig
+
+# Импорты моделей
+from models.users import User
+from models.schedule_base import ScheduleBase
+from models.schedule_adjustments import ScheduleAdjustment
+from models.report_rows import UserRow, PlanRow, AdjustmentRow, RuleRow
+from models.report_cell_changes import ReportCellChange
+from models.production_calendar import ProductionCalendarDay
+from models.schedule_rules import ScheduleRule
+
+# Импорты логики
+from domain.calculator import ScheduleCalculator, cell_cache
+from domain.grid_calculator import VectorizedScheduleCalculator
+from domain.month_report import ScheduleReport
+from domain.parallel_calculator import ParallelScheduleCalculator
+from domain.production_calendar import ProductionCalendar
+from domain.report_state import CellKey, MonthReportState, ReportChangeSet
+from domain.schedule_rules import ScheduleRules
+from services.fake_sheets import FakeSheetsService
+from services.file_export import (
+    FORMATS as FILE_FORMATS, FileReportSink, export_reports,
+)
+from services.metrics import MetricsServer, metrics
+from services.report_changes import ReportChangeListener
+from services.report_sink import ReportSink
+from services.sheets_scheduler import SheetsRequestScheduler
+from services.sheets_service import GoogleSheetsService
+from services.team_fanout import TeamFanoutSink
+
+# Настройка логгера
+setup_logging(LoggerConfig(root_log_level='DEBUG' if config.debug else 'INFO'))
+
+# Виды строк в общем запросе данных отчета
+ROW_USER, ROW_PLAN, ROW_ADJUSTMENT = 0, 1, 2
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """Первый и последний день месяца."""
+
+    _, last_day_num = calendar.monthrange(year, month)
+    return date(year, month, 1), date(year, month, last_day_num)
+
+
+def sync_window(
+        today: date, months_before: int, months_after: int
+) -> List[Tuple[int, int]]:
+    """
+    Месяцы окна синхронизации: months_before предыдущих,
+    текущий и months_after следующих.
+    """
+
+    current = today.year * 12 + today.month - 1
+
+    months = []
+    for index in range(current - months_before, current + months_after + 1):
+        year, month_index = divmod(index, 12)
+        months.append((year, month_index + 1))
+
+    return months
+
+
+def _null(type_):
+    """Типизированный NULL для колонок UNION ALL."""
+
+    return sa.cast(sa.null(), type_)
+
+
+def _rows_filter(model, periods: List[Tuple[date, date]], cells: Collection[CellKey]):
+    """Записи графика за периоды и по отдельным ячейкам."""
+
+    conditions = [
+        and_(
+            model.date >= start_date,
+            model.date <= end_date
+        )
+        for start_date, end_date in periods
+    ]
+    if cells:
+        conditions.append(
+            sa.tuple_(model.employee_id, model.date).in_(list(cells))
+        )
+
+    return or_(*conditions) if conditions else sa.false()
+
+
+def fetch_report_rows(
+        periods: List[Tuple[date, date]],
+        cells: Collection[CellKey] = (),
+) -> Tuple[List[UserRow], List[PlanRow], List[AdjustmentRow]]:
+    """
+    Забирает из БД данные для расчета отчета одним запросом:
+    всех активных сотрудников, а записи графика - за периоды periods
+    и по отдельным ячейкам cells (для пересчета затронутых ячеек).
+    Сотрудники, плановый график и ручные правки склеиваются через
+    UNION ALL, причем выбираются только колонки, нужные калькулятору,
+    без создания ORM-объектов.
+    """
+
+    logger.debug(f"Fetching data for periods: {periods}, cells: {len(cells)}")
+
+    status_type = ScheduleBase.status.type
+
+    # Колонки: вид строки, сотрудник, дата, ФИО, тип занятости, статус,
+    # начало, конец, начало обеда, длительность обеда, отлучки, команда
+    users_query = (
+        select(
+            sa.literal(ROW_USER).label('kind'),
+            User.id.label('employee_id'),
+            _null(sa.Date).label('date'),
+            User.fio.label('fio'),
+            User.employee_type.label('employee_type'),
+            _null(status_type).label('status'),
+            User.start_time.label('start_time'),
+            User.end_time.label('end_time'),
+            _null(sa.Time).label('lunch_start'),
+            User.lunch_duration.label('lunch_duration'),
+            _null(JSONB).label('absences'),
+            User.team.label('team'),
+        )
+        .where(User.is_active == True)
+    )
+
+    plans_query = (
+        select(
+            sa.literal(ROW_PLAN),
+            ScheduleBase.employee_id,
+            ScheduleBase.date,
+            _null(sa.String),
+            _null(User.employee_type.type),
+            ScheduleBase.status,
+            _null(sa.Time),
+            _null(sa.Time),
+            _null(sa.Time),
+            _null(sa.Integer),
+            _null(JSONB),
+            _null(sa.String),
+        )
+        .where(_rows_filter(ScheduleBase, periods, cells))
+    )
+
+    adjustments_query = (
+        select(
+            sa.literal(ROW_ADJUSTMENT),
+            ScheduleAdjustment.employee_id,
+            ScheduleAdjustment.date,
+            _null(sa.String),
+            _null(User.employee_type.type),
+            ScheduleAdjustment.status_override,
+            ScheduleAdjustment.start_time_override,
+            ScheduleAdjustment.end_time_override,
+            ScheduleAdjustment.lunch_start_override,
+            _null(sa.Integer),
+            ScheduleAdjustment.absences,
+            _null(sa.String),
+        )
+        .where(_rows_filter(ScheduleAdjustment, periods, cells))
+    )
+
+    query = (
+        sa.union_all(users_query, plans_query, adjustments_query)
+        .order_by(
+            sa.column('kind'), sa.column('fio'), sa.column('employee_id')
+        )
+    )
+
+    # Получаем сессию
+    session = pg.acquire_session()
+
+    try:
+        users, plans, adjustments = [], [], []
+
+        for row in session.execute(query):
+            (kind, employee_id, day, fio, employee_type, status,
+             start_time, end_time, lunch_start, lunch_duration,
+             absences, team) = row
+
+            if kind == ROW_USER:
+                users.append(UserRow(
+                    employee_id, fio, employee_type,
+                    start_time, end_time, lunch_duration, team,
+                ))
+            elif kind == ROW_PLAN:
+                plans.append(PlanRow(employee_id, day, status))
+            else:
+                adjustments.append(AdjustmentRow(
+                    employee_id, day, status,
+                    start_time, end_time, lunch_start, absences,
+                ))
+
+        logger.info(f"Fetched: {len(users)} users, {len(plans)} plans, {len(adjustments)} adjustments.")
+        return users, plans, adjustments
+
+    except Exception as e:
+        logger.error(f"Database fetch error: {e}")
+        raise e
+    finally:
+        session.close()
+
+
+def fetch_month_data(year: int, month: int) -> Tuple[List[UserRow], List[PlanRow], List[AdjustmentRow]]:
+    """
+    Забирает из БД все необходимые данные за конкретный месяц.
+    """
+
+    return fetch_report_rows([month_bounds(year, month)])
+
+
+def fetch_range_data(start_date: date, end_date: date) -> Tuple[List[UserRow], List[PlanRow], List[AdjustmentRow]]:
+    """
+    Забирает из БД все данные за произвольный период одним запросом.
+    """
+
+    return fetch_report_rows([(start_date, end_date)])
+
+
+def group_by_month(rows: list) -> Dict[Tuple[int, int], list]:
+    """Раскладывает строки графика по месяцам."""
+
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[(row.date.year, row.date.month)].append(row)
+
+    return grouped
+
+
+def _table_watermark(model, start_date: date, end_date: date):
+    """
+    Отпечаток таблицы графика за период: количество строк,
+    максимальный id и время последнего изменения.
+    """
+
+    changed_at = sa.func.coalesce(model.updated_at, model.created_at)
+
+    return (
+        select(
+            sa.func.concat_ws(
+                ':',
+                sa.func.count(model.id),
+                sa.func.max(model.id),
+                sa.func.max(changed_at),
+            )
+        )
+        .where(
+            and_(
+                model.date >= start_date,
+                model.date <= end_date
+            )
+        )
+        .scalar_subquery()
+    )
+
+
+def _users_fingerprint():
+    """
+    Хэш всех полей активных сотрудников, влияющих на отчет
+    (команда определяет таблицу, в которую попадает сотрудник).
+    """
+
+    row = sa.func.concat_ws(
+        '|',
+        User.id,
+        User.fio,
+        User.employee_type,
+        User.start_time,
+        User.end_time,
+        User.lunch_duration,
+        User.team,
+    )
+
+    return (
+        select(
+            sa.func.md5(
+                sa.func.string_agg(
+                    row, aggregate_order_by(sa.literal(','), User.id)
+                )
+            )
+        )
+        .where(User.is_active == True)
+        .scalar_subquery()
+    )
+
+
+def _calendar_fingerprint(start_date: date, end_date: date):
+    """
+    Хэш дней производственного календаря за период
+    (ловит и удаление дней, в отличие от счетчиков).
+    """
+
+    day = sa.func.concat_ws(
+        ':', ProductionCalendarDay.date, ProductionCalendarDay.is_working
+    )
+
+    return (
+        select(
+            sa.func.md5(
+                sa.func.string_agg(
+                    day,
+                    aggregate_order_by(
+                        sa.literal(','), ProductionCalendarDay.date
+                    ),
+                )
+            )
+        )
+        .where(
+            and_(
+                ProductionCalendarDay.date >= start_date,
+                ProductionCalendarDay.date <= end_date
+            )
+        )
+        .scalar_subquery()
+    )
+
+
+def _rules_overlap(start_date: date, end_date: date):
+    """Правила, действующие хотя бы один день периода."""
+
+    return and_(
+        ScheduleRule.start_date <= end_date,
+        or_(
+            ScheduleRule.end_date.is_(None),
+            ScheduleRule.end_date >= start_date,
+        ),
+    )
+
+
+def _rules_fingerprint(start_date: date, end_date: date):
+    """Хэш правил графика, действующих в периоде."""
+
+    changed_at = sa.func.coalesce(
+        ScheduleRule.updated_at, ScheduleRule.created_at
+    )
+    rule = sa.func.concat_ws(':', ScheduleRule.id, changed_at)
+
+    return (
+        select(
+            sa.func.md5(
+                sa.func.string_agg(
+                    rule, aggregate_order_by(sa.literal(','), ScheduleRule.id)
+                )
+            )
+        )
+        .where(_rules_overlap(start_date, end_date))
+        .scalar_subquery()
+    )
+
+
+def fetch_watermarks(months: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Tuple]:
+    """
+    Дешевая проверка изменений: одним запросом забирает отпечаток
+    сотрудников и отпечатки планового графика, ручных правок,
+    производственного календаря и правил графика по каждому месяцу окна.
+    """
+
+    columns = [_users_fingerprint()]
+    for year, month in months:
+        start_date, end_date = month_bounds(year, month)
+        columns.append(_table_watermark(ScheduleBase, start_date, end_date))
+        columns.append(
+            _table_watermark(ScheduleAdjustment, start_date, end_date)
+        )
+        columns.append(_calendar_fingerprint(start_date, end_date))
+        columns.append(_rules_fingerprint(start_date, end_date))
+
+    session = pg.acquire_session()
+
+    try:
+        users_fp, *tables = session.execute(select(*columns)).one()
+
+        return {
+            month: (users_fp, *tables[4 * i:4 * i + 4])
+            for i, month in enumerate(months)
+        }
+
+    except Exception as e:
+        logger.error(f"Database watermark error: {e}")
+        raise e
+    finally:
+        session.close()
+
+
+def fetch_production_calendar() -> ProductionCalendar:
+    """Производственный календарь: все праздники и переносы из БД."""
+
+    session = pg.acquire_session()
+
+    try:
+        rows = session.execute(
+            select(
+                ProductionCalendarDay.date,
+                ProductionCalendarDay.is_working,
+            )
+        ).all()
+
+        logger.info(f"Production calendar loaded: {len(rows)} day(s).")
+        return ProductionCalendar(rows)
+
+    except Exception as e:
+        logger.error(f"Database calendar error: {e}")
+        raise e
+    finally:
+        session.close()
+
+
+def fetch_schedule_rules(start_date: date, end_date: date) -> ScheduleRules:
+    """Повторяющиеся правила графика, действующие в периоде."""
+
+    session = pg.acquire_session()
+
+    try:
+        rows = session.execute(
+            select(
+                ScheduleRule.id,
+                ScheduleRule.employee_id,
+                ScheduleRule.start_date,
+                ScheduleRule.end_date,
+                ScheduleRule.weeks,
+            )
+            .where(_rules_overlap(start_date, end_date))
+        ).all()
+
+        logger.info(f"Schedule rules loaded: {len(rows)} rule(s).")
+        return ScheduleRules(RuleRow(*row) for row in rows)
+
+    except Exception as e:
+        logger.error(f"Database rules error: {e}")
+        raise e
+    finally:
+        session.close()
+
+
+# Параллельный расчет: пул процессов создается при первом расчете
+# и общий для всех циклов
+_parallel_calculator = ParallelScheduleCalculator(
+    (
+        ScheduleCalculator if config.calculator_engine == 'python'
+        else VectorizedScheduleCalculator
+    ),
+    config.calculator_processes,
+    config.calculator_parallel_min_users,
+    config.cell_cache_size,
+)
+
+
+def get_calculator():
+    """
+    Движок расчета по настройке calculator_engine; при
+    calculator_processes > 1 - он же в пуле процессов.
+    """
+
+    if config.calculator_processes > 1:
+        return _parallel_calculator
+    return _parallel_calculator.engine
+
+
+def calculate_range(start_date: date, end_date: date) -> ScheduleReport:
+    """
+    Отчет за произвольный период (неделя, квартал, год): одна выгрузка
+    и один расчет на весь период вместо прохода по месяцам.
+    """
+
+    if end_date < start_date:
+        raise ValueError(f"Invalid range: {start_date} > {end_date}")
+
+    with metrics.timer('range_fetch'):
+        users, plans, adjustments = fetch_range_data(start_date, end_date)
+        production_calendar = fetch_production_calendar()
+        schedule_rules = fetch_schedule_rules(start_date, end_date)
+
+    with metrics.timer('range_calculate'):
+        return get_calculator().calculate_range_report(
+            start_date, end_date, users, plans, adjustments,
+            production_calendar, schedule_rules,
+        )
+
+
+def export_range(
+        start_date: date,
+        end_date: date,
+        path: str,
+        export_format: Optional[str] = None,
+) -> int:
+    """
+    Выгрузка месяцев start_date..end_date (месяцы берутся целиком)
+    в файл path, вкладка на каждый месяц. Период рассчитывается
+    одной сеткой, а в файл строки уходят потоком по одной, поэтому
+    выгрузка за год не собирает листы в памяти. Возвращает число вкладок.
+    """
+
+    start_date = start_date.replace(day=1)
+    _, end_date = month_bounds(end_date.year, end_date.month)
+    report = calculate_range(start_date, end_date)
+
+    months = sync_window(
+        start_date,
+        0,
+        (end_date.year - start_date.year) * 12
+        + end_date.month - start_date.month,
+    )
+    with metrics.timer('export'):
+        sheets = export_reports(
+            path,
+            (
+                (date(year, month, 1), report.month_report(year, month))
+                for year, month in months
+            ),
+            export_format,
+        )
+
+    logger.info(
+        f"Exported {sheets} month(s) of {len(report)} employee(s) to {path}."
+    )
+    return sheets
+
+
+def _parse_watermark(
+        watermark: str
+) -> Tuple[int, int, Optional[datetime]]:
+    """
+    Количество строк, максимальный id и время последнего изменения
+    из отпечатка таблицы (у пустой таблицы - только количество).
+    """
+
+    count, max_id, changed_at = (watermark.split(':', 2) + [None, None])[:3]
+    return (
+        int(count),
+        int(max_id or 0),
+        datetime.fromisoformat(changed_at) if changed_at else None,
+    )
+
+
+def fetch_unlogged_months(
+        incremental: Dict[Tuple[int, int], Set[CellKey]],
+        synced_watermarks: Dict[Tuple[int, int], Tuple],
+        month_states: Dict[Tuple[int, int], MonthReportState],
+) -> Set[Tuple[int, int]]:
+    """
+    Месяцы, в которых журнал изменений объясняет не все изменения
+    графика с прошлой синхронизации (правки в обход API).
+    Вне ячеек журнала не должно быть строк новее отпечатка прошлой
+    синхронизации (вставки и изменения), а число строк вне них должно
+    остаться прежним (удаления и переносы на другие даты). Ячейки
+    журнала пересчитываются в любом случае, и правки в них в обход
+    API тоже попадут в отчет.
+    """
+
+    checks = []
+    columns = []
+    for (year, month), cells in incremental.items():
+        start_date, end_date = month_bounds(year, month)
+        state = month_states[(year, month)]
+
+        for model, index, previous_rows in (
+                (ScheduleBase, 1, state.plans),
+                (ScheduleAdjustment, 2, state.adjustments),
+        ):
+            count, max_id, changed_at = _parse_watermark(
+                synced_watermarks[(year, month)][index]
+            )
+            in_month = and_(
+                model.date >= start_date, model.date <= end_date
+            )
+            in_cells = _rows_filter(model, [], cells)
+
+            changed = model.id > max_id
+            if changed_at is not None:
+                changed = or_(
+                    changed,
+                    sa.func.coalesce(model.updated_at, model.created_at)
+                    > changed_at,
+                )
+
+            # Новые или измененные строки вне ячеек журнала
+            columns.append(
+                select(sa.func.count(model.id))
+                .where(and_(in_month, changed, ~in_cells))
+                .scalar_subquery()
+            )
+            # Строки месяца и строки в ячейках журнала сейчас
+            columns.append(
+                select(sa.func.count(model.id))
+                .where(in_month)
+                .scalar_subquery()
+            )
+            columns.append(
+                select(sa.func.count(model.id))
+                .where(in_cells)
+                .scalar_subquery()
+            )
+            # Строк вне ячеек журнала в прошлый раз
+            outside = count - len(cells & previous_rows.keys())
+            checks.append(((year, month), outside))
+
+    if not columns:
+        return set()
+
+    session = pg.acquire_session()
+
+    try:
+        counts = session.execute(select(*columns)).one()
+    except Exception as e:
+        logger.error(f"Database change log error: {e}")
+        raise e
+    finally:
+        session.close()
+
+    unlogged = set()
+    for i, (target, outside) in enumerate(checks):
+        changed_outside, total, inside = counts[3 * i:3 * i + 3]
+        if changed_outside or total - inside != outside:
+            unlogged.add(target)
+
+    return unlogged
+
+
+def fetch_changed_cells(since: Optional[datetime]) -> Tuple[Set[CellKey], Optional[datetime]]:
+    """
+    Ячейки из журнала изменений, записанные после since (с запасом
+    change_log_overlap на транзакции, закоммиченные позже своей метки),
+    и новая позиция чтения журнала. Без since возвращает только позицию.
+    """
+
+    session = pg.acquire_session()
+
+    try:
+        if since is None:
+            cursor = session.execute(
+                select(sa.func.max(ReportCellChange.changed_at))
+            ).scalar()
+            return set(), cursor
+
+        rows = session.execute(
+            select(
+                ReportCellChange.employee_id,
+                ReportCellChange.date,
+                ReportCellChange.changed_at,
+            )
+            .where(
+                ReportCellChange.changed_at
+                > since - timedelta(seconds=config.change_log_overlap)
+            )
+        ).all()
+
+        cells = {(employee_id, day) for employee_id, day, _ in rows}
+        cursor = max([since] + [changed_at for _, _, changed_at in rows])
+        return cells, cursor
+
+    except Exception as e:
+        logger.error(f"Database change log error: {e}")
+        raise e
+    finally:
+        session.close()
+
+
+def prune_change_log():
+    """Удаляет записи журнала старше change_log_retention."""
+
+    session = pg.acquire_session()
+
+    try:
+        with session.begin():
+            session.execute(
+                sa.delete(ReportCellChange).where(
+                    ReportCellChange.changed_at
+                    < sa.func.now()
+                    - timedelta(seconds=config.change_log_retention)
+                )
+            )
+    finally:
+        session.close()
+
+
+def calculate_month(
+        year: int,
+        month: int,
+        users: List[UserRow],
+        plans: List[PlanRow],
+        adjustments: List[AdjustmentRow],
+        previous: Optional[MonthReportState] = None,
+        changed_cells: Optional[Set[CellKey]] = None,
+        production_calendar: Optional[ProductionCalendar] = None,
+        schedule_rules: Optional[ScheduleRules] = None,
+) -> MonthReportState:
+    """
+    Расчет одного месяца цикла (отправляются месяцы цикла вместе,
+    см. ReportSink.sync_reports).
+    Данные выгружаются один раз на все месяцы цикла.
+    Если передан previous, пересчитываются только changed_cells
+    (plans и adjustments - их текущие записи) и измененные сотрудники.
+    production_calendar - праздники и переносы (без него - только
+    субботы и воскресенья), schedule_rules - повторяющиеся правила.
+    """
+
+    logger.info(f"Calculating {month}/{year}...")
+
+    # Calculator вернет отчет за месяц
+    with metrics.timer('calculate'):
+        if previous is not None:
+            state, recalculated = ScheduleCalculator.recalculate_month_report(
+                previous,
+                users,
+                ReportChangeSet(changed_cells or set(), plans, adjustments),
+                production_calendar,
+                schedule_rules,
+            )
+        else:
+            report = get_calculator().calculate_month_report(
+                year, month, users, plans, adjustments,
+                production_calendar, schedule_rules,
+            )
+            state = MonthReportState.create(
+                year, month, users, plans, adjustments, report
+            )
+            recalculated = len(report) * report.num_days
+
+    metrics.observe('recalculated_cells', recalculated)
+    logger.info(f"Recalculated {recalculated} cell(s) for {month}/{year}.")
+
+    return state
+
+
+def spreadsheet_path(path: str, spreadsheet_id: str) -> str:
+    """Отдельное состояние таблицы команды рядом с path: state.<id>.json."""
+
+    root, ext = os.path.splitext(path)
+    return f'{root}.{spreadsheet_id}{ext}'
+
+
+def create_spreadsheet_sink(
+        spreadsheet_id: Optional[str],
+        state_path: str,
+        fake_path: str,
+        **labels,
+) -> ReportSink:
+    """
+    Приемник одной таблицы со своим планировщиком квоты.
+    spreadsheet_id не нужен локальной имитации (report_sink: fake),
+    labels - метки метрик обращений к API этой таблицы.
+    """
+
+    scheduler = SheetsRequestScheduler(
+        requests_per_minute=config.sheets_requests_per_minute,
+        max_retries=config.sheets_max_retries,
+        backoff_max=config.sheets_backoff_max,
+    )
+    metrics.add_collector('sheets_api_requests', scheduler.stats, **labels)
+
+    if config.report_sink == 'fake':
+        return FakeSheetsService(
+            fake_path or None,
+            state_path,
+            config.sheets_max_payload_bytes,
+            scheduler,
+            row_compaction_share=config.sheets_row_compaction_share,
+        )
+
+    # Путь к ключу внутри контейнера
+    key_path = "service_account.json"
+    return GoogleSheetsService(
+        key_path,
+        spreadsheet_id,
+        state_path,
+        config.sheets_max_payload_bytes,
+        scheduler,
+        config.sheets_row_compaction_share,
+    )
+
+
+def create_report_sink() -> ReportSink:
+    """
+    Приемник отчета по настройке report_sink: Google Таблица,
+    локальная имитация для работы без сети или файлы в export_dir.
+    С sheets_team_spreadsheets - по таблице на команду.
+    """
+
+    if config.report_sink == 'file':
+        logger.info(
+            f"Exporting reports to {config.export_dir} "
+            f"({config.export_format}) instead of Google Sheets."
+        )
+        return FileReportSink(config.export_dir, config.export_format)
+
+    if config.report_sink == 'fake':
+        logger.warning("Using local fake spreadsheet instead of Google Sheets.")
+
+    spreadsheet_id = os.getenv("GOOGLE_SHEETS_ID")
+    routes = config.sheets_team_spreadsheets
+
+    if not routes:
+        if not spreadsheet_id and config.report_sink != 'fake':
+            raise ValueError(
+                "GOOGLE_SHEETS_ID is not set! Check your .env file."
+            )
+        return create_spreadsheet_sink(
+            spreadsheet_id, config.sheets_state_path, config.fake_sheets_path
+        )
+
+    # Таблица по умолчанию сохраняет прежние файлы состояния,
+    # у таблиц команд - свои рядом с ними
+    sinks = {}
+    if spreadsheet_id:
+        sinks[spreadsheet_id] = create_spreadsheet_sink(
+            spreadsheet_id,
+            config.sheets_state_path,
+            config.fake_sheets_path,
+            spreadsheet=spreadsheet_id,
+        )
+    for team_spreadsheet_id in routes.values():
+        if team_spreadsheet_id in sinks:
+            continue
+        sinks[team_spreadsheet_id] = create_spreadsheet_sink(
+            team_spreadsheet_id,
+            spreadsheet_path(config.sheets_state_path, team_spreadsheet_id),
+            config.fake_sheets_path and spreadsheet_path(
+                config.fake_sheets_path, team_spreadsheet_id
+            ),
+            spreadsheet=team_spreadsheet_id,
+        )
+
+    logger.info(
+        f"Routing {len(routes)} team(s) to {len(sinks)} spreadsheet(s)."
+    )
+    return TeamFanoutSink(
+        routes, sinks, spreadsheet_id or None, config.sheets_fanout_workers
+    )
+
+
+def main():
+    logger.info("--- Starting OPO Reporter Service ---")
+
+    # Инициализация БД
+    try:
+        pg.init_db()
+        logger.info("Database initialized successfully.")
+    except Exception as e:
+        logger.critical(f"Failed to connect/init DB: {e}")
+        return
+
+    # Инициализация приемника отчета
+    try:
+        report_sink = create_report_sink()
+    except Exception as e:
+        logger.critical(f"Failed to initialize report sink: {e}")
+        return
+
+    # Кэш ячеек общий для обоих движков расчета
+    cell_cache.resize(config.cell_cache_size)
+    metrics.add_collector('cell_cache', cell_cache.stats)
+
+    # Эндпоинт метрик для Prometheus
+    if config.metrics_port > 0:
+        try:
+            MetricsServer(metrics, config.metrics_port).start()
+        except Exception as e:
+            logger.error(f"Failed to start metrics endpoint: {e}")
+
+    # Основной цикл работы
+    logger.info(f"Service started. Sync interval: {config.sync_interval} seconds.")
+
+    # Ожидание изменений из API между циклами
+    listener = (
+        ReportChangeListener(config.pg, config.change_debounce)
+        if config.listen_changes else None
+    )
+
+    # Месяцы окна обрабатываются параллельно
+    executor = ThreadPoolExecutor(
+        max_workers=max(config.sync_workers, 1),
+        thread_name_prefix='month-sync',
+    )
+
+    # Отпечатки данных и время последней успешной синхронизации по месяцам
+    synced_watermarks: Dict[Tuple[int, int], Tuple] = {}
+    synced_at: Dict[Tuple[int, int], float] = {}
+    # Последние рассчитанные отчеты для пересчета только изменений
+    month_states: Dict[Tuple[int, int], MonthReportState] = {}
+    # Позиция чтения журнала изменений ячеек
+    change_log_cursor: Optional[datetime] = None
+    # Производственный календарь и отпечатки окна, с которыми он загружен
+    production_calendar: Optional[ProductionCalendar] = None
+    calendar_watermarks: Optional[Tuple] = None
+    # Правила графика окна и отпечатки, с которыми они загружены
+    schedule_rules: Optional[ScheduleRules] = None
+    rules_watermarks: Optional[Tuple] = None
+
+    while True:
+        cycle_started = time.perf_counter()
+        try:
+            # Определяем окно месяцев вокруг текущего
+            months = sync_window(
+                date.today(),
+                config.sync_months_before,
+                config.sync_months_after,
+            )
+
+            # Проверка изменений до выгрузки данных
+            with metrics.timer('watermarks'):
+                watermarks = fetch_watermarks(months)
+            now = time.monotonic()
+
+            # Месяц => нужна ли полная перезапись
+            pending: Dict[Tuple[int, int], bool] = {}
+            for target in months:
+                force_sync = (
+                    config.force_sync_interval > 0
+                    and now - synced_at.get(target, 0.0) >= config.force_sync_interval
+                )
+                if watermarks[target] != synced_watermarks.get(target) or force_sync:
+                    pending[target] = force_sync
+
+            if not pending:
+                logger.info("No changes since last sync. Skipping cycle.")
+                metrics.inc('cycles', result='skipped')
+            else:
+                logger.info(f"Starting sync cycle for {len(pending)} month(s)...")
+
+                # Журнал читается до данных: правка, попавшая между
+                # ними, просто пересчитается еще раз в следующем цикле
+                with metrics.timer('change_log'):
+                    changed_cells, change_log_cursor = fetch_changed_cells(
+                        change_log_cursor
+                    )
+                    prune_change_log()
+
+                # Месяц => затронутые ячейки для пересчета только изменений
+                incremental: Dict[Tuple[int, int], Set[CellKey]] = {}
+                for target, force_sync in pending.items():
+                    if force_sync or target not in month_states:
+                        continue
+
+                    cells = {
+                        cell for cell in changed_cells
+                        if (cell[1].year, cell[1].month) == target
+                    }
+                    # Календарь и правила затрагивают целые месяцы
+                    if watermarks[target][3:] != synced_watermarks[target][3:]:
+                        continue
+
+                    incremental[target] = cells
+
+                # График изменился в обход API: журнал объясняет
+                # не все изменения месяца, нужен полный пересчет
+                if incremental:
+                    with metrics.timer('change_log'):
+                        unlogged = fetch_unlogged_months(
+                            incremental, synced_watermarks, month_states
+                        )
+                    for target in unlogged:
+                        logger.info(
+                            f"Schedule of {target[1]}/{target[0]} changed "
+                            f"outside the API, recalculating in full."
+                        )
+                        del incremental[target]
+
+                # Календарь перечитывается, только если он изменился
+                window_calendar = tuple(watermarks[m][3] for m in months)
+                if (production_calendar is None
+                        or window_calendar != calendar_watermarks):
+                    with metrics.timer('calendar_fetch'):
+                        production_calendar = fetch_production_calendar()
+                    calendar_watermarks = window_calendar
+
+                # Правила загружаются на все окно, только если изменились
+                window_rules = (
+                    months, tuple(watermarks[m][4] for m in months)
+                )
+                if schedule_rules is None or window_rules != rules_watermarks:
+                    with metrics.timer('rules_fetch'):
+                        schedule_rules = fetch_schedule_rules(
+                            month_bounds(*months[0])[0],
+                            month_bounds(*months[-1])[1],
+                        )
+                    rules_watermarks = window_rules
+
+                full_months = [m for m in pending if m not in incremental]
+                logger.info(
+                    f"Full recalculation: {len(full_months)} month(s), "
+                    f"incremental: {len(incremental)} month(s)."
+                )
+
+                # Один запрос на все месяцы, требующие синхронизации
+                with metrics.timer('db_fetch'):
+                    users, plans, adjustments = fetch_report_rows(
+                        [month_bounds(*m) for m in full_months],
+                        set().union(*incremental.values()),
+                    )
+                metrics.set('fetched_rows', len(users), kind='users')
+                metrics.set('fetched_rows', len(plans), kind='plans')
+                metrics.set('fetched_rows', len(adjustments), kind='adjustments')
+                # Команды сотрудников для раздачи по таблицам
+                report_sink.update_users(users)
+
+                if not users:
+                    logger.warning("No active users found. Skipping sync.")
+                    metrics.inc('cycles', result='skipped')
+                else:
+                    plans_by_month = group_by_month(plans)
+                    adjustments_by_month = group_by_month(adjustments)
+
+                    futures = {
+                        executor.submit(
+                            calculate_month, year, month, users,
+                            plans_by_month[(year, month)],
+                            adjustments_by_month[(year, month)],
+                            previous=(
+                                month_states[(year, month)]
+                                if (year, month) in incremental else None
+                            ),
+                            changed_cells=incremental.get((year, month)),
+                            production_calendar=production_calendar,
+                            schedule_rules=schedule_rules,
+                        ): (year, month)
+                        for year, month in pending
+                    }
+
+                    failed = 0
+                    calculated = {}
+                    for future in as_completed(futures):
+                        year, month = futures[future]
+                        try:
+                            calculated[(year, month)] = future.result()
+                        except Exception as e:
+                            logger.exception(f"Calculation for {month}/{year} failed: {e}")
+                            metrics.inc('errors', stage='month')
+                            failed += 1
+                            # Позиция журнала уже сдвинута: следующий
+                            # расчет месяца должен быть полным
+                            month_states.pop((year, month), None)
+
+                    # Все месяцы цикла уходят в таблицу одним обращением
+                    synced = sorted(calculated)
+                    try:
+                        with metrics.timer('sheets_sync'):
+                            report_sink.sync_reports([
+                                (
+                                    date(year, month, 1),
+                                    calculated[(year, month)].report,
+                                    pending[(year, month)],
+                                )
+                                for year, month in synced
+                            ])
+                    except Exception as e:
+                        logger.exception(
+                            f"Sync of {len(synced)} month(s) failed: {e}"
+                        )
+                        metrics.inc('errors', stage='sheets')
+                        failed += len(synced)
+                        for target in synced:
+                            month_states.pop(target, None)
+                        synced = []
+
+                    # Запоминаем отпечаток только после успешной отправки
+                    for target in synced:
+                        month_states[target] = calculated[target]
+                        synced_watermarks[target] = watermarks[target]
+                        synced_at[target] = time.monotonic()
+
+                    metrics.inc('months_synced', len(futures) - failed)
+                    metrics.inc('cycles', result='failed' if failed else 'synced')
+                    logger.success("Sync cycle completed.")
+
+            # Месяцы, вышедшие из окна, больше не отслеживаются
+            synced_watermarks = {
+                k: v for k, v in synced_watermarks.items() if k in months
+            }
+            synced_at = {k: v for k, v in synced_at.items() if k in months}
+            month_states = {
+                k: v for k, v in month_states.items() if k in months
+            }
+
+        except Exception as e:
+            logger.exception(f"Unexpected error in sync cycle: {e}")
+            metrics.inc('errors', stage='cycle')
+            metrics.inc('cycles', result='failed')
+
+        metrics.observe('cycle_seconds', time.perf_counter() - cycle_started)
+
+        logger.info(f"Sheets API counters: {report_sink.stats()}")
+        logger.info(
+            f"Cell cache: {cell_cache.stats()}, size {len(cell_cache)}."
+        )
+        logger.info(f"Cycle took {metrics.last('cycle_seconds'):.2f}s.")
+
+        if listener:
+            logger.info(f"Waiting for changes (max {config.sync_interval}s)...")
+            listener.wait(config.sync_interval)
+        else:
+            logger.info(f"Sleeping for {config.sync_interval}s...")
+            time.sleep(config.sync_interval)
+
+
+def export_main(argv: List[str]):
+    """
+    Разовая выгрузка в файл без сети:
+    python -m reporter export --start 2025-01 --end 2025-12 -o year.xlsx
+    """
+
+    parser = argparse.ArgumentParser(prog='python -m reporter export')
+    parser.add_argument(
+        '--start', required=True, help='first month, YYYY-MM'
+    )
+    parser.add_argument(
+        '--end', help='last month, YYYY-MM (default: --start)'
+    )
+    parser.add_argument(
+        '-o', '--output', required=True,
+        help='output file (.xlsx, .ods) or directory for csv',
+    )
+    parser.add_argument(
+        '--format', choices=FILE_FORMATS,
+        help='output format (default: by --output extension)',
+    )
+    args = parser.parse_args(argv)
+
+    start_date = datetime.strptime(args.start, '%Y-%m').date()
+    end_date = datetime.strptime(args.end or args.start, '%Y-%m').date()
+
+    pg.init_db()
+    export_range(start_date, end_date, args.output, args.format)
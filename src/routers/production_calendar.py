@@ -0,0 +1,38 @@
+from flask import Blueprint, jsonify
+from injectors import services
+
+production_calendar_bp = Blueprint(
+    'production_calendar',
+    __name__,
+    url_prefix='/api/production-calendar',
+)
+
+
+@production_calendar_bp.route('', methods=['GET'])
+def get_production_calendar():
+    """Получение праздников и переносов"""
+
+    pcs = services.production_calendar_service()
+    days = pcs.get_days()
+
+    return jsonify(days)
+
+
+@production_calendar_bp.route('/<string:day>', methods=['PUT'])
+def set_production_calendar_day(day: str):
+    """Создание или замена дня календаря"""
+
+    pcs = services.production_calendar_service()
+    record = pcs.set_day(day)
+
+    return jsonify(record)
+
+
+@production_calendar_bp.route('/<string:day>', methods=['DELETE'])
+def delete_production_calendar_day(day: str):
+    """Удаление дня календаря"""
+
+    pcs = services.production_calendar_service()
+    record = pcs.delete_day(day)
+
+    return jsonify(record)
@@ -0,0 +1,60 @@
+from flask import Blueprint, jsonify, request
+from injectors import services
+
+schedule_rules_bp = Blueprint(
+    'schedule_rules',
+    __name__,
+    url_prefix='/api/schedule-rules',
+)
+
+
+@schedule_rules_bp.route('', methods=['GET'])
+def get_schedule_rules():
+    """Получение списка правил графика"""
+
+    srs = services.schedule_rules_service()
+    rules = srs.get_rules(
+        employee_id=request.args.get('employee_id', type=int)
+    )
+
+    return jsonify(rules)
+
+
+@schedule_rules_bp.route('/<int:rule_id>', methods=['GET'])
+def get_schedule_rule(rule_id: int):
+    """Получение правила графика по ID"""
+
+    srs = services.schedule_rules_service()
+    rule = srs.get_rules(rule_id=rule_id)
+
+    return jsonify(rule)
+
+
+@schedule_rules_bp.route('', methods=['POST'])
+def create_schedule_rule():
+    """Создание правила графика"""
+
+    srs = services.schedule_rules_service()
+    rule = srs.create_rule()
+
+    return jsonify(rule)
+
+
+@schedule_rules_bp.route('/<int:rule_id>', methods=['PATCH'])
+def update_schedule_rule(rule_id: int):
+    """Обновление правила графика"""
+
+    srs = services.schedule_rules_service()
+    rule = srs.update_rule(rule_id)
+
+    return jsonify(rule)
+
+
+@schedule_rules_bp.route('/<int:rule_id>', methods=['DELETE'])
+def delete_schedule_rule(rule_id: int):
+    """Удаление правила графика"""
+
+    srs = services.schedule_rules_service()
+    rule = srs.delete_rule(rule_id)
+
+    return jsonify(rule)
@@ -1,3 +1,14 @@
-from .sheets_service import GoogleSheetsService
+from .fake_sheets import FakeSheetsService
+from .file_export import FileReportSink
+from .report_sink import ReportSink
+from .sheets_service import GoogleSheetsService, SheetsReportSink
+from .team_fanout import TeamFanoutSink
 
-__all__ = ["GoogleSheetsService"]
+__all__ = [
+    "ReportSink",
+    "SheetsReportSink",
+    "GoogleSheetsService",
+    "FakeSheetsService",
+    "FileReportSink",
+    "TeamFanoutSink",
+]
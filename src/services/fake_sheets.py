@@ -0,0 +1,315 @@
+import copy
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import gspread
+
+from . import sheets_payload
+from .sheets_scheduler import SheetsRequestScheduler
+from .sheets_service import SheetsReportSink
+
+TEMPLATE_SHEET_ID = 0
+# Колонок в листе Template (A - AG, без колонок итогов)
+TEMPLATE_COLUMN_COUNT = sheets_payload.TOTAL_COLS
+
+
+class FakeApiResponse:
+    """Ответ с ошибкой в формате Google API для gspread.APIError."""
+
+    def __init__(self, code: int, message: str):
+        self.text = message
+        self._code = code
+        self._message = message
+
+    def json(self) -> dict:
+        return {'error': {
+            'code': self._code,
+            'message': self._message,
+            'status': 'INVALID_ARGUMENT',
+        }}
+
+
+class FakeJsonResponse:
+    """Успешный ответ HTTP клиента."""
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    def json(self) -> dict:
+        return self._data
+
+
+class FakeHttpClient:
+    """
+    Имитация gspread.HTTPClient: принимает только batchUpdate
+    с телом из готовых байтов JSON.
+    """
+
+    def __init__(self, spreadsheet: 'FakeSpreadsheet'):
+        self._spreadsheet = spreadsheet
+
+    def request(
+            self,
+            method: str,
+            endpoint: str,
+            data: bytes = b'',
+            **kwargs,
+    ) -> FakeJsonResponse:
+        if method != 'post' or not endpoint.endswith(':batchUpdate'):
+            raise self._spreadsheet._error(
+                f'Unsupported request: {method} {endpoint}'
+            )
+
+        return FakeJsonResponse(
+            self._spreadsheet.batch_update(json.loads(data))
+        )
+
+
+class FakeSpreadsheet:
+    """
+    Локальная имитация Google Таблицы.
+    Записывает тела batchUpdate как есть и применяет их к сетке в памяти.
+    Если задан path, сетка и лог запросов сохраняются на диск.
+    latency - искусственная задержка каждого обращения, секунды.
+    """
+
+    def __init__(self, path: Optional[str] = None, latency: float = 0.0):
+        self.id = 'fake'
+        self.title = 'Fake Spreadsheet'
+        self.client = FakeHttpClient(self)
+        self._path = path
+        self._latency = latency
+
+        # Записанные тела batchUpdate и их размеры в байтах
+        self.payloads: List[dict] = []
+        self.payload_sizes: List[int] = []
+
+        self._lock = threading.Lock()
+        self.sheets: Dict[int, Dict[str, Any]] = self._load() or {
+            TEMPLATE_SHEET_ID: self._new_sheet('Template', 0),
+        }
+
+    @staticmethod
+    def _new_sheet(title: str, index: int) -> Dict[str, Any]:
+        return {
+            'title': title,
+            'index': index,
+            # 'строка:колонка' => {'userEnteredValue': ..., 'note': ...}
+            'cells': {},
+            'hidden_rows': [],
+            'hidden_columns': [],
+            'column_count': TEMPLATE_COLUMN_COUNT,
+        }
+
+    def _load(self) -> Optional[Dict[int, Dict[str, Any]]]:
+        if not self._path or not os.path.exists(self._path):
+            return None
+
+        with open(self._path, encoding='utf-8') as f:
+            sheets = {int(k): v for k, v in json.load(f).items()}
+
+        # Сетки, сохраненные до учета числа колонок
+        for sheet in sheets.values():
+            sheet.setdefault('column_count', TEMPLATE_COLUMN_COUNT)
+
+        return sheets
+
+    def _save(self):
+        if not self._path:
+            return
+
+        with open(self._path, 'w', encoding='utf-8') as f:
+            json.dump(self.sheets, f, ensure_ascii=False)
+
+        with open(f'{self._path}.payloads.jsonl', 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.payloads[-1], ensure_ascii=False))
+            f.write('\n')
+
+    @staticmethod
+    def _error(message: str, code: int = 400):
+        return gspread.exceptions.APIError(FakeApiResponse(code, message))
+
+    def _sheet(self, sheet_id: int) -> Dict[str, Any]:
+        if sheet_id not in self.sheets:
+            raise self._error(f'No grid with id: {sheet_id}')
+        return self.sheets[sheet_id]
+
+    def _check_columns(self, sheet: Dict[str, Any], end_col: int):
+        """Как и API, не пишет за последнюю колонку листа."""
+
+        if end_col > sheet['column_count']:
+            raise self._error(
+                f"Range ('{sheet['title']}') exceeds grid limits. "
+                f"Max columns: {sheet['column_count']}"
+            )
+
+    def fetch_sheet_metadata(self, params: Optional[dict] = None) -> dict:
+        time.sleep(self._latency)
+
+        ordered = sorted(self.sheets.items(), key=lambda i: i[1]['index'])
+        return {'sheets': [
+            {'properties': {
+                'sheetId': sheet_id,
+                'title': sheet['title'],
+                'index': sheet['index'],
+                'gridProperties': {'columnCount': sheet['column_count']},
+            }}
+            for sheet_id, sheet in ordered
+        ]}
+
+    def batch_update(self, body: dict) -> dict:
+        time.sleep(self._latency)
+
+        with self._lock:
+            return self._batch_update(body)
+
+    def _batch_update(self, body: dict) -> dict:
+        # Как и в API, пачка применяется целиком или не применяется.
+        # Ячейки не меняются на месте, поэтому хватает неглубокой копии
+        backup = {
+            sheet_id: {**sheet, 'cells': dict(sheet['cells'])}
+            for sheet_id, sheet in self.sheets.items()
+        }
+        try:
+            for request in body.get('requests', []):
+                (kind, params), = request.items()
+                handler = getattr(self, f'_apply_{kind}', None)
+                if handler is None:
+                    raise self._error(f'Unsupported request: {kind}')
+                handler(params)
+        except Exception:
+            self.sheets = backup
+            raise
+
+        self.payloads.append(body)
+        self.payload_sizes.append(len(sheets_payload.encode(body)))
+        self._save()
+
+        return {'spreadsheetId': self.id, 'replies': []}
+
+    def _apply_duplicateSheet(self, params: dict):
+        source = self.sheets.get(params['sourceSheetId'])
+        if source is None:
+            raise self._error(
+                f"No sheet with id: {params['sourceSheetId']}"
+            )
+
+        title = params['newSheetName']
+        if any(s['title'] == title for s in self.sheets.values()):
+            raise self._error(
+                f'A sheet with the name "{title}" already exists.'
+            )
+
+        index = params.get('insertSheetIndex', len(self.sheets))
+        for sheet in self.sheets.values():
+            if sheet['index'] >= index:
+                sheet['index'] += 1
+
+        new_sheet = copy.deepcopy(source)
+        new_sheet['title'] = title
+        new_sheet['index'] = index
+        self.sheets[params['newSheetId']] = new_sheet
+
+    def _apply_updateCells(self, params: dict):
+        grid = params['range']
+        sheet = self._sheet(grid['sheetId'])
+        fields = params['fields'].split(',')
+        rows = params.get('rows', [])
+        self._check_columns(sheet, grid.get(
+            'endColumnIndex',
+            grid['startColumnIndex'] + max(
+                (len(row.get('values', [])) for row in rows), default=0
+            ),
+        ))
+
+        for row_offset, row in enumerate(rows):
+            for col_offset, value in enumerate(row.get('values', [])):
+                self._write_cell(
+                    sheet,
+                    f"{grid['startRowIndex'] + row_offset}:"
+                    f"{grid['startColumnIndex'] + col_offset}",
+                    value,
+                    fields,
+                )
+
+    def _apply_repeatCell(self, params: dict):
+        grid = params['range']
+        sheet = self._sheet(grid['sheetId'])
+        fields = params['fields'].split(',')
+        value = params.get('cell', {})
+        self._check_columns(sheet, grid['endColumnIndex'])
+
+        for row in range(grid['startRowIndex'], grid['endRowIndex']):
+            for col in range(grid['startColumnIndex'], grid['endColumnIndex']):
+                self._write_cell(sheet, f'{row}:{col}', value, fields)
+
+    @staticmethod
+    def _write_cell(
+            sheet: Dict[str, Any], key: str, value: dict, fields: List[str]
+    ):
+        cell = dict(sheet['cells'].get(key, {}))
+        # Поле из маски без значения в запросе очищается
+        for field in fields:
+            if field in value:
+                cell[field] = value[field]
+            else:
+                cell.pop(field, None)
+        sheet['cells'][key] = cell
+
+    def _apply_updateDimensionProperties(self, params: dict):
+        dimension = params['range']
+        sheet = self._sheet(dimension['sheetId'])
+        key = 'hidden_rows' \
+            if dimension['dimension'] == 'ROWS' else 'hidden_columns'
+
+        hidden = set(sheet[key])
+        indexes = range(dimension['startIndex'], dimension['endIndex'])
+        if params['properties'].get('hiddenByUser'):
+            hidden.update(indexes)
+        else:
+            hidden.difference_update(indexes)
+        sheet[key] = sorted(hidden)
+
+    def _apply_appendDimension(self, params: dict):
+        sheet = self._sheet(params['sheetId'])
+        if params['dimension'] != 'COLUMNS':
+            # Число строк не имитируется
+            raise self._error(
+                f"Unsupported dimension: {params['dimension']}"
+            )
+
+        sheet['column_count'] += params['length']
+
+    def cell(self, title: str, row: int, col: int) -> Dict[str, Any]:
+        """Содержимое ячейки листа по индексам строки и колонки."""
+
+        for sheet in self.sheets.values():
+            if sheet['title'] == title:
+                return sheet['cells'].get(f'{row}:{col}', {})
+
+        raise KeyError(title)
+
+
+class FakeSheetsService(SheetsReportSink):
+    """Отчет в локальной имитации таблицы (без сети)."""
+
+    def __init__(
+            self,
+            path: Optional[str] = None,
+            state_path: Optional[str] = None,
+            max_payload_bytes: int = 0,
+            scheduler: Optional[SheetsRequestScheduler] = None,
+            latency: float = 0.0,
+            row_compaction_share: float = 0.25,
+    ):
+        super().__init__(
+            FakeSpreadsheet(path, latency),
+            'fake',
+            state_path,
+            max_payload_bytes,
+            scheduler or SheetsRequestScheduler(requests_per_minute=0),
+            row_compaction_share,
+        )
@@ -0,0 +1,378 @@
+import abc
+import csv
+import os
+import zipfile
+from datetime import date
+from typing import Iterable, Iterator, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+import xlsxwriter
+from domain.month_report import MonthReport
+from loguru import logger
+
+from . import sheets_payload
+from .report_sink import ReportSink
+from .sheets_payload import Row
+from .sheets_service import SheetsReportSink
+
+# Форматы выгрузки в файл
+FORMATS = ('xlsx', 'ods', 'csv')
+
+# Заголовки колонок A и B в строке дат (в Template они уже есть)
+NUMBER_TITLE = '№'
+FIO_TITLE = 'ФИО'
+
+ODS_MIMETYPE = 'application/vnd.oasis.opendocument.spreadsheet'
+ODS_MANIFEST = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<manifest:manifest'
+    ' xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:manifest:1.0"'
+    ' manifest:version="1.2">'
+    f'<manifest:file-entry manifest:full-path="/"'
+    f' manifest:media-type="{ODS_MIMETYPE}"/>'
+    '<manifest:file-entry manifest:full-path="content.xml"'
+    ' manifest:media-type="text/xml"/>'
+    '</manifest:manifest>'
+)
+ODS_CONTENT_PREFIX = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<office:document-content'
+    ' xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"'
+    ' xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"'
+    ' xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"'
+    ' office:version="1.2">'
+    '<office:body><office:spreadsheet>'
+)
+ODS_CONTENT_SUFFIX = (
+    '</office:spreadsheet></office:body></office:document-content>'
+)
+
+
+def sheet_rows(
+        report_date: date, report: MonthReport
+) -> Iterator[Tuple[int, Row]]:
+    """
+    Строки вкладки по раскладке Template (индекс строки, ячейки):
+    название месяца в строке 1, номер, ФИО, даты и заголовки итогов
+    в строке 6, сотрудники с строки 7. Строки отчета собираются
+    по одной.
+    """
+
+    yield 0, [[SheetsReportSink.sheet_title(report_date), '']]
+    yield sheets_payload.DATES_ROW_IDX, [
+        [value, ''] for value in
+        [NUMBER_TITLE, FIO_TITLE] + sheets_payload.build_header(report_date)
+    ]
+
+    for index, row in enumerate(sheets_payload.iter_rows(report)):
+        yield sheets_payload.FIRST_ROW_IDX + index, row
+
+
+class SheetWriter(abc.ABC):
+    """
+    Потоковая запись вкладок в файл: строки пишутся по возрастанию
+    индекса и сразу уходят на диск, в памяти остается только текущая.
+    Файл пишется во временный и заменяет path только после close.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Индекс следующей строки текущей вкладки
+        self._next_row = 0
+
+    def add_sheet(self, title: str):
+        """Новая вкладка; прошлая больше не изменяется."""
+
+        self._next_row = 0
+        self._add_sheet(title)
+
+    def write_row(self, row_idx: int, row: Row):
+        """Строка ячеек [значение, примечание]; пропущенные строки пустые."""
+
+        if row_idx < self._next_row:
+            raise ValueError(
+                f'Row {row_idx} is written after row {self._next_row - 1}'
+            )
+
+        self._write_row(row_idx, row)
+        self._next_row = row_idx + 1
+
+    @abc.abstractmethod
+    def _add_sheet(self, title: str):
+        pass
+
+    @abc.abstractmethod
+    def _write_row(self, row_idx: int, row: Row):
+        pass
+
+    @abc.abstractmethod
+    def close(self):
+        """Дописывает файл и переносит его на место path."""
+
+    @abc.abstractmethod
+    def abort(self):
+        """Удаляет недописанный файл."""
+
+    def __enter__(self) -> 'SheetWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class XlsxSheetWriter(SheetWriter):
+    """
+    XLSX через XlsxWriter в режиме constant_memory: строка
+    сбрасывается во временный файл вкладки при переходе к следующей.
+    Примечания - комментарии ячеек.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._tmp_path = f'{path}.tmp'
+        self._workbook = xlsxwriter.Workbook(
+            self._tmp_path, {'constant_memory': True}
+        )
+        self._sheet = None
+
+    def _add_sheet(self, title: str):
+        self._sheet = self._workbook.add_worksheet(title)
+
+    def _write_row(self, row_idx: int, row: Row):
+        for col, (value, note) in enumerate(row):
+            if isinstance(value, str):
+                # Строкой, а не write: значение не должно стать формулой
+                if value:
+                    self._sheet.write_string(row_idx, col, value)
+            else:
+                self._sheet.write_number(row_idx, col, value)
+            if note:
+                self._sheet.write_comment(row_idx, col, note)
+
+    def close(self):
+        self._workbook.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class OdsSheetWriter(SheetWriter):
+    """
+    ODS без сторонних библиотек: content.xml пишется в архив потоком.
+    Примечания - аннотации ячеек (office:annotation).
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._tmp_path = f'{path}.tmp'
+        self._zip = zipfile.ZipFile(
+            self._tmp_path, 'w', zipfile.ZIP_DEFLATED
+        )
+        # mimetype - первым и без сжатия
+        self._zip.writestr(
+            'mimetype', ODS_MIMETYPE, compress_type=zipfile.ZIP_STORED
+        )
+        self._zip.writestr('META-INF/manifest.xml', ODS_MANIFEST)
+        self._content = self._zip.open('content.xml', 'w', force_zip64=True)
+        self._write(ODS_CONTENT_PREFIX)
+        self._has_sheet = False
+
+    def _write(self, text: str):
+        self._content.write(text.encode('utf-8'))
+
+    def _add_sheet(self, title: str):
+        if self._has_sheet:
+            self._write('</table:table>')
+        self._has_sheet = True
+
+        self._write(
+            f'<table:table table:name={quoteattr(title)}>'
+            f'<table:table-column table:number-columns-repeated='
+            f'"{sheets_payload.SUMMARY_END_COL_IDX}"/>'
+        )
+
+    def _write_row(self, row_idx: int, row: Row):
+        if row_idx > self._next_row:
+            self._write(
+                f'<table:table-row table:number-rows-repeated='
+                f'"{row_idx - self._next_row}">'
+                f'<table:table-cell/></table:table-row>'
+            )
+
+        self._write('<table:table-row>')
+        self._write(''.join(self._cell(value, note) for value, note in row))
+        self._write('</table:table-row>')
+
+    @staticmethod
+    def _cell(value, note: str) -> str:
+        annotation = ''
+        if note:
+            annotation = '<office:annotation>%s</office:annotation>' % (
+                ''.join(
+                    f'<text:p>{escape(line)}</text:p>'
+                    for line in note.split('\n')
+                )
+            )
+
+        if isinstance(value, str):
+            if not value:
+                if not annotation:
+                    return '<table:table-cell/>'
+                return f'<table:table-cell>{annotation}</table:table-cell>'
+            return (
+                f'<table:table-cell office:value-type="string">'
+                f'{annotation}<text:p>{escape(value)}</text:p>'
+                f'</table:table-cell>'
+            )
+
+        return (
+            f'<table:table-cell office:value-type="float"'
+            f' office:value="{value}">'
+            f'{annotation}<text:p>{value}</text:p></table:table-cell>'
+        )
+
+    def close(self):
+        if self._has_sheet:
+            self._write('</table:table>')
+        self._write(ODS_CONTENT_SUFFIX)
+        self._content.close()
+        self._zip.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._content.close()
+        self._zip.close()
+        os.remove(self._tmp_path)
+
+
+class CsvSheetWriter(SheetWriter):
+    """
+    CSV: path - каталог, каждая вкладка - отдельный файл <название>.csv
+    (UTF-8 с BOM, чтобы Excel узнал кодировку). Комментариев в CSV нет,
+    поэтому примечания не выгружаются.
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        os.makedirs(path, exist_ok=True)
+        self._file = None
+        self._file_path: Optional[str] = None
+        self._writer = None
+
+    def _add_sheet(self, title: str):
+        self._close_file()
+
+        self._file_path = os.path.join(self.path, f'{title}.csv')
+        self._file = open(
+            f'{self._file_path}.tmp', 'w', encoding='utf-8-sig', newline=''
+        )
+        self._writer = csv.writer(self._file)
+
+    def _write_row(self, row_idx: int, row: Row):
+        for _ in range(row_idx - self._next_row):
+            self._writer.writerow([])
+        self._writer.writerow([value for value, _ in row])
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            os.replace(f'{self._file_path}.tmp', self._file_path)
+            self._file = None
+
+    def close(self):
+        self._close_file()
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            os.remove(f'{self._file_path}.tmp')
+            self._file = None
+
+
+WRITERS = {
+    'xlsx': XlsxSheetWriter,
+    'ods': OdsSheetWriter,
+    'csv': CsvSheetWriter,
+}
+
+
+def resolve_format(path: str, export_format: Optional[str] = None) -> str:
+    """Формат выгрузки: заданный явно или по расширению path."""
+
+    export_format = (
+        export_format or os.path.splitext(path)[1].lstrip('.')
+    ).lower()
+    if export_format not in FORMATS:
+        raise ValueError(
+            f"Unknown export format '{export_format}', "
+            f"expected one of {', '.join(FORMATS)}"
+        )
+
+    return export_format
+
+
+def export_reports(
+        path: str,
+        reports: Iterable[Tuple[date, MonthReport]],
+        export_format: Optional[str] = None,
+) -> int:
+    """
+    Выгрузка отчетов в файл path, вкладка на каждый месяц.
+    reports - пары (первое число месяца, отчет за месяц); могут
+    рассчитываться по одному при обходе. Для CSV path - каталог.
+    Возвращает число вкладок.
+    """
+
+    writer_class = WRITERS[resolve_format(path, export_format)]
+
+    sheets = 0
+    with writer_class(path) as writer:
+        for report_date, report in reports:
+            writer.add_sheet(SheetsReportSink.sheet_title(report_date))
+            for row_idx, row in sheet_rows(report_date, report):
+                writer.write_row(row_idx, row)
+            sheets += 1
+
+    return sheets
+
+
+class FileReportSink(ReportSink):
+    """
+    Выгрузка отчета в локальные файлы вместо Google Таблицы:
+    каждый месяц - отдельный файл в каталоге export_dir (для CSV -
+    файл вкладки прямо в каталоге). Файл месяца переписывается
+    целиком при каждой синхронизации; сеть не нужна.
+    """
+
+    def __init__(self, export_dir: str, export_format: str = 'xlsx'):
+        if export_format not in FORMATS:
+            raise ValueError(f"Unknown export format '{export_format}'")
+
+        self.export_dir = export_dir
+        self.export_format = export_format
+        os.makedirs(export_dir, exist_ok=True)
+
+    def path(self, report_date: date) -> str:
+        """Файл месяца report_date."""
+
+        if self.export_format == 'csv':
+            return self.export_dir
+        title = SheetsReportSink.sheet_title(report_date)
+        return os.path.join(
+            self.export_dir, f'{title}.{self.export_format}'
+        )
+
+    def sync_report_data(
+            self,
+            report_date: date,
+            report: MonthReport,
+            full: bool = False,
+    ):
+        path = self.path(report_date)
+        export_reports(path, [(report_date, report)], self.export_format)
+        logger.info(f"Exported {len(report)} employee(s) to {path}.")
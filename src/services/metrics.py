@@ -0,0 +1,189 @@
+import contextlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# Ключ серии: (имя метрики, отсортированные метки)
+SeriesKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _series_key(name: str, labels: dict) -> SeriesKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ''
+
+    def escape(value: str) -> str:
+        return value.replace('\\', r'\\').replace('"', r'\"') \
+            .replace('\n', r'\n')
+
+    pairs = ','.join(f'{k}="{escape(v)}"' for k, v in labels)
+    return f'{{{pairs}}}'
+
+
+class ReporterMetrics:
+    """
+    Метрики reporter'а в формате Prometheus: счетчики, текущие значения
+    и сводки (сумма и количество наблюдений, плюс последнее значение).
+    """
+
+    def __init__(self, prefix: str = 'opo_reporter'):
+        self._prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[SeriesKey, float] = {}
+        self._gauges: Dict[SeriesKey, float] = {}
+        # Сводка: [сумма, количество, последнее значение]
+        self._summaries: Dict[SeriesKey, List[float]] = {}
+        self._collectors: List[Tuple[str, Callable[[], dict], dict]] = []
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _series_key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + float(value)
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_series_key(name, labels)] = float(value)
+
+    def observe(self, name: str, value: float, **labels):
+        key = _series_key(name, labels)
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0.0, 0.0, 0.0])
+            summary[0] += value
+            summary[1] += 1
+            summary[2] = float(value)
+
+    @contextlib.contextmanager
+    def timer(self, stage: str, **labels):
+        """Длительность этапа в секундах: stage_seconds{stage=...}."""
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                'stage_seconds',
+                time.perf_counter() - started,
+                stage=stage,
+                **labels,
+            )
+
+    def add_collector(self, name: str, collect: Callable[[], dict], **labels):
+        """
+        Внешний источник счетчиков, опрашиваемый при выдаче метрик:
+        collect() возвращает {вид: значение} -> name_total{kind=вид}.
+        """
+
+        with self._lock:
+            self._collectors.append((name, collect, labels))
+
+    def last(self, name: str, **labels) -> Optional[float]:
+        """Последнее наблюдение сводки (для логов цикла)."""
+
+        with self._lock:
+            summary = self._summaries.get(_series_key(name, labels))
+            return summary[2] if summary else None
+
+    def render(self) -> str:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            summaries = {k: list(v) for k, v in self._summaries.items()}
+            collectors = list(self._collectors)
+
+        for name, collect, labels in collectors:
+            try:
+                values = collect()
+            except Exception as e:
+                logger.warning(f'Metrics collector {name} failed: {e}')
+                continue
+            for kind, value in values.items():
+                key = _series_key(name, {**labels, 'kind': kind})
+                counters[key] = counters.get(key, 0.0) + float(value)
+
+        lines = []
+        typed = set()
+
+        def header(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), value in sorted(counters.items()):
+            metric = f'{self._prefix}_{name}_total'
+            header(metric, 'counter')
+            lines.append(f'{metric}{_format_labels(labels)} {value!r}')
+
+        for (name, labels), value in sorted(gauges.items()):
+            metric = f'{self._prefix}_{name}'
+            header(metric, 'gauge')
+            lines.append(f'{metric}{_format_labels(labels)} {value!r}')
+
+        for (name, labels), (total, count, _) in sorted(summaries.items()):
+            metric = f'{self._prefix}_{name}'
+            header(metric, 'summary')
+            lines.append(f'{metric}_sum{_format_labels(labels)} {total!r}')
+            lines.append(f'{metric}_count{_format_labels(labels)} {count!r}')
+
+        # Последнее наблюдение - отдельный gauge: значения текущего цикла
+        for (name, labels), (_, _, last) in sorted(summaries.items()):
+            metric = f'{self._prefix}_{name}_last'
+            header(metric, 'gauge')
+            lines.append(f'{metric}{_format_labels(labels)} {last!r}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Локальный HTTP-эндпоинт /metrics в отдельном потоке."""
+
+    def __init__(
+            self, registry: ReporterMetrics, port: int, host: str = '0.0.0.0'
+    ):
+        self._registry = registry
+        self._address = (host, port)
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        registry = self._registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header(
+                    'Content-Type', 'text/plain; version=0.0.4; charset=utf-8'
+                )
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self._address, Handler)
+        threading.Thread(
+            target=self._server.serve_forever,
+            name='metrics-server',
+            daemon=True,
+        ).start()
+        logger.info(f'Metrics endpoint: http://{self._address[0]}:'
+                    f'{self._address[1]}/metrics')
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+
+
+# Общий реестр метрик процесса
+metrics = ReporterMetrics()
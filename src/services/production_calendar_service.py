@@ -0,0 +1,126 @@
+import datetime
+from typing import List, Dict, Any
+
+from base_module.models import ModuleException
+from base_module.models.logger import ClassesLoggerAdapter
+from flask import request
+from models.production_calendar import ProductionCalendarDay
+from services.report_changes import notify_report_change
+from sqlalchemy.orm import Session as PGSession
+
+
+class ProductionCalendarService:
+    """Сервис работы с производственным календарем"""
+
+    def __init__(self, pg_connection: PGSession):
+        self._pg = pg_connection
+        self._logger = ClassesLoggerAdapter.create(self)
+
+    def _serialize(self, day: ProductionCalendarDay) -> Dict[str, Any]:
+        """Превращаем объект базы в словарь для API"""
+
+        return {
+            'date': day.date.isoformat() if day.date else None,
+            'is_working': day.is_working,
+            'comment': day.comment,
+            'created_at': (
+                day.created_at.isoformat() if day.created_at else None
+            ),
+            'updated_at': (
+                day.updated_at.isoformat() if day.updated_at else None
+            ),
+        }
+
+    @staticmethod
+    def _parse_date(value: str) -> datetime.date:
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            raise ModuleException('Invalid date', {'date': value}, 400)
+
+    def get_days(self) -> List[Dict[str, Any]]:
+        """Праздники и переносы, опционально за год (?year=)"""
+
+        year = request.args.get('year', type=int)
+
+        with self._pg.begin():
+            query = self._pg.query(ProductionCalendarDay)
+
+            if year:
+                query = query.filter(
+                    ProductionCalendarDay.date >= datetime.date(year, 1, 1),
+                    ProductionCalendarDay.date <= datetime.date(year, 12, 31),
+                )
+
+            days = query.order_by(ProductionCalendarDay.date).all()
+
+            self._logger.debug('Производственный календарь получен')
+            return [self._serialize(day) for day in days]
+
+    def set_day(self, day_value: str) -> Dict[str, Any]:
+        """Создание или замена дня календаря"""
+
+        day_date = self._parse_date(day_value)
+
+        data = request.get_json()
+        if not data:
+            raise ModuleException('Request body required', {'data': ''}, 400)
+
+        is_working = data.get('is_working')
+        if not isinstance(is_working, bool):
+            raise ModuleException(
+                'Missing required fields',
+                {'required': ['is_working']},
+                400,
+            )
+
+        with self._pg.begin():
+            day = self._pg.query(ProductionCalendarDay).get(day_date)
+
+            if day:
+                day.is_working = is_working
+                day.comment = data.get('comment', day.comment)
+                day.updated_at = datetime.datetime.utcnow()
+            else:
+                day = ProductionCalendarDay(
+                    date=day_date,
+                    is_working=is_working,
+                    comment=data.get('comment'),
+                    created_at=datetime.datetime.utcnow(),
+                    updated_at=None,
+                )
+
+            self._pg.add(day)
+            self._pg.flush()
+            self._pg.refresh(day)
+            # День календаря касается всех сотрудников: reporter
+            # пересчитает месяц целиком по отпечатку календаря
+            notify_report_change(self._pg, ProductionCalendarDay.__tablename__)
+
+            self._logger.debug(
+                'День календаря сохранён', extra={'date': day_value}
+            )
+
+            return self._serialize(day)
+
+    def delete_day(self, day_value: str) -> Dict[str, Any]:
+        """Удаление дня календаря (день снова считается по неделе)"""
+
+        day_date = self._parse_date(day_value)
+
+        with self._pg.begin():
+            day = self._pg.query(ProductionCalendarDay).get(day_date)
+            if not day:
+                raise ModuleException(
+                    'Calendar day not found', {'data': ''}, 404
+                )
+
+            result = self._serialize(day)
+            self._pg.delete(day)
+            notify_report_change(self._pg, ProductionCalendarDay.__tablename__)
+
+            self._logger.debug(
+                'День календаря удалён', extra={'date': day_value}
+            )
+
+            return result
@@ -0,0 +1,150 @@
+import json
+import select
+import time
+from datetime import date
+from typing import Iterable, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+import sqlalchemy as sa
+from base_module.config import PgConfig
+from loguru import logger
+from models.report_cell_changes import ReportCellChange
+from sqlalchemy.orm import Session as PGSession
+
+# Канал уведомлений об изменении данных отчета
+REPORT_CHANGES_CHANNEL = 'opo_report_changes'
+
+
+def notify_report_change(
+        session: PGSession,
+        table: str,
+        record_id: Optional[int] = None,
+        cells: Iterable[Tuple[int, date]] = (),
+):
+    """
+    Уведомление reporter'а об изменении данных.
+    Вызывается внутри транзакции: Postgres доставит его только
+    после коммита и не доставит при откате.
+    cells - затронутые ячейки отчета (сотрудник, дата), в том числе
+    прежние при переносе или удалении записи; пишутся в журнал.
+    """
+
+    rows = [
+        {
+            'table_name': table,
+            'record_id': record_id,
+            'employee_id': employee_id,
+            'date': cell_date,
+        }
+        for employee_id, cell_date in set(cells)
+    ]
+    if rows:
+        session.execute(sa.insert(ReportCellChange.__table__), rows)
+
+    session.execute(
+        sa.text('SELECT pg_notify(:channel, :payload)'),
+        {
+            'channel': REPORT_CHANGES_CHANNEL,
+            'payload': json.dumps({'table': table, 'id': record_id}),
+        },
+    )
+
+
+class ReportChangeListener:
+    """
+    Ожидание изменений через LISTEN на отдельном соединении.
+    После первого уведомления ждет debounce секунд, чтобы пачка
+    правок из интерфейса ушла одним циклом синхронизации.
+    """
+
+    def __init__(
+            self,
+            conf: PgConfig,
+            debounce: float = 1.0,
+            channel: str = REPORT_CHANGES_CHANNEL,
+    ):
+        self._conf = conf
+        self._debounce = debounce
+        self._channel = channel
+        self._conn: Optional[psycopg2.extensions.connection] = None
+
+    def _connect(self) -> psycopg2.extensions.connection:
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(
+                host=self._conf.host,
+                port=self._conf.port,
+                user=self._conf.user,
+                password=self._conf.password,
+                dbname=self._conf.database,
+            )
+            self._conn.set_isolation_level(
+                psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT
+            )
+            with self._conn.cursor() as cursor:
+                cursor.execute(f'LISTEN {self._channel}')
+            logger.info(f'Listening for changes on {self._channel}')
+
+        return self._conn
+
+    def _drain(self, conn: psycopg2.extensions.connection) -> int:
+        conn.poll()
+        received = len(conn.notifies)
+        for notify in conn.notifies:
+            logger.debug(f'Change notification: {notify.payload}')
+        conn.notifies.clear()
+        return received
+
+    def _wait_notifies(
+            self, conn: psycopg2.extensions.connection, timeout: float
+    ) -> int:
+        if timeout <= 0:
+            return self._drain(conn)
+
+        readable, _, _ = select.select([conn], [], [], timeout)
+        return self._drain(conn) if readable else 0
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Ждет изменений не дольше timeout секунд.
+        Возвращает True, если изменения были.
+        При недоступности БД просто выжидает timeout.
+        """
+
+        deadline = time.monotonic() + timeout
+
+        try:
+            conn = self._connect()
+            # Уведомления, пришедшие во время прошлого цикла
+            received = self._drain(conn)
+            while not received and time.monotonic() < deadline:
+                received = self._wait_notifies(
+                    conn, deadline - time.monotonic()
+                )
+            if not received:
+                return False
+
+            # Окно склейки: собираем правки, пришедшие следом
+            debounce_until = min(
+                deadline, time.monotonic() + self._debounce
+            )
+            while time.monotonic() < debounce_until:
+                received += self._wait_notifies(
+                    conn, debounce_until - time.monotonic()
+                )
+
+            logger.info(f'Received {received} change notification(s).')
+            return True
+
+        except Exception as e:
+            logger.warning(
+                f'Change listener error, falling back to sleep: {e}'
+            )
+            self.close()
+            time.sleep(max(deadline - time.monotonic(), 0))
+            return False
+
+    def close(self):
+        if self._conn is not None and not self._conn.closed:
+            self._conn.close()
+        self._conn = None
@@ -0,0 +1,42 @@
+import abc
+from datetime import date
+from typing import Dict, List, Tuple
+
+from domain.month_report import MonthReport
+
+
+class ReportSink(abc.ABC):
+    """Приемник рассчитанного отчета за месяц."""
+
+    @abc.abstractmethod
+    def sync_report_data(
+            self,
+            report_date: date,
+            report: MonthReport,
+            full: bool = False,
+    ):
+        """
+        Выгружает отчет за месяц report_date.
+        full=True - выгрузка целиком, без учета прошлых отправок.
+        """
+
+    def sync_reports(self, reports: List[Tuple[date, MonthReport, bool]]):
+        """
+        Выгружает месяцы цикла: (первое число месяца, отчет, full).
+        По умолчанию - по одному; приемники с удаленным API собирают
+        их в одно обращение.
+        """
+
+        for report_date, report, full in reports:
+            self.sync_report_data(report_date, report, full)
+
+    def update_users(self, users: list):
+        """
+        Сотрудники цикла; вызывается перед выгрузкой месяцев.
+        Нужен приемникам, которым кроме отчета нужны поля сотрудников.
+        """
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики обращений к внешнему API."""
+
+        return {}
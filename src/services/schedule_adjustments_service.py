@@ -6,6 +6,7 @@ from base_module.models.logger import ClassesLoggerAdapter
 from flask import request
 from models.schedule_adjustments import ScheduleAdjustment, EmployeeStatusCode
 from models.users import User
+from services.report_changes import notify_report_change
 from sqlalchemy.orm import Session as PGSession
 
 
@@ -119,6 +120,10 @@ class ScheduleAdjustmentService:
             self._pg.add(db_adjustment)
             self._pg.flush()
             self._pg.refresh(db_adjustment)
+            notify_report_change(
+                self._pg, ScheduleAdjustment.__tablename__, db_adjustment.id,
+                cells=[(db_adjustment.employee_id, db_adjustment.date)],
+            )
 
             self._logger.debug(
                 'Правка создана', extra={'id': db_adjustment.id}
@@ -138,6 +143,9 @@ class ScheduleAdjustmentService:
                     'Adjustment not found', {'data': ''}, 404
                 )
 
+            # Ячейка отчета до изменения
+            old_cell = (adjustment.employee_id, adjustment.date)
+
             if 'status_override' in data:
                 try:
                     val = data['status_override']
@@ -166,6 +174,10 @@ class ScheduleAdjustmentService:
             self._pg.add(adjustment)
             self._pg.flush()
             self._pg.refresh(adjustment)
+            notify_report_change(
+                self._pg, ScheduleAdjustment.__tablename__, adjustment.id,
+                cells=[old_cell, (adjustment.employee_id, adjustment.date)],
+            )
 
             self._logger.debug('Правка обновлена', extra={'id': adjustment_id})
 
@@ -181,6 +193,10 @@ class ScheduleAdjustmentService:
 
             result = self._serialize(adjustment)
             self._pg.delete(adjustment)
+            notify_report_change(
+                self._pg, ScheduleAdjustment.__tablename__, adjustment_id,
+                cells=[(adjustment.employee_id, adjustment.date)],
+            )
 
             self._logger.debug('Правка удалена', extra={'id': adjustment_id})
 
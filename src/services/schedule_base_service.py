@@ -6,6 +6,7 @@ from base_module.models.logger import ClassesLoggerAdapter
 from flask import request
 from models.schedule_base import ScheduleBase, EmployeeStatusCode
 from models.users import User
+from services.report_changes import notify_report_change
 from sqlalchemy.orm import Session as PGSession
 
 
@@ -116,6 +117,10 @@ class ScheduleBaseService:
             self._pg.add(db_schedule)
             self._pg.flush()
             self._pg.refresh(db_schedule)
+            notify_report_change(
+                self._pg, ScheduleBase.__tablename__, db_schedule.id,
+                cells=[(db_schedule.employee_id, db_schedule.date)],
+            )
 
             self._logger.debug('График создан', extra={'id': db_schedule.id})
 
@@ -131,6 +136,9 @@ class ScheduleBaseService:
             if not schedule:
                 raise ModuleException('Schedule not found', {'data': ''}, 404)
 
+            # Ячейка отчета до изменения (дата может смениться)
+            old_cell = (schedule.employee_id, schedule.date)
+
             if 'status' in data:
                 try:
                     schedule.status = EmployeeStatusCode(data['status'])
@@ -145,6 +153,10 @@ class ScheduleBaseService:
             self._pg.add(schedule)
             self._pg.flush()
             self._pg.refresh(schedule)
+            notify_report_change(
+                self._pg, ScheduleBase.__tablename__, schedule.id,
+                cells=[old_cell, (schedule.employee_id, schedule.date)],
+            )
 
             self._logger.debug('График обновлён', extra={'id': schedule_id})
 
@@ -158,6 +170,10 @@ class ScheduleBaseService:
 
             result = self._serialize(schedule)
             self._pg.delete(schedule)
+            notify_report_change(
+                self._pg, ScheduleBase.__tablename__, schedule_id,
+                cells=[(schedule.employee_id, schedule.date)],
+            )
 
             self._logger.debug('График удалён', extra={'id': schedule_id})
 
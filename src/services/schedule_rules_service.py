@@ -0,0 +1,217 @@
+import datetime
+from typing import List, Dict, Any, Optional
+
+from base_module.models import ModuleException
+from base_module.models.logger import ClassesLoggerAdapter
+from flask import request
+from models.schedule_base import EmployeeStatusCode
+from models.schedule_rules import ScheduleRule
+from models.users import User
+from services.report_changes import notify_report_change
+from sqlalchemy.orm import Session as PGSession
+
+
+class ScheduleRulesService:
+    """Сервис повторяющихся правил графика"""
+
+    def __init__(self, pg_connection: PGSession):
+        self._pg = pg_connection
+        self._logger = ClassesLoggerAdapter.create(self)
+
+    def _serialize(self, rule: ScheduleRule) -> Dict[str, Any]:
+        """Превращаем объект базы в словарь для API"""
+
+        return {
+            'id': rule.id,
+            'employee_id': rule.employee_id,
+            'start_date': (
+                rule.start_date.isoformat() if rule.start_date else None
+            ),
+            'end_date': rule.end_date.isoformat() if rule.end_date else None,
+            'weeks': rule.weeks,
+            'created_at': (
+                rule.created_at.isoformat() if rule.created_at else None
+            ),
+            'updated_at': (
+                rule.updated_at.isoformat() if rule.updated_at else None
+            ),
+        }
+
+    @staticmethod
+    def _parse_date(
+            value: Optional[str], field: str
+    ) -> Optional[datetime.date]:
+        if value is None:
+            return None
+
+        try:
+            return datetime.date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ModuleException(f'Invalid {field}', {field: value}, 400)
+
+    @staticmethod
+    def _validate_weeks(weeks: Any) -> List[List[Optional[str]]]:
+        """Непустой список недель по 7 кодов статуса или null"""
+
+        valid = (
+            isinstance(weeks, list) and weeks
+            and all(
+                isinstance(week, list) and len(week) == 7
+                for week in weeks
+            )
+        )
+        if not valid:
+            raise ModuleException(
+                'Invalid weeks',
+                {'expected': 'list of weeks, 7 status codes or null each'},
+                400,
+            )
+
+        for week in weeks:
+            for code in week:
+                if code is None:
+                    continue
+                try:
+                    EmployeeStatusCode(code)
+                except ValueError:
+                    raise ModuleException(
+                        'Invalid status', {'status': code}, 400
+                    )
+
+        return weeks
+
+    @staticmethod
+    def _check_period(
+            start_date: datetime.date, end_date: Optional[datetime.date]
+    ):
+        if end_date and end_date < start_date:
+            raise ModuleException(
+                'end_date is before start_date',
+                {'start_date': str(start_date), 'end_date': str(end_date)},
+                400,
+            )
+
+    def get_rules(
+            self,
+            rule_id: Optional[int] = None,
+            employee_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]] | Dict[str, Any]:
+        """Получение правил"""
+
+        with self._pg.begin():
+            if rule_id:
+                rule = self._pg.query(ScheduleRule).get(rule_id)
+                if not rule:
+                    raise ModuleException('Rule not found', {'data': ''}, 404)
+
+                self._logger.debug('Правило получено', extra={'id': rule_id})
+                return self._serialize(rule)
+
+            query = self._pg.query(ScheduleRule)
+
+            if employee_id:
+                query = query.filter(ScheduleRule.employee_id == employee_id)
+
+            rules = query.all()
+
+            self._logger.debug('Список правил получен')
+            return [self._serialize(rule) for rule in rules]
+
+    def create_rule(self) -> Dict[str, Any]:
+        data = request.get_json()
+        if not data:
+            raise ModuleException('Request body required', {'data': ''}, 400)
+
+        employee_id = data.get('employee_id')
+
+        if not employee_id or not data.get('start_date') \
+                or 'weeks' not in data:
+            raise ModuleException(
+                'Missing required fields',
+                {'required': ['employee_id', 'start_date', 'weeks']},
+                400,
+            )
+
+        start_date = self._parse_date(data['start_date'], 'start_date')
+        end_date = self._parse_date(data.get('end_date'), 'end_date')
+        self._check_period(start_date, end_date)
+        weeks = self._validate_weeks(data['weeks'])
+
+        with self._pg.begin():
+            user = self._pg.query(User).get(employee_id)
+            if not user:
+                raise ModuleException('Employee not found', {'data': ''}, 404)
+
+            db_rule = ScheduleRule(
+                employee_id=employee_id,
+                start_date=start_date,
+                end_date=end_date,
+                weeks=weeks,
+                created_at=datetime.datetime.utcnow(),
+                updated_at=None,
+            )
+
+            self._pg.add(db_rule)
+            self._pg.flush()
+            self._pg.refresh(db_rule)
+            # Правило затрагивает много ячеек: reporter пересчитает
+            # месяцы целиком по отпечатку правил
+            notify_report_change(
+                self._pg, ScheduleRule.__tablename__, db_rule.id
+            )
+
+            self._logger.debug('Правило создано', extra={'id': db_rule.id})
+
+            return self._serialize(db_rule)
+
+    def update_rule(self, rule_id: int) -> Dict[str, Any]:
+        data = request.get_json()
+        if not data:
+            raise ModuleException('Request body required', {'data': ''}, 400)
+
+        with self._pg.begin():
+            rule = self._pg.query(ScheduleRule).get(rule_id)
+            if not rule:
+                raise ModuleException('Rule not found', {'data': ''}, 404)
+
+            if 'start_date' in data:
+                rule.start_date = self._parse_date(
+                    data['start_date'], 'start_date'
+                )
+                if rule.start_date is None:
+                    raise ModuleException(
+                        'Invalid start_date', {'start_date': None}, 400
+                    )
+
+            if 'end_date' in data:
+                rule.end_date = self._parse_date(data['end_date'], 'end_date')
+
+            self._check_period(rule.start_date, rule.end_date)
+
+            if 'weeks' in data:
+                rule.weeks = self._validate_weeks(data['weeks'])
+
+            rule.updated_at = datetime.datetime.utcnow()
+
+            self._pg.add(rule)
+            self._pg.flush()
+            self._pg.refresh(rule)
+            notify_report_change(self._pg, ScheduleRule.__tablename__, rule.id)
+
+            self._logger.debug('Правило обновлено', extra={'id': rule_id})
+
+            return self._serialize(rule)
+
+    def delete_rule(self, rule_id: int) -> Dict[str, Any]:
+        with self._pg.begin():
+            rule = self._pg.query(ScheduleRule).get(rule_id)
+            if not rule:
+                raise ModuleException('Rule not found', {'data': ''}, 404)
+
+            result = self._serialize(rule)
+            self._pg.delete(rule)
+            notify_report_change(self._pg, ScheduleRule.__tablename__, rule_id)
+
+            self._logger.debug('Правило удалено', extra={'id': rule_id})
+
+            return result
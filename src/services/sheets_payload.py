@@ -0,0 +1,857 @@
+import calendar
+import functools
+import hashlib
+import json
+import string
+from collections import Counter, defaultdict
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from domain.month_report import CODES, TOTALS, MonthReport
+
+# Раскладка листа Template
+DATES_ROW_IDX = 5       # Строка 6: даты
+FIRST_ROW_IDX = 6       # Строка 7: первый сотрудник
+END_ROW_IDX = 56        # Граница блока сотрудников (ниже - пояснения)
+FIRST_DAY_COL_IDX = 2   # Колонка C: первый день месяца
+TOTAL_COLS = 33         # Колонки A - AG
+MAX_DAYS = 31
+SUMMARY_COL_IDX = 33    # Колонка AH: первая колонка итогов
+# Заголовки колонок итогов AH - AL (порядок - как в TOTALS)
+SUMMARY_TITLES = ('Офис', 'Удаленно', 'Отпуск', 'Больничный', 'Часы')
+SUMMARY_END_COL_IDX = SUMMARY_COL_IDX + len(TOTALS)
+
+# Строк сетки, преобразуемых из массивов отчета за один раз
+ROWS_CHUNK = 1024
+# Строк в диапазоне изменений: длинный диапазон (полная выгрузка)
+# уходит частями, не дожидаясь конца листа
+RECT_ROWS = ROWS_CHUNK
+# Коды дней в состоянии строки: символ на код ('' - дня нет в месяце)
+DAY_SYMBOLS = dict(zip(('',) + CODES, string.digits + string.ascii_letters))
+
+# Обертка тела batchUpdate вокруг готовых байтов запросов
+BODY_PREFIX = b'{"requests":['
+BODY_SUFFIX = b']}'
+
+# Маски полей ячейки: поле из маски без значения в ячейке очищается
+FIELDS_VALUE = 'userEnteredValue'
+FIELDS_VALUE_NOTE = 'userEnteredValue,note'
+# Диапазоны меньше этого числа ячеек (точечные правки обычного цикла)
+# не раскладываются на слои repeatCell
+MIN_LAYERED_CELLS = 64
+# Промежуток верных ячеек в строке, который дешевле переписать,
+# чем начинать новый запрос
+MAX_GAP = 4
+# Отметка ячейки, которую слои не заполняют (уходит остатком)
+RESIDUAL = ('', None)
+
+# Ячейка сетки: [значение, примечание]
+Cell = list
+Row = List[Cell]
+# Раскладка листа: id сотрудника по строкам (None - свободная строка)
+Layout = List[Optional[int]]
+# Прямоугольник изменений: (первая строка, последняя строка + 1,
+# первая колонка, последняя колонка + 1) относительно FIRST_ROW_IDX
+Rect = Tuple[int, int, int, int]
+# Состояние отправленной строки (см. row_state)
+RowState = list
+
+
+def build_header(report_date: date) -> List[str]:
+    """
+    Даты месяца для строки 6 (пусто для 29, 30, 31, если их нет),
+    за ними - заголовки колонок итогов.
+    """
+
+    _, num_days = calendar.monthrange(report_date.year, report_date.month)
+
+    return [
+        f'{day:02d}.{report_date.month:02d}.{report_date.year}'
+        if day <= num_days else ''
+        for day in range(1, MAX_DAYS + 1)
+    ] + list(SUMMARY_TITLES)
+
+
+def assign_rows(
+        previous: Optional[Layout],
+        user_ids: List[int],
+        compact_share: float = 0.0,
+) -> Tuple[Layout, bool]:
+    """
+    Раскладка листа, при которой сотрудники остаются в своих строках.
+    Строки ушедших освобождаются, новые сотрудники (в порядке отчета)
+    занимают первые свободные строки, а затем добавляются в конец.
+    Если свободных строк больше доли compact_share (0 - не проверяется)
+    или прошлой раскладки нет, строки выстраиваются в порядке отчета.
+    Возвращает раскладку и признак того, что она построена заново.
+    """
+
+    if not previous:
+        return list(user_ids), True
+
+    current = set(user_ids)
+    layout = [
+        user_id if user_id in current else None for user_id in previous
+    ]
+    placed = set(layout)
+
+    vacant = (index for index, user_id in enumerate(layout) if user_id is None)
+    for user_id in user_ids:
+        if user_id in placed:
+            continue
+        index = next(vacant, None)
+        if index is None:
+            layout.append(user_id)
+        else:
+            layout[index] = user_id
+
+    while layout and layout[-1] is None:
+        layout.pop()
+
+    if compact_share > 0 and (
+            layout.count(None) > compact_share * len(layout)
+    ):
+        return list(user_ids), True
+
+    return layout, False
+
+
+def iter_rows(
+        report: MonthReport, chunk_rows: int = ROWS_CHUNK
+) -> Iterator[Row]:
+    """
+    Строки сетки по одной в порядке отчета: номер, ФИО, коды
+    и примечания по дням, итоги. Коды и итоги преобразуются блоками
+    по chunk_rows строк, поэтому строки можно писать в файл потоком,
+    не держа всю сетку списками.
+    """
+
+    missing_days = MAX_DAYS - report.num_days
+
+    # Примечания есть только у небольшой части ячеек
+    notes = defaultdict(list)
+    for (index, day_index), note in report.notes.items():
+        notes[index].append((day_index, note))
+
+    for start in range(0, len(report), chunk_rows):
+        stop = start + chunk_rows
+        for index, (fio, codes, totals) in enumerate(zip(
+                report.fios[start:stop],
+                report.code_rows(start, stop),
+                report.totals_rows(start, stop),
+        ), start):
+            # Колонка A: Порядковый номер, колонка B: ФИО
+            row = [[index + 1, ''], [fio, '']]
+
+            # Колонки C - AG: Коды по дням
+            row.extend([code, ''] for code in codes)
+            # Для дней, которых нет в месяце
+            row.extend(['', ''] for _ in range(missing_days))
+            # Колонки AH - AL: Итоги за месяц
+            row.extend([value, ''] for value in totals)
+
+            for day_index, note in notes.get(index, ()):
+                row[FIRST_DAY_COL_IDX + day_index][1] = note
+
+            yield row
+
+
+def iter_layout_rows(
+        report: MonthReport,
+        layout: Optional[Layout] = None,
+        chunk_rows: int = ROWS_CHUNK,
+) -> Iterator[Row]:
+    """
+    Строки листа по одной (см. iter_rows). Итоги пишутся значениями,
+    а не формулами: таблице нечего пересчитывать.
+    layout - строки листа (см. assign_rows), в ней должны быть все
+    сотрудники отчета; без нее строки идут в порядке отчета.
+    Номер в колонке A - номер строки листа, свободные строки пустые.
+    Строки сотрудников выбираются из отчета блоками по chunk_rows.
+    """
+
+    if layout is None:
+        yield from iter_rows(report, chunk_rows)
+        return
+
+    for start in range(0, len(layout), chunk_rows):
+        chunk = layout[start:start + chunk_rows]
+        rows = iter_rows(report.subset([
+            report.rows[user_id] for user_id in chunk if user_id is not None
+        ]), chunk_rows)
+
+        for index, user_id in enumerate(chunk, start):
+            if user_id is None:
+                yield [['', ''] for _ in range(SUMMARY_END_COL_IDX)]
+                continue
+
+            row = next(rows)
+            row[0][0] = index + 1
+            yield row
+
+
+def row_state(row: Row) -> RowState:
+    """
+    Компактное состояние отправленной строки: хэш номера и ФИО, коды
+    дней строкой (символ на день, см. DAY_SYMBOLS), итоги и непустые
+    примечания [колонка, текст]. Дни и итоги сравниваются со следующей
+    отправкой по ячейкам, номер и ФИО - вместе.
+    """
+
+    return [
+        hashlib.blake2b(
+            encode(row[:FIRST_DAY_COL_IDX]), digest_size=8
+        ).hexdigest(),
+        ''.join(
+            DAY_SYMBOLS[value]
+            for value, _ in row[FIRST_DAY_COL_IDX:SUMMARY_COL_IDX]
+        ),
+        [value for value, _ in row[SUMMARY_COL_IDX:]],
+        [[col, note] for col, (_, note) in enumerate(row) if note],
+    ]
+
+
+def _column_keys(state: RowState) -> list:
+    """Значения колонок состояния строки для сравнения по ячейкам."""
+
+    ident, days, totals, notes = state
+
+    keys = [ident] * FIRST_DAY_COL_IDX + list(days) + list(totals)
+    for col, note in notes:
+        keys[col] = (keys[col], note)
+
+    return keys
+
+
+def _runs(changed: Iterable[bool]) -> List[Tuple[int, int]]:
+    """Отрезки подряд идущих True: (первая колонка, последняя + 1)."""
+
+    runs = []
+    run_start = None
+    col_idx = -1
+    for col_idx, flag in enumerate(changed):
+        if flag and run_start is None:
+            run_start = col_idx
+        elif not flag and run_start is not None:
+            runs.append((run_start, col_idx))
+            run_start = None
+    if run_start is not None:
+        runs.append((run_start, col_idx + 1))
+
+    return runs
+
+
+def changed_runs(
+        old_state: Optional[RowState], state: RowState
+) -> List[Tuple[int, int]]:
+    """
+    Отрезки колонок строки, отличающихся от прошлой отправки
+    (old_state - ее состояние, None - строка не отправлялась).
+    """
+
+    keys = _column_keys(state)
+    old_keys = _column_keys(old_state) if old_state is not None else []
+    if len(old_keys) != len(keys):
+        return [(0, len(keys))]
+
+    return _runs(key != old_key for key, old_key in zip(keys, old_keys))
+
+
+def diff_rows(old_rows: List[Row], new_rows: List[Row]) -> List[Rect]:
+    """
+    Прямоугольные диапазоны ячеек new_rows, отличающихся от old_rows
+    (сетки одного размера в памяти, например блок диапазона и его слои).
+    Одинаковые отрезки колонок в соседних строках склеиваются.
+    """
+
+    rects: List[Rect] = []
+    # Открытые прямоугольники: (c0, c1) => индекс в rects
+    open_rects: Dict[Tuple[int, int], int] = {}
+
+    for row_idx, (old_row, row) in enumerate(zip(old_rows, new_rows)):
+        next_open = {}
+        for run in _runs(old != cell for old, cell in zip(old_row, row)):
+            rect_idx = open_rects.get(run)
+            if rect_idx is not None:
+                r0, _, c0, c1 = rects[rect_idx]
+                rects[rect_idx] = (r0, row_idx + 1, c0, c1)
+            else:
+                rect_idx = len(rects)
+                rects.append((row_idx, row_idx + 1, *run))
+            next_open[run] = rect_idx
+        open_rects = next_open
+
+    return rects
+
+
+def cell_payload(cell: Cell) -> dict:
+    """
+    Ячейка запроса без пустых полей: пустые значение и примечание
+    не пишутся, их очищает маска fields.
+    """
+
+    value, note = cell
+
+    payload = {}
+    if isinstance(value, (int, float)):
+        payload['userEnteredValue'] = {'numberValue': value}
+    elif value:
+        payload['userEnteredValue'] = {'stringValue': value}
+    if note:
+        payload['note'] = note
+
+    return payload
+
+
+@functools.lru_cache(maxsize=4096)
+def _cell_bytes(value, note: str) -> bytes:
+    """Закодированная ячейка (значений в сетке немного, они повторяются)."""
+
+    return encode(cell_payload([value, note]))
+
+
+@functools.lru_cache(maxsize=4096)
+def _full_cell_size(value, note: str) -> int:
+    """Размер ячейки в полной записи (все поля) - для подсчета экономии."""
+
+    if isinstance(value, (int, float)):
+        entered = {'numberValue': value}
+    else:
+        entered = {'stringValue': value}
+
+    return len(encode({'userEnteredValue': entered, 'note': note}))
+
+
+class EncodingStats:
+    """
+    Счетчики отправки ячеек: изменившиеся ячейки и диапазоны,
+    и экономия компактной записи - сколько байтов заняли бы те же
+    ячейки одним updateCells со всеми полями каждой ячейки, и сколько
+    ушло.
+    """
+
+    def __init__(self):
+        self.changed_cells = 0
+        self.ranges = 0
+        self.full_bytes = 0
+        self.sent_bytes = 0
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.full_bytes - self.sent_bytes
+
+
+def build_header_request(sheet_id: int, header: List[str]) -> dict:
+    """Заполнение дат и заголовков итогов (Строка 6, Колонки C - AL)."""
+
+    return {
+        'updateCells': {
+            'range': {
+                'sheetId': sheet_id,
+                'startRowIndex': DATES_ROW_IDX,
+                'endRowIndex': DATES_ROW_IDX + 1,
+                'startColumnIndex': FIRST_DAY_COL_IDX,
+                'endColumnIndex': FIRST_DAY_COL_IDX + len(header),
+            },
+            'rows': [{'values': [
+                {'userEnteredValue': {'stringValue': value}}
+                for value in header
+            ]}],
+            'fields': 'userEnteredValue',
+        }
+    }
+
+
+def iter_cells_requests(
+        sheet_id: int,
+        rows: Iterable[Row],
+        old_states: Optional[List[RowState]] = None,
+        max_bytes: int = 0,
+        stats: Optional[EncodingStats] = None,
+        states: Optional[List[RowState]] = None,
+        rect_rows: int = RECT_ROWS,
+) -> Iterator[bytes]:
+    """
+    Запросы ячеек, отличающихся от прошлой отправки, сразу байтами JSON.
+    Строки rows (по порядку листа) сравниваются по одной с состояниями
+    прошлой отправки old_states (см. row_state). Одинаковые отрезки
+    изменившихся колонок в соседних строках склеиваются в диапазон,
+    который уходит запросами, как только закрывается или дорастает
+    до rect_rows строк: в памяти только строки открытых диапазонов.
+    Диапазон уходит одним updateCells или слоями repeatCell с точечными
+    updateCells поверх (см. _layers) - что короче.
+    Пустые значения и примечания не пишутся, а примечания не входят
+    в маску, если их нет ни в новых, ни в отправленных ранее ячейках.
+    Если запрос updateCells перерастает max_bytes, он закрывается,
+    а оставшиеся строки уходят следующим запросом (max_bytes <= 0 -
+    без разбиения).
+    stats - счетчики изменений и экономии по сравнению с полной
+    записью, в states добавляются состояния отправляемых строк.
+    """
+
+    old_states = old_states or []
+    # Открытые диапазоны: (c0, c1) => (первая строка, строки,
+    # состояния строк в прошлой отправке)
+    open_rects: Dict[Tuple[int, int], tuple] = {}
+
+    for row_idx, row in enumerate(rows):
+        state = row_state(row)
+        if states is not None:
+            states.append(state)
+        old_state = old_states[row_idx] if row_idx < len(old_states) else None
+
+        next_open = {}
+        for run in changed_runs(old_state, state):
+            rect = open_rects.pop(run, None)
+            if rect is not None and len(rect[1]) >= rect_rows:
+                yield from _rect_requests(
+                    sheet_id, rect, *run, max_bytes, stats
+                )
+                rect = None
+            if rect is None:
+                rect = (row_idx, [], [])
+            rect[1].append(row)
+            rect[2].append(old_state)
+            next_open[run] = rect
+
+        for run, rect in open_rects.items():
+            yield from _rect_requests(sheet_id, rect, *run, max_bytes, stats)
+        open_rects = next_open
+
+    for run, rect in open_rects.items():
+        yield from _rect_requests(sheet_id, rect, *run, max_bytes, stats)
+
+
+def _rect_requests(
+        sheet_id: int,
+        rect: Tuple[int, List[Row], List[Optional[RowState]]],
+        c0: int,
+        c1: int,
+        max_bytes: int,
+        stats: Optional[EncodingStats],
+) -> Iterator[bytes]:
+    """Запросы диапазона колонок c0..c1 строк rect (см. _layers)."""
+
+    r0, rows, old_states = rect
+    if stats is not None:
+        stats.changed_cells += len(rows) * (c1 - c0)
+        stats.ranges += 1
+        stats.full_bytes += _full_rect_size(sheet_id, r0, rows, c0, c1)
+
+    layers = None
+    if len(rows) * (c1 - c0) >= MIN_LAYERED_CELLS:
+        layers = _layers(rows, c0, c1)
+
+    if layers is None:
+        requests = _cells_requests(
+            sheet_id, r0, rows, old_states, 0, len(rows), c0, c1, max_bytes
+        )
+    else:
+        requests = _layered_requests(
+            sheet_id, r0, rows, old_states, layers, max_bytes
+        )
+
+    for request in requests:
+        if stats is not None:
+            stats.sent_bytes += len(request)
+        yield request
+
+
+def _layers(
+        rows: List[Row], c0: int, c1: int
+) -> Optional[Tuple[List[Tuple[Rect, tuple]], List[Rect]]]:
+    """
+    Раскладка диапазона на слои: repeatCell самой частой ячейки
+    по всему диапазону, затем по отрезкам строк, где своя частая ячейка
+    другая (сотрудники на удаленке), затем по колонкам, где почти все
+    ячейки одинаковые (выходные, несуществующие дни месяца). Ячейки,
+    которые слои записали неверно, уходят updateCells прямоугольниками.
+    Возвращает (слои - (диапазон, ячейка), прямоугольники остатка)
+    или None, если слоями выходит не короче одного updateCells.
+    Строки диапазонов считаются от первой строки rows.
+    """
+
+    block = [
+        [(value, note) for value, note in row[c0:c1]] for row in rows
+    ]
+    r0, r1 = 0, len(block)
+    width = c1 - c0
+
+    row_cells = [Counter(row).most_common(1)[0][0] for row in block]
+    (background, _), = Counter(row_cells).most_common(1)
+    layers = [((r0, r1, c0, c1), background)]
+    layered = [[background] * width for _ in block]
+
+    # Отрезки подряд идущих строк с одной частой ячейкой
+    start = 0
+    for index in range(1, len(block) + 1):
+        if index < len(block) and row_cells[index] == row_cells[start]:
+            continue
+        cell = row_cells[start]
+        if cell != background:
+            layers.append(((r0 + start, r0 + index, c0, c1), cell))
+            for layered_row in layered[start:index]:
+                layered_row[:] = [cell] * width
+        start = index
+
+    # Колонки: слой окупается, если исправляет заметно больше ячеек,
+    # чем портит. Колонка, где слои неверны в большинстве строк (номер,
+    # ФИО, итоги), уходит остатком целиком - одним прямоугольником
+    # вместо обрывков по строкам
+    column_cells = []
+    for col in range(width):
+        column = [row[col] for row in block]
+        (cell, _), = Counter(column).most_common(1)
+        gain = sum(
+            (actual == cell) - (actual == layered_row[col])
+            for actual, layered_row in zip(column, layered)
+        )
+        if gain * len(_cell_bytes(*cell)) <= REPEAT_REQUEST_SIZE:
+            cell = None
+
+        wrong = sum(
+            actual != (cell or layered_row[col])
+            for actual, layered_row in zip(column, layered)
+        )
+        if wrong * 2 > len(block):
+            cell = RESIDUAL
+        column_cells.append(cell)
+
+    start = 0
+    for col in range(1, width + 1):
+        if col < width and column_cells[col] == column_cells[start]:
+            continue
+        cell = column_cells[start]
+        if cell is not None:
+            if cell is not RESIDUAL:
+                layers.append(((r0, r1, c0 + start, c0 + col), cell))
+            for layered_row in layered:
+                layered_row[start:col] = [cell] * (col - start)
+        start = col
+
+    # Короткие промежутки между исправлениями в строке дешевле
+    # отправить, чем начинать новый запрос
+    for actual_row, layered_row in zip(block, layered):
+        last_wrong = None
+        for col, (actual, cell) in enumerate(zip(actual_row, layered_row)):
+            if actual == cell:
+                continue
+            if last_wrong is not None and 1 < col - last_wrong <= MAX_GAP:
+                layered_row[last_wrong + 1:col] = (
+                    [RESIDUAL] * (col - last_wrong - 1)
+                )
+            last_wrong = col
+
+    residual = [
+        (rr0, rr1, c0 + cc0, c0 + cc1)
+        for rr0, rr1, cc0, cc1 in diff_rows(layered, block)
+    ]
+
+    layered_size = sum(
+        REPEAT_REQUEST_SIZE + len(_cell_bytes(*cell)) for _, cell in layers
+    ) + sum(
+        _cells_size(rows, rect) for rect in residual
+    )
+    if layered_size >= _cells_size(rows, (r0, r1, c0, c1)):
+        return None
+
+    return layers, residual
+
+
+def _layered_requests(
+        sheet_id: int,
+        offset: int,
+        rows: List[Row],
+        old_states: List[Optional[RowState]],
+        layers: Tuple[List[Tuple[Rect, tuple]], List[Rect]],
+        max_bytes: int,
+) -> Iterator[bytes]:
+    """
+    Слои repeatCell по порядку, затем остаток updateCells поверх.
+    offset - строка листа (от FIRST_ROW_IDX) первой строки rows.
+    """
+
+    repeats, residual = layers
+    for (r0, r1, c0, c1), cell in repeats:
+        fields = _fields(rows, old_states, r0, r1, c0, c1)
+        yield b''.join((
+            b'{"repeatCell":{"range":',
+            _grid_range(sheet_id, offset + r0, offset + r1, c0, c1),
+            b',"cell":', _cell_bytes(*cell),
+            b',"fields":"', fields.encode(), b'"}}',
+        ))
+
+    for rect in residual:
+        yield from _cells_requests(
+            sheet_id, offset, rows, old_states, *rect, max_bytes
+        )
+
+
+def _cells_size(rows: List[Row], rect: Rect) -> int:
+    """Примерный размер updateCells диапазона в компактной записи."""
+
+    r0, r1, c0, c1 = rect
+    return CELLS_REQUEST_SIZE + sum(
+        len(b'{"values":[]},') + sum(
+            len(_cell_bytes(value, note)) + 1
+            for value, note in row[c0:c1]
+        )
+        for row in rows[r0:r1]
+    )
+
+
+def _cells_requests(
+        sheet_id: int,
+        offset: int,
+        rows: List[Row],
+        old_states: List[Optional[RowState]],
+        r0: int,
+        r1: int,
+        c0: int,
+        c1: int,
+        max_bytes: int,
+) -> Iterator[bytes]:
+    """
+    updateCells диапазона, строки кодируются по одной.
+    offset - строка листа (от FIRST_ROW_IDX) первой строки rows.
+    """
+
+    fields = _fields(rows, old_states, r0, r1, c0, c1)
+
+    start = r0
+    encoded = []
+    size = len(_cells_request(
+        sheet_id, offset + r0, offset + r1, c0, c1, [], fields
+    ))
+
+    for row_idx in range(r0, r1):
+        row = b''.join((
+            b'{"values":[',
+            b','.join([
+                _cell_bytes(value, note)
+                for value, note in rows[row_idx][c0:c1]
+            ]),
+            b']}',
+        ))
+        if encoded and 0 < max_bytes < size + len(row) + 1:
+            yield _cells_request(
+                sheet_id, offset + start, offset + row_idx, c0, c1,
+                encoded, fields,
+            )
+            start = row_idx
+            encoded = []
+            size = len(_cells_request(
+                sheet_id, offset + start, offset + r1, c0, c1, [], fields
+            ))
+
+        encoded.append(row)
+        size += len(row) + 1
+
+    if encoded:
+        yield _cells_request(
+            sheet_id, offset + start, offset + r1, c0, c1, encoded, fields
+        )
+
+
+def _fields(
+        rows: List[Row],
+        old_states: List[Optional[RowState]],
+        r0: int,
+        r1: int,
+        c0: int,
+        c1: int,
+) -> str:
+    """
+    Маска полей диапазона: примечания нужны, если они есть в новых или
+    отправленных ранее ячейках, или если прошлая отправка неизвестна.
+    """
+
+    for row, old_state in zip(rows[r0:r1], old_states[r0:r1]):
+        if old_state is None:
+            return FIELDS_VALUE_NOTE
+        _, _, _, old_notes = old_state
+        if any(note for _, note in row[c0:c1]) or any(
+                c0 <= col < c1 for col, _ in old_notes
+        ):
+            return FIELDS_VALUE_NOTE
+
+    return FIELDS_VALUE
+
+
+def _grid_range(sheet_id: int, r0: int, r1: int, c0: int, c1: int) -> bytes:
+    return encode({
+        'sheetId': sheet_id,
+        'startRowIndex': FIRST_ROW_IDX + r0,
+        'endRowIndex': FIRST_ROW_IDX + r1,
+        'startColumnIndex': c0,
+        'endColumnIndex': c1,
+    })
+
+
+def _cells_request(
+        sheet_id: int,
+        r0: int,
+        r1: int,
+        c0: int,
+        c1: int,
+        rows: List[bytes],
+        fields: str = FIELDS_VALUE_NOTE,
+) -> bytes:
+    """Запрос updateCells из закодированных строк."""
+
+    return b''.join((
+        b'{"updateCells":{"range":', _grid_range(sheet_id, r0, r1, c0, c1),
+        b',"rows":[', b','.join(rows),
+        b'],"fields":"', fields.encode(), b'"}}',
+    ))
+
+
+def _full_rect_size(
+        sheet_id: int,
+        r0: int,
+        rows: List[Row],
+        c0: int,
+        c1: int,
+) -> int:
+    """
+    Размер диапазона колонок c0..c1 строк rows (с строки листа r0)
+    одним updateCells со всеми полями ячеек.
+    """
+
+    # {"values":[...]} и запятые между ячейками и строками
+    rows_size = sum(
+        len(b'{"values":[]}') + (c1 - c0 - 1) + sum(
+            _full_cell_size(value, note)
+            for value, note in row[c0:c1]
+        )
+        for row in rows
+    ) + (len(rows) - 1)
+
+    return len(
+        _cells_request(sheet_id, r0, r0 + len(rows), c0, c1, [])
+    ) + rows_size
+
+
+def _rows_visibility_request(
+        sheet_id: int, start: int, end: int, hidden: bool
+) -> dict:
+    return {
+        'updateDimensionProperties': {
+            'range': {
+                'sheetId': sheet_id,
+                'dimension': 'ROWS',
+                'startIndex': start,
+                'endIndex': end,
+            },
+            'properties': {
+                'hiddenByUser': hidden,
+            },
+            'fields': 'hiddenByUser',
+        }
+    }
+
+
+def build_visibility_requests(
+        sheet_id: int, total_employees: int
+) -> List[dict]:
+    """Раскрытие строк сотрудников и скрытие пустых строк до пояснения."""
+
+    start_hide_row_idx = FIRST_ROW_IDX + total_employees
+
+    requests = []
+
+    # Сначала принудительно раскрываем
+    if total_employees > 0:
+        requests.append(_rows_visibility_request(
+            sheet_id, FIRST_ROW_IDX, start_hide_row_idx, False
+        ))
+
+    # Скрываем пустые строки до пояснения
+    if start_hide_row_idx < END_ROW_IDX:
+        requests.append(_rows_visibility_request(
+            sheet_id, start_hide_row_idx, END_ROW_IDX, True
+        ))
+
+    return requests
+
+
+def build_columns_requests(sheet_id: int, num_days: int) -> List[dict]:
+    """Скрытие колонок несуществующих дней месяца."""
+
+    if num_days >= MAX_DAYS:
+        return []
+
+    return [{
+        'updateDimensionProperties': {
+            'range': {
+                'sheetId': sheet_id,
+                'dimension': 'COLUMNS',
+                'startIndex': FIRST_DAY_COL_IDX + num_days,
+                'endIndex': TOTAL_COLS,
+            },
+            'properties': {
+                'hiddenByUser': True,
+            },
+            'fields': 'hiddenByUser',
+        }
+    }]
+
+
+def build_append_columns_request(sheet_id: int, length: int) -> dict:
+    """Добавление колонок в конец листа (для итогов на старых листах)."""
+
+    return {
+        'appendDimension': {
+            'sheetId': sheet_id,
+            'dimension': 'COLUMNS',
+            'length': length,
+        }
+    }
+
+
+def encode(payload) -> bytes:
+    """JSON в UTF-8 без пробелов - в таком виде тело уходит в API."""
+
+    return json.dumps(
+        payload, ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def stream_batches(
+        requests: Iterable[bytes], max_bytes: int = 0
+) -> Iterator[bytes]:
+    """
+    Тела batchUpdate из потока закодированных запросов: пачка отдается,
+    как только следующий запрос не помещается в max_bytes. Порядок
+    сохраняется; max_bytes <= 0 - все запросы одной пачкой.
+    В памяти держатся байты только текущей пачки.
+    """
+
+    batch = []
+    size = len(BODY_PREFIX) + len(BODY_SUFFIX)
+    for request in requests:
+        if batch and 0 < max_bytes < size + len(request) + 1:
+            yield _body(batch)
+            batch = []
+            size = len(BODY_PREFIX) + len(BODY_SUFFIX)
+
+        batch.append(request)
+        size += len(request) + 1
+
+    if batch:
+        yield _body(batch)
+
+
+def _body(requests: List[bytes]) -> bytes:
+    return b''.join((BODY_PREFIX, b','.join(requests), BODY_SUFFIX))
+
+
+# Размеры запросов без ячеек (для выбора repeatCell): номера строк
+# и колонок берутся с запасом
+REPEAT_REQUEST_SIZE = len(
+    b'{"repeatCell":{"range":' + _grid_range(2 ** 31, 10 ** 6, 10 ** 6, 99, 99)
+    + b',"cell":,"fields":"' + FIELDS_VALUE_NOTE.encode() + b'"}}'
+)
+CELLS_REQUEST_SIZE = len(
+    _cells_request(2 ** 31, 10 ** 6, 10 ** 6, 99, 99, [b'{"values":[]}'])
+)
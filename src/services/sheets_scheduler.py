@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import gspread
+import requests
+from loguru import logger
+
+from .metrics import metrics
+
+# Коды ответов, после которых запрос имеет смысл повторить
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class SheetsRequestScheduler:
+    """
+    Планировщик запросов к Google Sheets API.
+    Ограничивает частоту запросов корзиной токенов (квота в минуту)
+    и повторяет запрос при 429/5xx с экспоненциальной задержкой.
+    """
+
+    def __init__(
+            self,
+            requests_per_minute: int = 60,
+            max_retries: int = 5,
+            backoff_base: float = 1.0,
+            backoff_max: float = 64.0,
+    ):
+        self._rate = requests_per_minute / 60.0
+        self._capacity = float(requests_per_minute)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+
+        self.counters: Dict[str, int] = {
+            'requests': 0,   # отправлено запросов (включая повторы)
+            'throttled': 0,  # ожидали токен корзины
+            'retried': 0,    # повторы после 429/5xx
+            'dropped': 0,    # запросы, завершившиеся ошибкой
+        }
+
+    def _acquire(self):
+        """Забирает токен, при пустой корзине ждет его пополнения."""
+
+        if self._rate <= 0:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity,
+                self._tokens + (now - self._updated_at) * self._rate,
+            )
+            self._updated_at = now
+            self._tokens -= 1
+            wait = -self._tokens / self._rate if self._tokens < 0 else 0
+            if wait:
+                self.counters['throttled'] += 1
+
+        if wait:
+            logger.debug(f'Sheets quota: waiting {wait:.1f}s for a token')
+            time.sleep(wait)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, gspread.exceptions.APIError):
+            return error.code in RETRY_STATUS_CODES
+
+        return isinstance(
+            error,
+            (requests.exceptions.ConnectionError, requests.exceptions.Timeout),
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        delay = self._backoff_base * (2 ** attempt) + random.uniform(0, 1)
+        return min(delay, self._backoff_max)
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполняет запрос с учетом квоты и повторов."""
+
+        method = getattr(func, '__name__', 'call')
+        attempt = 0
+        while True:
+            self._acquire()
+            with self._lock:
+                self.counters['requests'] += 1
+
+            try:
+                with metrics.timer('sheets_call', method=method):
+                    return func(*args, **kwargs)
+            except Exception as e:
+                if not self._is_retryable(e) or attempt >= self._max_retries:
+                    with self._lock:
+                        self.counters['dropped'] += 1
+                    raise e
+
+                delay = self._backoff(attempt)
+                attempt += 1
+                with self._lock:
+                    self.counters['retried'] += 1
+                logger.warning(
+                    f'Sheets request failed ({e}), '
+                    f'retry {attempt}/{self._max_retries} in {delay:.1f}s'
+                )
+                time.sleep(delay)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
@@ -1,213 +1,449 @@
 import calendar
+import itertools
+import random
+import threading
 from datetime import date
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import gspread
+from domain.month_report import MonthReport
+from gspread.urls import SPREADSHEET_BATCH_UPDATE_URL
 from loguru import logger
 
+from . import sheets_payload
+from .metrics import metrics
+from .report_sink import ReportSink
+from .sheets_scheduler import SheetsRequestScheduler
+from .sheets_state import SheetStateStore
 
-class GoogleSheetsService:
-    def __init__(self, service_account_path: str, spreadsheet_id: str):
-        try:
-            self.gc = gspread.service_account(filename='service_account.json')
-            self.sh = self.gc.open_by_key(spreadsheet_id)
-            logger.info(f'Connected to Spreadsheet: {self.sh.title}')
-        except Exception as e:
-            logger.error(f'Failed to connect to Google Sheets: {e}')
-            raise e
+# Ответы API, означающие, что кэш метаданных устарел
+# (лист удален или создан вручную)
+STALE_METADATA_MESSAGES = (
+    'No grid with id',
+    'No sheet with id',
+    'already exists',
+)
+
+
+class SheetsReportSink(ReportSink):
+    """
+    Синхронизация отчета с таблицей через batchUpdate.
+    spreadsheet - объект с методом fetch_sheet_metadata, атрибутом id
+    и HTTP клиентом client (gspread.Spreadsheet или его локальная
+    имитация). Тела batchUpdate уходят готовыми байтами через client.
+    """
 
-    def get_or_create_worksheet(self, report_date: date) -> gspread.Worksheet:
+    def __init__(
+            self,
+            spreadsheet,
+            spreadsheet_id: str,
+            state_path: Optional[str] = None,
+            max_payload_bytes: int = 0,
+            scheduler: Optional[SheetsRequestScheduler] = None,
+            row_compaction_share: float = 0.25,
+    ):
+        self.sh = spreadsheet
+        self.state = SheetStateStore(
+            state_path or 'sheets_state.json', spreadsheet_id
+        )
+        # Предел размера тела batchUpdate (0 - без разбиения).
+        # Тела собираются потоком, поэтому он же ограничивает память
+        self.max_payload_bytes = max_payload_bytes
+        # Доля свободных строк листа, после которой строки выстраиваются
+        # заново в порядке отчета (0 - только при полной выгрузке)
+        self.row_compaction_share = row_compaction_share
+        # Кэш метаданных: название листа => sheetId
+        self._sheet_ids: Optional[Dict[str, int]] = None
+        # sheetId => число колонок листа (если API его вернул)
+        self._column_counts: Dict[int, int] = {}
+        self._metadata_lock = threading.Lock()
+        # Все обращения к API идут через планировщик квоты
+        self.scheduler = scheduler or SheetsRequestScheduler()
+
+    def stats(self) -> Dict[str, int]:
+        return self.scheduler.stats()
+
+    @staticmethod
+    def sheet_title(report_date: date) -> str:
         month_names = {
             1: 'Январь', 2: 'Февраль', 3: 'Март', 4: 'Апрель', 5: 'Май',
             6: 'Июнь', 7: 'Июль', 8: 'Август', 9: 'Сентябрь', 10: 'Октябрь',
             11: 'Ноябрь', 12: 'Декабрь'
         }
-        sheet_name = f'{month_names[report_date.month]} {report_date.year}'
+        return f'{month_names[report_date.month]} {report_date.year}'
 
-        try:
-            ws = self.sh.worksheet(sheet_name)
-            logger.info(f'Found existing worksheet: {sheet_name}')
-            return ws
-        except gspread.WorksheetNotFound:
-            try:
-                template = self.sh.worksheet('Template')
-                new_ws = template.duplicate(new_sheet_name=sheet_name)
-                new_ws.update_index(0)
-                logger.info(
-                    f"Created new worksheet '{sheet_name}' from Template"
-                )
-                return new_ws
-            except gspread.WorksheetNotFound:
-                logger.error(
-                    'Template worksheet not found! Cannot create new report.'
+    @property
+    def sheet_ids(self) -> Dict[str, int]:
+        """
+        Кэш sheetId по названию листа. Метаданные скачиваются только
+        при первом обращении и после сброса кэша, причем только
+        названия, id и число колонок листов.
+        """
+
+        with self._metadata_lock:
+            if self._sheet_ids is None:
+                metadata = self.scheduler.call(
+                    self.sh.fetch_sheet_metadata,
+                    params={'fields': (
+                        'sheets.properties'
+                        '(sheetId,title,gridProperties.columnCount)'
+                    )},
                 )
-                raise ValueError(
-                    "Sheet 'Template' is missing in the document."
+                properties = [
+                    sheet['properties']
+                    for sheet in metadata.get('sheets', [])
+                ]
+                self._sheet_ids = {
+                    props['title']: props['sheetId'] for props in properties
+                }
+                self._column_counts = {
+                    props['sheetId']: props['gridProperties']['columnCount']
+                    for props in properties
+                    if 'columnCount' in props.get('gridProperties', {})
+                }
+                logger.info(
+                    f'Loaded metadata for {len(self._sheet_ids)} worksheets.'
                 )
 
+            return self._sheet_ids
+
+    def invalidate_metadata(self):
+        self._sheet_ids = None
+
+    def _post_batch(self, body: bytes) -> dict:
+        """batchUpdate готовым телом, без повторной сериализации."""
+
+        response = self.sh.client.request(
+            'post',
+            SPREADSHEET_BATCH_UPDATE_URL % self.sh.id,
+            data=body,
+            headers={'Content-Type': 'application/json; charset=utf-8'},
+        )
+        return response.json()
+
+    def _summary_columns_requests(self, sheet_id: int) -> List[dict]:
+        """
+        Добавление колонок итогов, если на листе (или в Template, из
+        которого он создается) их нет. Неизвестное число колонок
+        не проверяется.
+        """
+
+        column_count = self._column_counts.get(
+            sheet_id, self._column_counts.get(self.sheet_ids.get('Template'))
+        )
+        missing = sheets_payload.SUMMARY_END_COL_IDX - (
+            column_count or sheets_payload.SUMMARY_END_COL_IDX
+        )
+        if missing <= 0:
+            return []
+
+        logger.info(f'Appending {missing} columns for monthly totals...')
+        return [sheets_payload.build_append_columns_request(sheet_id, missing)]
+
+    @staticmethod
+    def _is_stale_metadata_error(error: Exception) -> bool:
+        if not isinstance(error, gspread.exceptions.APIError):
+            return False
+        if error.code == 404:
+            return True
+
+        message = str(error.error.get('message', ''))
+        return any(text in message for text in STALE_METADATA_MESSAGES)
+
+    def resolve_worksheet(self, report_date: date) -> Tuple[int, List[dict]]:
+        """
+        Находит лист месяца по кэшу метаданных.
+        Если листа нет, возвращает заранее выбранный sheetId и запрос
+        копирования Template, который уходит в общий batchUpdate цикла.
+        """
+
+        sheet_name = self.sheet_title(report_date)
+        sheet_ids = self.sheet_ids
+
+        if sheet_name in sheet_ids:
+            logger.info(f'Found existing worksheet: {sheet_name}')
+            return sheet_ids[sheet_name], []
+
+        if 'Template' not in sheet_ids:
+            logger.error(
+                'Template worksheet not found! Cannot create new report.'
+            )
+            raise ValueError(
+                "Sheet 'Template' is missing in the document."
+            )
+
+        new_sheet_id = random.randint(1, 2 ** 31 - 1)
+        while new_sheet_id in sheet_ids.values():
+            new_sheet_id = random.randint(1, 2 ** 31 - 1)
+
+        # Новый лист - сохраненная сетка к нему не относится
+        self.state.drop(sheet_name)
+        logger.info(f"Creating new worksheet '{sheet_name}' from Template")
+
+        return new_sheet_id, [{
+            'duplicateSheet': {
+                'sourceSheetId': sheet_ids['Template'],
+                'insertSheetIndex': 0,
+                'newSheetId': new_sheet_id,
+                'newSheetName': sheet_name,
+            }
+        }]
+
     def sync_report_data(
-            self, report_date: date, data_map: Dict[str, Dict[int, dict]]
+            self,
+            report_date: date,
+            report: MonthReport,
+            full: bool = False,
     ):
+        self.sync_reports([(report_date, report, full)])
+
+    def sync_reports(self, reports: List[Tuple[date, MonthReport, bool]]):
         """
-        Заполняет скопированный шаблон данными: даты, нумерация, ФИО, коды.
+        Выгружает месяцы цикла (см. _prepare_update) за одно обращение:
+        запросы всех листов собираются в один поток и уходят одним
+        batchUpdate или, если тело перерастает max_payload_bytes,
+        пачками не больше него (0 - без разбиения). Сначала идут
+        создание листов, колонки итогов и заголовки, затем ячейки,
+        затем скрытие строк и колонок. Запросы кодируются в байты
+        по мере отправки: список запросов целиком в памяти
+        не собирается. При ошибке состояние не сохраняется ни для
+        одного листа, и следующий цикл отправляет их отличия заново.
+        """
+
+        if not reports:
+            return
+
+        updates = [
+            self._prepare_update(report_date, report, full)
+            for report_date, report, full in reports
+        ]
+
+        # Ячейки сравниваются и кодируются, только когда до них доходит
+        # пачка
+        bodies = sheets_payload.stream_batches(
+            itertools.chain(
+                (
+                    sheets_payload.encode(request)
+                    for update in updates for request in update.requests
+                ),
+                itertools.chain.from_iterable(
+                    update.cells_requests(self.max_payload_bytes)
+                    for update in updates
+                ),
+                (
+                    sheets_payload.encode(request)
+                    for update in updates
+                    for request in update.tail_requests
+                ),
+            ),
+            self.max_payload_bytes,
+        )
+        sent = 0
+        try:
+            # Повторяется только упавшая пачка, а не весь цикл
+            for body in bodies:
+                metrics.observe('payload_bytes', len(body))
+                self.scheduler.call(self._post_batch, body)
+                sent += 1
+                if sent == 1:
+                    # Созданные листы уходят в первой пачке
+                    for update in updates:
+                        self.sheet_ids[update.sheet_name] = update.sheet_id
+        except Exception as e:
+            if self._is_stale_metadata_error(e):
+                logger.warning(
+                    f'Worksheet metadata is stale, resetting cache: {e}'
+                )
+                self.invalidate_metadata()
+                for update in updates:
+                    self.state.drop(update.sheet_name)
+            raise e
+
+        if sent:
+            logger.info(
+                f'Sent {sent} batchUpdate call(s) for '
+                f'{len(updates)} worksheet(s).'
+            )
+        else:
+            logger.info('Nothing to write.')
+
+        for update in updates:
+            encoding = update.encoding
+            metrics.observe('changed_cells', encoding.changed_cells)
+            logger.info(
+                f'{update.sheet_name}: changed cells: '
+                f'{encoding.changed_cells} in {encoding.ranges} ranges '
+                f'for {len(update.report)} employees, '
+                f'{len(update.requests) + len(update.tail_requests)} '
+                f'other requests.'
+            )
+            if sent:
+                metrics.observe('payload_saved_bytes', encoding.saved_bytes)
+                logger.info(
+                    f'{update.sheet_name}: compact encoding saved '
+                    f'{encoding.saved_bytes} of {encoding.full_bytes} '
+                    f'cell bytes.'
+                )
+                self._column_counts[update.sheet_id] = max(
+                    self._column_counts.get(update.sheet_id, 0),
+                    sheets_payload.SUMMARY_END_COL_IDX,
+                )
+
+            self.state.set(update.sheet_name, update.new_state())
+
+        logger.success('Worksheets customized and filled successfully.')
+
+    def _prepare_update(
+            self,
+            report_date: date,
+            report: MonthReport,
+            full: bool = False,
+    ) -> 'SheetUpdate':
+        """
+        Выгрузка листа месяца: скопированный шаблон заполняется данными -
+        даты, нумерация, ФИО, коды, итоги по сотрудникам (значениями,
+        в колонках после дней месяца).
+        Сотрудники остаются в своих строках листа между циклами: новые
+        занимают освободившиеся строки или добавляются в конец, так что
+        прием и увольнение не сдвигают остальные строки. Порядок отчета
+        восстанавливается при полной выгрузке и при избытке свободных
+        строк (row_compaction_share).
         Затем обрезает лишние строки и скрывает лишние дни месяца.
+        Отправляются только ячейки, отличающиеся от последней успешной
+        отправки; full=True игнорирует сохраненное состояние листа.
+        Строки собираются и сравниваются с сохраненным состоянием
+        по одной при отправке: сетка листа целиком в памяти
+        не собирается.
         """
 
-        ws = self.get_or_create_worksheet(report_date)
+        sheet_name = self.sheet_title(report_date)
+        sheet_id, requests = self.resolve_worksheet(report_date)
+        requests.extend(self._summary_columns_requests(sheet_id))
 
         # Определяем количество дней в месяце
         _, num_days = calendar.monthrange(report_date.year, report_date.month)
 
-        requests = []
+        state = (None if full else self.state.get(sheet_name)) or {}
 
-        # Заполнение дат (Строка 6, Колонки C - AG)
-        date_values = []
-        for day in range(1, 32):
-            if day <= num_days:
-                # Генерируем дату в формате ДД.ММ.ГГГГ
-                date_str = (
-                    f'{day:02d}.{report_date.month:02d}'
-                    f'.{report_date.year}'
+        with metrics.timer('payload_build'):
+            layout, rebuilt = sheets_payload.assign_rows(
+                state.get('row_ids'),
+                report.user_ids,
+                self.row_compaction_share,
+            )
+            if rebuilt and state.get('row_ids'):
+                logger.info(
+                    f'Too many vacant rows, compacting {len(layout)} rows.'
                 )
-                date_values.append(
-                    {'userEnteredValue': {'stringValue': date_str}}
+
+            header = sheets_payload.build_header(report_date)
+
+            if state.get('header') != header:
+                requests.append(
+                    sheets_payload.build_header_request(sheet_id, header)
                 )
-            else:
-                date_values.append(
-                    {'userEnteredValue': {'stringValue': ''}}
-                )  # Пусто для 29, 30, 31 (если их нет)
-
-        requests.append({
-            'updateCells': {
-                'range': {
-                    'sheetId': ws.id,
-                    'startRowIndex': 5,
-                    'endRowIndex': 6,
-                    'startColumnIndex': 2,
-                    'endColumnIndex': 33,
-                },
-                'rows': [{'values': date_values}],
-                'fields': 'userEnteredValue',
-            }
-        })
-
-        # Заполнение сотрудников и кодов
-        # Стартовая строка для сотрудников: 7-я (индекс 6)
-        current_row_idx = 6
-
-        for index, (fio, days_data) in enumerate(data_map.items()):
-            row_cells = []
-
-            # Колонка A: Порядковый номер
-            row_cells.append({'userEnteredValue': {'numberValue': index + 1}})
-
-            # Колонка B: ФИО
-            row_cells.append({'userEnteredValue': {'stringValue': fio}})
-
-            # Колонки C - AG: Коды и примечания по дням
-            for day in range(1, 32):
-                if day <= num_days:
-                    cell_data = days_data.get(day, {})
-                    code = cell_data.get('code', '')
-                    note = cell_data.get('note', '')
-
-                    row_cells.append({
-                        'userEnteredValue': {'stringValue': code},
-                        'note': note if note else '',
-                    })
-                else:
-                    # Для дней, которых нет в месяце
-                    row_cells.append(
-                        {'userEnteredValue': {'stringValue': ''}, 'note': ''}
-                    )
 
-            requests.append({
-                'updateCells': {
-                    'range': {
-                        'sheetId': ws.id,
-                        'startRowIndex': current_row_idx,
-                        'endRowIndex': current_row_idx + 1,
-                        'startColumnIndex': 0,
-                        'endColumnIndex': 33,
-                    },
-                    'rows': [{'values': row_cells}],
-                    'fields': 'userEnteredValue,note',
-                }
-            })
-            current_row_idx += 1
-
-        # Отправляем весь массив данных одним пакетом
-        if requests:
-            logger.info(f'Writing data for {len(data_map)} employees...')
-            self.sh.batch_update({'requests': requests})
-
-            # Скрытие и раскрытие строк
-            total_employees = len(data_map)
-            start_row_idx = 6  #
-            start_hide_row_idx = 6 + total_employees
-            end_hide_row_idx = 56
-
-            visibility_requests = []
-
-            # Сначала принудительно раскрываем
-            if total_employees > 0:
-                visibility_requests.append({
-                    'updateDimensionProperties': {
-                        'range': {
-                            'sheetId': ws.id,
-                            'dimension': 'ROWS',
-                            'startIndex': start_row_idx,
-                            'endIndex': start_hide_row_idx,
-                        },
-                        'properties': {
-                            'hiddenByUser': False,
-                        },
-                        'fields': 'hiddenByUser',
-                    }
-                })
-
-            # Скрываем пустые строки до пояснения
-            if start_hide_row_idx < end_hide_row_idx:
-                visibility_requests.append({
-                    'updateDimensionProperties': {
-                        'range': {
-                            'sheetId': ws.id,
-                            'dimension': 'ROWS',
-                            'startIndex': start_hide_row_idx,
-                            'endIndex': end_hide_row_idx,
-                        },
-                        'properties': {
-                            'hiddenByUser': True,
-                        },
-                        'fields': 'hiddenByUser',
-                    }
-                })
-
-            if visibility_requests:
+            # Запросы после ячеек
+            tail_requests = []
+
+            # Скрытие и раскрытие строк (свободные строки не скрываются)
+            total_rows = len(layout)
+            if state.get('visible_rows') != total_rows:
                 logger.info(
-                    f'Updating row visibility (Unhide {total_employees}'
+                    f'Updating row visibility (Unhide {total_rows}'
                     f' rows, Hide rest)...'
                 )
-                self.sh.batch_update({'requests': visibility_requests})
-
-        # Скрываем лишние колонки
-        if num_days < 31:
-            logger.info(f'Hiding unused columns for a {num_days}-day month...')
-            self.sh.batch_update({
-                'requests': [{
-                    'updateDimensionProperties': {
-                        'range': {
-                            'sheetId': ws.id,
-                            'dimension': 'COLUMNS',
-                            'startIndex': 2 + num_days,
-                            'endIndex': 33,
-                        },
-                        'properties': {
-                            'hiddenByUser': True,
-                        },
-                        'fields': 'hiddenByUser',
-                    }
-                }]
-            })
-
-        logger.success('Worksheet customized and filled successfully.')
+                tail_requests.extend(
+                    sheets_payload.build_visibility_requests(
+                        sheet_id, total_rows
+                    )
+                )
+
+            # Скрываем лишние колонки
+            if state.get('visible_days') != num_days:
+                tail_requests.extend(sheets_payload.build_columns_requests(
+                    sheet_id, num_days
+                ))
+
+        return SheetUpdate(
+            sheet_name, sheet_id, report, layout, header, num_days,
+            state.get('rows') or [], requests, tail_requests,
+        )
+
+
+class SheetUpdate:
+    """
+    Подготовленная выгрузка одного листа: запросы до и после ячеек,
+    ячейки - потоком по раскладке layout, и состояние листа после
+    успешной отправки.
+    """
+
+    def __init__(
+            self,
+            sheet_name: str,
+            sheet_id: int,
+            report: MonthReport,
+            layout: sheets_payload.Layout,
+            header: List[str],
+            num_days: int,
+            old_states: List[sheets_payload.RowState],
+            requests: List[dict],
+            tail_requests: List[dict],
+    ):
+        self.sheet_name = sheet_name
+        self.sheet_id = sheet_id
+        self.report = report
+        self.layout = layout
+        self.header = header
+        self.num_days = num_days
+        self.old_states = old_states
+        self.requests = requests
+        self.tail_requests = tail_requests
+        # Состояния отправленных строк собираются для следующего цикла
+        self.states: List[sheets_payload.RowState] = []
+        self.encoding = sheets_payload.EncodingStats()
+
+    def cells_requests(self, max_bytes: int) -> Iterator[bytes]:
+        return sheets_payload.iter_cells_requests(
+            self.sheet_id,
+            sheets_payload.iter_layout_rows(self.report, self.layout),
+            self.old_states, max_bytes, self.encoding, self.states,
+        )
+
+    def new_state(self) -> dict:
+        # Строки, оставшиеся ниже новых, на листе не трогаются
+        return {
+            'header': self.header,
+            'rows': self.states + self.old_states[len(self.states):],
+            'row_ids': self.layout,
+            'visible_rows': len(self.layout),
+            'visible_days': self.num_days,
+        }
+
+
+class GoogleSheetsService(SheetsReportSink):
+    """Отчет в Google Таблице."""
+
+    def __init__(
+            self,
+            service_account_path: str,
+            spreadsheet_id: str,
+            state_path: Optional[str] = None,
+            max_payload_bytes: int = 0,
+            scheduler: Optional[SheetsRequestScheduler] = None,
+            row_compaction_share: float = 0.25,
+    ):
+        scheduler = scheduler or SheetsRequestScheduler()
+
+        try:
+            self.gc = gspread.service_account(filename=service_account_path)
+            sh = scheduler.call(self.gc.open_by_key, spreadsheet_id)
+            logger.info(f'Connected to Spreadsheet: {sh.title}')
+        except Exception as e:
+            logger.error(f'Failed to connect to Google Sheets: {e}')
+            raise e
+
+        super().__init__(
+            sh, spreadsheet_id, state_path, max_payload_bytes, scheduler,
+            row_compaction_share,
+        )
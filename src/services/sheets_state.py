@@ -0,0 +1,54 @@
+import json
+import os
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+
+class SheetStateStore:
+    """
+    Состояние последней успешной отправки листов: раскладка строк
+    и компактные состояния строк (см. sheets_payload.row_state).
+    Каждый лист - отдельный json-файл в каталоге рядом с path
+    (sheets_state.json => sheets_state/<id таблицы>/<лист>.json),
+    чтобы переживать перезапуск сервиса. Файл читается и пишется
+    только при синхронизации своего листа, в памяти состояния всех
+    листов не держатся.
+    """
+
+    def __init__(self, path: str, spreadsheet_id: str):
+        root, _ = os.path.splitext(path)
+        self._directory = os.path.join(root, spreadsheet_id)
+
+    def _path(self, title: str) -> str:
+        return os.path.join(self._directory, f'{title}.json')
+
+    def get(self, title: str) -> Optional[Dict[str, Any]]:
+        path = self._path(title)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            # Битый файл состояния приводит лишь к полной перезаписи листа
+            logger.warning(f'Failed to load sheet state {path}: {e}')
+            return None
+
+    def set(self, title: str, state: Dict[str, Any]):
+        """Атомарная запись файла листа."""
+
+        os.makedirs(self._directory, exist_ok=True)
+
+        path = self._path(title)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    def drop(self, title: str):
+        try:
+            os.remove(self._path(title))
+        except FileNotFoundError:
+            pass
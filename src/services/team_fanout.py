@@ -0,0 +1,120 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from domain.month_report import MonthReport
+from loguru import logger
+
+from .report_sink import ReportSink
+
+
+class TeamFanoutSink(ReportSink):
+    """
+    Раздача отчета по таблицам команд. Месяц рассчитывается один раз
+    на всех сотрудников, делится по командам, и части уходят в таблицы
+    одновременно через общий ограниченный пул потоков. У каждой таблицы
+    свой приемник со своим планировщиком квоты, поэтому медленная
+    или упершаяся в квоту таблица не задерживает остальные, а новая
+    команда не удлиняет цикл на время своей отправки.
+    """
+
+    def __init__(
+            self,
+            routes: Dict[str, str],
+            sinks: Dict[str, ReportSink],
+            default: Optional[str] = None,
+            max_workers: int = 8,
+    ):
+        # Команда => id таблицы; несколько команд могут делить таблицу
+        self.routes = routes
+        # id таблицы => приемник
+        self.sinks = sinks
+        # Таблица команд без своей (None - их сотрудники не выгружаются)
+        self.default = default
+        # id сотрудника => команда, обновляется каждый цикл
+        self._teams: Dict[int, Optional[str]] = {}
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(max_workers, 1),
+            thread_name_prefix='sheets-fanout',
+        )
+
+    def update_users(self, users: list):
+        self._teams = {user.id: user.team for user in users}
+
+    def stats(self) -> Dict[str, int]:
+        total = Counter()
+        for sink in self.sinks.values():
+            total.update(sink.stats())
+
+        return dict(total)
+
+    def partition(self, report: MonthReport) -> Dict[str, List[int]]:
+        """
+        Строки отчета по таблицам. В разбиение входят все таблицы, даже
+        без сотрудников: из них нужно убрать ушедших в другие команды.
+        """
+
+        parts = {spreadsheet_id: [] for spreadsheet_id in self.sinks}
+        unrouted = 0
+        for row, user_id in enumerate(report.user_ids):
+            spreadsheet_id = self.routes.get(
+                self._teams.get(user_id), self.default
+            )
+            if spreadsheet_id is None:
+                unrouted += 1
+                continue
+            parts[spreadsheet_id].append(row)
+
+        if unrouted:
+            logger.warning(
+                f'{unrouted} employee(s) of teams without spreadsheet '
+                f'are not exported.'
+            )
+
+        return parts
+
+    def sync_report_data(
+            self,
+            report_date: date,
+            report: MonthReport,
+            full: bool = False,
+    ):
+        self.sync_reports([(report_date, report, full)])
+
+    def sync_reports(self, reports: List[Tuple[date, MonthReport, bool]]):
+        """
+        Выгружает части отчетов во все таблицы и дожидается всех
+        отправок. Каждая таблица получает все месяцы цикла за одно
+        обращение (см. SheetsReportSink.sync_reports). Ошибка любой
+        таблицы - ошибка цикла: в следующем цикле месяцы
+        пересчитываются целиком, а таблицы, уже получившие свою часть,
+        повторно отправляют только отличия (то есть ничего).
+        """
+
+        parts = {spreadsheet_id: [] for spreadsheet_id in self.sinks}
+        for report_date, report, full in reports:
+            for spreadsheet_id, rows in self.partition(report).items():
+                parts[spreadsheet_id].append(
+                    (report_date, report.subset(rows), full)
+                )
+
+        futures = {
+            spreadsheet_id: self._executor.submit(
+                self.sinks[spreadsheet_id].sync_reports, spreadsheet_reports
+            )
+            for spreadsheet_id, spreadsheet_reports in parts.items()
+        }
+
+        error = None
+        for spreadsheet_id, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(
+                    f'Sync of spreadsheet {spreadsheet_id} failed: {e}'
+                )
+                error = error or e
+
+        if error is not None:
+            raise error
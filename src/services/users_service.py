@@ -5,6 +5,7 @@ from base_module.models import ModuleException
 from base_module.models.logger import ClassesLoggerAdapter
 from flask import request
 from models.users import User, EmployeeType, RoleType
+from services.report_changes import notify_report_change
 from sqlalchemy.orm import Session as PGSession
 
 
@@ -113,6 +114,7 @@ class UsersService:
             self._pg.add(db_user)
             self._pg.flush()
             self._pg.refresh(db_user)
+            notify_report_change(self._pg, User.__tablename__, db_user.id)
 
             self._logger.debug(
                 'Пользователь создан',
@@ -193,6 +195,7 @@ class UsersService:
             self._pg.add(user)
             self._pg.flush()
             self._pg.refresh(user)
+            notify_report_change(self._pg, User.__tablename__, user.id)
 
             self._logger.debug(
                 'Пользователь обновлён',
@@ -210,6 +213,7 @@ class UsersService:
                 raise ModuleException('User not found', {'data': ''}, 404)
 
             self._pg.delete(user)
+            notify_report_change(self._pg, User.__tablename__, user_id)
 
             self._logger.debug(
                 'Пользователь удалён',
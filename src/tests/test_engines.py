@@ -0,0 +1,129 @@
+from datetime import date
+
+import pytest
+
+from benchmarks.generator import generate_month
+from domain import (
+    ProductionCalendar,
+    ScheduleCalculator,
+    ScheduleRules,
+    VectorizedScheduleCalculator,
+)
+from domain.parallel_calculator import ParallelScheduleCalculator
+from models.report_rows import RuleRow
+
+# (год, месяц, сотрудников, доля плановых дней, доля правок, отлучек, seed)
+MONTHS = [
+    (2025, 3, 120, 0.2, 0.05, 1, 1),
+    (2025, 2, 80, 0.6, 0.3, 2, 2),
+    (2024, 2, 60, 0.0, 0.0, 0, 3),
+    (2025, 4, 150, 1.0, 0.5, 3, 4),
+    (2025, 12, 40, 0.3, 0.8, 0, 5),
+]
+
+
+def _month(year, month, users, plan_density, adjustment_density,
+           absences, seed):
+    return generate_month(
+        users, year, month,
+        plan_density=plan_density,
+        adjustment_density=adjustment_density,
+        absences_per_adjustment=absences,
+        seed=seed,
+    )
+
+
+def _calendar(year: int, month: int) -> ProductionCalendar:
+    """Праздник в будний день и рабочая суббота."""
+
+    return ProductionCalendar([
+        (date(year, month, 3), False),
+        (date(year, month, 8), True),
+    ])
+
+
+def _rules(users: list, year: int, month: int) -> ScheduleRules:
+    """Правила графика у части сотрудников, с пересечением."""
+
+    return ScheduleRules([
+        RuleRow(
+            index, user.id, date(year, month, 1 + index % 10),
+            date(year, month, 20) if index % 2 else None,
+            [['Д', 'Я', 'Д', 'Я', 'Я', None, None], ['В'] * 7],
+        )
+        for index, user in enumerate(users[::3])
+    ] + [
+        RuleRow(1000, users[0].id, date(year, month, 15), None,
+                [['О'] * 7]),
+    ])
+
+
+def _assert_same(report, baseline):
+    assert report == baseline
+    assert report.to_data_map() == baseline.to_data_map()
+
+
+@pytest.mark.parametrize('params', MONTHS)
+def test_vectorized_matches_baseline(params):
+    year, month = params[:2]
+    users, plans, adjustments = _month(*params)
+
+    _assert_same(
+        VectorizedScheduleCalculator.calculate_month_report(
+            year, month, users, plans, adjustments
+        ),
+        ScheduleCalculator.calculate_month_report(
+            year, month, users, plans, adjustments
+        ),
+    )
+
+
+@pytest.mark.parametrize('params', MONTHS)
+def test_vectorized_matches_baseline_with_calendar_and_rules(params):
+    year, month = params[:2]
+    users, plans, adjustments = _month(*params)
+    args = (
+        year, month, users, plans, adjustments,
+        _calendar(year, month), _rules(users, year, month),
+    )
+
+    _assert_same(
+        VectorizedScheduleCalculator.calculate_month_report(*args),
+        ScheduleCalculator.calculate_month_report(*args),
+    )
+
+
+def test_range_report_matches_baseline():
+    users, plans, adjustments = _month(2025, 3, 50, 0.3, 0.2, 1, 6)
+    more = _month(2025, 4, 50, 0.3, 0.2, 1, 7)
+    plans, adjustments = plans + more[1], adjustments + more[2]
+    args = (
+        date(2025, 3, 20), date(2025, 4, 10), users, plans, adjustments,
+        _calendar(2025, 4), _rules(users, 2025, 3),
+    )
+
+    assert (
+        VectorizedScheduleCalculator.calculate_range_report(*args)
+        == ScheduleCalculator.calculate_range_report(*args)
+    )
+
+
+def test_parallel_matches_baseline():
+    calculator = ParallelScheduleCalculator(
+        VectorizedScheduleCalculator, processes=2, min_users=0
+    )
+    try:
+        for params in MONTHS[:2]:
+            year, month = params[:2]
+            users, plans, adjustments = _month(*params)
+            args = (
+                year, month, users, plans, adjustments,
+                _calendar(year, month), _rules(users, year, month),
+            )
+
+            _assert_same(
+                calculator.calculate_month_report(*args),
+                ScheduleCalculator.calculate_month_report(*args),
+            )
+    finally:
+        calculator.shutdown()
@@ -0,0 +1,285 @@
+import copy
+import random
+from datetime import date
+
+import pytest
+
+from benchmarks.generator import generate_month
+from domain import VectorizedScheduleCalculator
+from services import sheets_payload
+from models.report_rows import UserRow
+from services.fake_sheets import FakeSheetsService
+from services.team_fanout import TeamFanoutSink
+
+REPORT_DATE = date(2025, 3, 1)
+TITLE = 'Март 2025'
+
+
+@pytest.fixture
+def report():
+    users, plans, adjustments = generate_month(
+        120, REPORT_DATE.year, REPORT_DATE.month,
+        plan_density=0.3, adjustment_density=0.2, seed=11,
+    )
+    return VectorizedScheduleCalculator.calculate_month_report(
+        REPORT_DATE.year, REPORT_DATE.month, users, plans, adjustments
+    )
+
+
+@pytest.fixture
+def sink_factory(tmp_path):
+    def factory(**kwargs):
+        return FakeSheetsService(
+            state_path=str(tmp_path / 'sheets_state.json'), **kwargs
+        )
+    return factory
+
+
+def _cell(sink, row: int, col: int, title: str = TITLE) -> list:
+    cell = sink.sh.cell(title, row, col)
+    value, = cell.get('userEnteredValue', {'': ''}).values()
+    return [value, cell.get('note', '')]
+
+
+def _layout(sink, title: str = TITLE) -> list:
+    return sink.state.get(title)['row_ids']
+
+
+def assert_sheet(sink, report, report_date: date = REPORT_DATE):
+    """Блок сотрудников листа совпадает со строками раскладки."""
+
+    title = sink.sheet_title(report_date)
+    layout = _layout(sink, title)
+    assert sorted(filter(None, layout)) == sorted(report.user_ids)
+
+    rows = list(sheets_payload.iter_layout_rows(report, layout))
+    for row_idx, row in enumerate(rows):
+        assert [
+            _cell(sink, sheets_payload.FIRST_ROW_IDX + row_idx, col, title)
+            for col in range(len(row))
+        ] == row, f'row {row_idx}'
+
+    header = sheets_payload.build_header(report_date)
+    assert [
+        _cell(sink, sheets_payload.DATES_ROW_IDX, col, title)[0]
+        for col in range(
+            sheets_payload.FIRST_DAY_COL_IDX,
+            sheets_payload.FIRST_DAY_COL_IDX + len(header),
+        )
+    ] == header
+
+
+def _edit(report, rnd: random.Random, cells: int):
+    """Копия отчета со случайными кодами и примечаниями."""
+
+    report = copy.deepcopy(report)
+    for _ in range(cells):
+        row = rnd.randrange(len(report))
+        day_index = rnd.randrange(report.num_days)
+        report.codes[row, day_index] = rnd.randrange(9)
+        if rnd.random() < 0.5:
+            report.notes[(row, day_index)] = f'примечание {rnd.randrange(3)}'
+        else:
+            report.notes.pop((row, day_index), None)
+        report.totals[row, rnd.randrange(report.totals.shape[1])] += 1
+
+    return report
+
+
+def _sent(sink, since: int) -> int:
+    return sum(sink.sh.payload_sizes[since:])
+
+
+def test_diff_cycles(sink_factory, report):
+    sink = sink_factory()
+    sink.sync_report_data(REPORT_DATE, report)
+    assert_sheet(sink, report)
+    full_size = _sent(sink, 0)
+
+    rnd = random.Random(1)
+    for _ in range(5):
+        report = _edit(report, rnd, 30)
+        sent = len(sink.sh.payloads)
+        sink.sync_report_data(REPORT_DATE, report)
+        assert_sheet(sink, report)
+        assert 0 < _sent(sink, sent) < full_size / 4
+
+    # Без изменений ничего не отправляется
+    sent = len(sink.sh.payloads)
+    sink.sync_report_data(REPORT_DATE, report)
+    assert len(sink.sh.payloads) == sent
+
+
+def test_state_survives_restart(sink_factory, report, tmp_path):
+    path = str(tmp_path / 'fake_sheets.json')
+    sink_factory(path=path).sync_report_data(REPORT_DATE, report)
+
+    sink = sink_factory(path=path)
+    sink.sync_report_data(REPORT_DATE, report)
+    assert sink.sh.payloads == []
+    assert_sheet(sink, report)
+
+
+def test_full_sync_rewrites_sheet(sink_factory, report):
+    sink = sink_factory()
+    sink.sync_report_data(REPORT_DATE, report)
+    full_size = _sent(sink, 0)
+
+    # Правка листа вручную: обычный цикл ее не видит, полный исправляет
+    key = f'{sheets_payload.FIRST_ROW_IDX}:{sheets_payload.FIRST_DAY_COL_IDX}'
+    sheet, = [s for s in sink.sh.sheets.values() if s['title'] == TITLE]
+    sheet['cells'][key] = {'userEnteredValue': {'stringValue': 'X'}}
+
+    sent = len(sink.sh.payloads)
+    sink.sync_report_data(REPORT_DATE, report)
+    assert len(sink.sh.payloads) == sent
+
+    sink.sync_report_data(REPORT_DATE, report, full=True)
+    assert_sheet(sink, report)
+    assert _sent(sink, sent) >= full_size * 0.9
+
+
+def test_hires_and_fires_keep_rows(sink_factory, report):
+    sink = sink_factory(row_compaction_share=0.25)
+    staff = list(range(0, len(report), 2))
+    first = report.subset(staff)
+    sink.sync_report_data(REPORT_DATE, first)
+    assert_sheet(sink, first)
+    before = _layout(sink)
+
+    # Увольнение: строки остальных не сдвигаются, уволенные пустеют
+    fired = set(first.user_ids[5:10])
+    current = first.subset([
+        row for row, user_id in enumerate(first.user_ids)
+        if user_id not in fired
+    ])
+    sink.sync_report_data(REPORT_DATE, current)
+    assert_sheet(sink, current)
+    layout = _layout(sink)
+    assert layout == [
+        None if user_id in fired else user_id for user_id in before
+    ]
+    for row_idx in range(5, 10):
+        assert _cell(sink, sheets_payload.FIRST_ROW_IDX + row_idx, 1) == [
+            '', ''
+        ]
+
+    # Прием: новые занимают освободившиеся строки, затем конец листа
+    hired = list(range(1, 15, 2))
+    rows = sorted(
+        [report.rows[user_id] for user_id in current.user_ids] + hired
+    )
+    current = report.subset(rows)
+    sink.sync_report_data(REPORT_DATE, current)
+    assert_sheet(sink, current)
+    layout = _layout(sink)
+    assert [layout[index] for index in range(len(before))
+            if before[index] not in fired] == [
+        user_id for user_id in before if user_id not in fired
+    ]
+    assert None not in layout
+    assert len(layout) == len(before) + len(hired) - len(fired)
+
+    # Много свободных строк: строки выстраиваются в порядке отчета
+    current = current.subset(list(range(0, len(current), 3)))
+    sink.sync_report_data(REPORT_DATE, current)
+    assert_sheet(sink, current)
+    assert _layout(sink) == current.user_ids
+
+
+@pytest.mark.parametrize('max_bytes', [20000, 3000])
+def test_payload_split(sink_factory, report, max_bytes):
+    sink = sink_factory(max_payload_bytes=max_bytes)
+    sink.sync_report_data(REPORT_DATE, report)
+    assert_sheet(sink, report)
+    assert len(sink.sh.payloads) > 1
+    assert max(sink.sh.payload_sizes) <= max_bytes
+
+    edited = _edit(report, random.Random(2), 200)
+    sent = len(sink.sh.payloads)
+    sink.sync_report_data(REPORT_DATE, edited)
+    assert_sheet(sink, edited)
+    assert max(sink.sh.payload_sizes[sent:]) <= max_bytes
+
+
+def test_summary_columns_appended(sink_factory, report):
+    sink = sink_factory()
+    sink.sync_report_data(REPORT_DATE, report)
+
+    first, = sink.sh.payloads[:1]
+    kinds = [next(iter(request)) for request in first['requests']]
+    assert kinds[:2] == ['duplicateSheet', 'appendDimension']
+
+    sheet, = [s for s in sink.sh.sheets.values() if s['title'] == TITLE]
+    assert sheet['column_count'] == sheets_payload.SUMMARY_END_COL_IDX
+    assert_sheet(sink, report)
+
+    # Колонки добавляются один раз
+    sink.sync_report_data(REPORT_DATE, _edit(report, random.Random(3), 5))
+    assert all(
+        'appendDimension' not in request
+        for payload in sink.sh.payloads[1:]
+        for request in payload['requests']
+    )
+
+
+def _month_report(year: int, month: int, seed: int):
+    users, plans, adjustments = generate_month(
+        60, year, month, plan_density=0.3, adjustment_density=0.2,
+        seed=seed,
+    )
+    return VectorizedScheduleCalculator.calculate_month_report(
+        year, month, users, plans, adjustments
+    )
+
+
+def test_months_share_one_batch(sink_factory):
+    sink = sink_factory()
+    months = [
+        (date(2025, month, 1), _month_report(2025, month, month), False)
+        for month in (1, 2, 3)
+    ]
+
+    sink.sync_reports(months)
+    assert len(sink.sh.payloads) == 1
+    for report_date, report, _ in months:
+        assert_sheet(sink, report, report_date)
+
+    rnd = random.Random(4)
+    months = [
+        (report_date, _edit(report, rnd, 10), False)
+        for report_date, report, _ in months
+    ]
+    sink.sync_reports(months)
+    assert len(sink.sh.payloads) == 2
+    for report_date, report, _ in months:
+        assert_sheet(sink, report, report_date)
+
+
+def test_team_fanout_one_batch_per_spreadsheet(tmp_path):
+    sinks = {
+        spreadsheet_id: FakeSheetsService(
+            state_path=str(tmp_path / f'{spreadsheet_id}.json')
+        )
+        for spreadsheet_id in ('a', 'b')
+    }
+    fanout = TeamFanoutSink({'A': 'a', 'B': 'b'}, sinks, default='b')
+    months = [
+        (date(2025, month, 1), _month_report(2025, month, month), False)
+        for month in (2, 3)
+    ]
+    users = [
+        UserRow(
+            user_id, '', None, None, None, None,
+            'A' if user_id % 3 else None,
+        )
+        for user_id in months[0][1].user_ids
+    ]
+    fanout.update_users(users)
+
+    fanout.sync_reports(months)
+    for spreadsheet_id, sink in sinks.items():
+        assert len(sink.sh.payloads) == 1
+        for report_date, report, _ in months:
+            rows = fanout.partition(report)[spreadsheet_id]
+            assert_sheet(sink, report.subset(rows), report_date)